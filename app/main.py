@@ -1,47 +1,144 @@
+import time
+
+STARTED = time.perf_counter()
+
 import logging
-from src import conf, monitor, log, client, scheduler
+from src import conf, log, profiler
 import asyncio
 
 
+def has_schedulers(config) -> bool:
+    """是否有启用的定时任务"""
+    return any(s.get("enabled", False) for s in config.get("schedulers") or [])
+
+
 async def app():
-    # 初始化日志
-    log.Log("INFO")
+    # 启动耗时分析（--profile 或 TG_PROFILE=1 时输出）
+    startup = profiler.StartupProfiler.from_env(STARTED)
+    startup.add("导入模块", time.perf_counter() - STARTED)
+
+    # 初始化日志（加载配置后按配置重新初始化）
+    log_manager = log.Log()
 
     logger = logging.getLogger(__name__)
     logger.info("🚀  启动Telegram-Tools系统 V1.0.0")
 
     config_manager = conf.ConfigManager()
-    # 创建默认配置文件（如果不存在）
-    config_manager.create_default_config()
+    with startup.phase("加载配置"):
+        # 创建默认配置文件（如果不存在）
+        config_manager.create_default_config()
+
+        # 加载配置
+        config = config_manager.load_config()
+        # 校验并编译为运行时配置（出错时输出所在行号），通过后按配置重新初始化日志
+        config = config_manager.compile_config(config)
+        if config is not None:
+            log_manager.stop()
+            log_manager = log.Log.from_config(config)
 
-    # 加载配置
-    config = config_manager.load_config()
+    if config is not None:
+        # 未登录时等待生成 Session 文件（不计入启动耗时）
+        waited = time.perf_counter()
+        await config_manager.wait_for_session()
+        startup.started += time.perf_counter() - waited
+
+        # Telethon 在配置校验通过后才导入，APScheduler 仅在启用定时任务时导入
+        with startup.phase("导入模块"):
+            from src import client, monitor, watcher, metrics
 
-    if config_manager.validate_config(config):
         client_manage = None
+        telegram_monitor = None
         telegram_scheduler = None
+        config_watcher = None
+        metrics_server = None
+
+        async def start_scheduler(config):
+            # 启用定时任务时才导入 APScheduler
+            from src import scheduler
+
+            telegram_scheduler = scheduler.TelegramScheduler(config)
+            await telegram_scheduler.start_scheduler(client_manage)
+            return telegram_scheduler
 
         try:
             client_manage = client.ClientManage(config)
-            await client_manage.init_client()
+            with startup.phase("连接客户端"):
+                await client_manage.init_client()
 
-            # 启动监控
-            telegram_monitor = monitor.TelegramMonitor(config)
-            await telegram_monitor.start_monitor(client_manage)
+            # 启动监控（解析实体耗时单独统计）
+            resolved = client_manage.resolve_seconds
+            with startup.phase("注册处理器"):
+                telegram_monitor = monitor.TelegramMonitor(config)
+                await telegram_monitor.start_monitor(client_manage)
+            resolve_seconds = client_manage.resolve_seconds - resolved
+            startup.add("注册处理器", -resolve_seconds)
+            startup.add("解析实体", resolve_seconds)
 
             # 启动定时
-            telegram_scheduler = scheduler.TelegramScheduler(config)
-            await telegram_scheduler.start_scheduler(client_manage)
+            if has_schedulers(config):
+                resolved = client_manage.resolve_seconds
+                with startup.phase("定时任务"):
+                    telegram_scheduler = await start_scheduler(config)
+                resolve_seconds = client_manage.resolve_seconds - resolved
+                startup.add("定时任务", -resolve_seconds)
+                startup.add("解析实体", resolve_seconds)
+            else:
+                logger.info("⏰  没有启用的定时任务，不启动定时功能")
+
+            # 监听配置文件变化，热更新来源、目标和定时任务（不重新连接）
+            async def reload_config():
+                nonlocal telegram_scheduler
+                new_config = config_manager.reload_config()
+                if new_config is None:
+                    return
+                log_manager.set_level((new_config.get("log") or {}).get("level"))
+                await telegram_monitor.reload(new_config)
+                if telegram_scheduler is not None:
+                    await telegram_scheduler.reload(new_config)
+                elif has_schedulers(new_config):
+                    telegram_scheduler = await start_scheduler(new_config)
+
+            config_watcher = watcher.ConfigWatcher(conf.CONFIG_FILE, reload_config)
+            config_watcher.start()
+
+            # 指标服务（未启用时不记录指标）
+            metrics_server = metrics.MetricsServer.from_config(config)
+            if metrics_server:
+                registry = metrics_server.registry
+                registry.add_collector(client_manage.send_queue.collect_metrics)
+                if telegram_monitor.downloader:
+                    registry.add_collector(telegram_monitor.downloader.collect_metrics)
+                await metrics_server.start()
 
+            startup.report()
             await client_manage.client.run_until_disconnected()
         except Exception as e:
             logger.error(f"❌  程序运行出错: {e}")
         finally:
-            if client_manage and client_manage.client.is_connected():
-                await client_manage.client.disconnect()
+            if config_watcher:
+                config_watcher.stop()
+            if metrics_server:
+                await metrics_server.close()
+            if telegram_monitor and telegram_monitor.backfill_task:
+                telegram_monitor.backfill_task.cancel()
+            if telegram_monitor and telegram_monitor.downloader:
+                await telegram_monitor.downloader.close()
+            if client_manage:
+                await client_manage.send_queue.close()
+                # 投递日志先提交，随后提交去重指纹
+                if client_manage.journal:
+                    await client_manage.journal.close()
+                client_manage.entity_cache.close()
+                if client_manage.file_cache:
+                    client_manage.file_cache.close()
+            if telegram_monitor and telegram_monitor.dedup:
+                telegram_monitor.dedup.close()
+            if client_manage and client_manage.client:
+                await client_manage.disconnect()
             if telegram_scheduler and telegram_scheduler.scheduler.running:
                 telegram_scheduler.scheduler.shutdown()
             logger.info("⏹️  Telegram-Tools系统已停止")
+            log_manager.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+# forward_messages 单次最多转发 100 条
+MAX_BATCH_COUNT = 100
+DEFAULT_WINDOW = 5
+DEFAULT_MAX_COUNT = 20
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBatcher:
+    """消息合并器（按时间窗口或数量合并后批量转发）"""
+
+    def __init__(
+        self,
+        flush_callback: Callable[[List[Any], List[Any]], Awaitable[Any]],
+        window: float = DEFAULT_WINDOW,
+        max_count: int = DEFAULT_MAX_COUNT,
+    ):
+        self.flush_callback = flush_callback
+        self.window = window
+        self.max_count = max(1, min(max_count, MAX_BATCH_COUNT))
+        self.messages: List[Any] = []
+        # 每条消息对应的目标列表
+        self.destinations: Dict[int, List[Any]] = {}
+        self.timer = None
+
+    async def add(self, messages: List[Any], destinations: List[Any]):
+        """加入消息及其目标（相册整体加入，不拆分到两批）"""
+        if self.messages and len(self.messages) + len(messages) > self.max_count:
+            await self.flush()
+
+        self.messages.extend(messages)
+        for message in messages:
+            self.destinations[message.id] = destinations
+        if len(self.messages) >= self.max_count:
+            await self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.create_task(self.flush_later())
+
+    async def flush_later(self):
+        """时间窗口结束后转发"""
+        await asyncio.sleep(self.window)
+        self.timer = None
+        await self.flush()
+
+    async def flush(self):
+        """立即转发已合并的消息"""
+        if self.timer is not None and self.timer is not asyncio.current_task():
+            self.timer.cancel()
+        self.timer = None
+
+        messages, self.messages = self.messages, []
+        destinations, self.destinations = self.destinations, {}
+        if not messages:
+            return
+
+        # 并发处理可能打乱到达顺序，按消息ID恢复原始顺序
+        messages.sort(key=lambda m: m.id)
+        logger.debug(f"📦  合并转发 {len(messages)} 条消息")
+        try:
+            for batch, dests in self.group_by_destinations(messages, destinations):
+                await self.flush_callback(batch, dests)
+        except Exception as e:
+            logger.error(f"❌  合并转发失败: {e}")
+
+    @staticmethod
+    def group_by_destinations(
+        messages: List[Any], destinations: Dict[int, List[Any]]
+    ) -> List[Tuple[List[Any], List[Any]]]:
+        """按目标拆分批次（每个目标收到的消息保持原始顺序）"""
+        if len({id(dests) for dests in destinations.values()}) == 1:
+            return [(messages, destinations[messages[0].id])]
+
+        per_dest: Dict[Any, Tuple[List[Any], List[Any]]] = {}
+        for message in messages:
+            for dest in destinations[message.id]:
+                per_dest.setdefault(dest["id"], ([], [dest]))[0].append(message)
+        return list(per_dest.values())
@@ -0,0 +1,269 @@
+import asyncio
+import contextlib
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional
+from telethon.extensions import BinaryReader
+from telethon.tl.types import (
+    Channel,
+    Chat,
+    InputPeerChannel,
+    InputPeerChat,
+    InputPeerUser,
+    User,
+)
+
+# 缓存文件位置（与 telegram.session 同目录）
+DATA_PATH = "/app/data/"
+ENTITY_CACHE_FILE = DATA_PATH + "entities.db"
+FILE_CACHE_FILE = DATA_PATH + "files.db"
+DEFAULT_ENTITY_TTL = 86400
+DEFAULT_MEDIA_SIZE = 100
+DEFAULT_MEDIA_AGE = 3600
+
+logger = logging.getLogger(__name__)
+
+
+class EntityCache:
+    """实体解析缓存（SQLite 持久化，记录 peer id、access_hash 和名称）"""
+
+    def __init__(self, path: str = ENTITY_CACHE_FILE, ttl: int = DEFAULT_ENTITY_TTL):
+        self.ttl = ttl
+        self.conn = None
+        if ttl <= 0:
+            return
+
+        try:
+            cache_dir = os.path.dirname(path)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entities (
+                    identifier TEXT PRIMARY KEY,
+                    peer_type TEXT NOT NULL,
+                    peer_id INTEGER NOT NULL,
+                    access_hash INTEGER NOT NULL,
+                    name TEXT,
+                    username TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  实体缓存不可用: {e}")
+            self.conn = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "EntityCache":
+        """从配置创建实体缓存"""
+        cache_config = config.get("cache") or {}
+        return cls(ttl=cache_config.get("entity_ttl", DEFAULT_ENTITY_TTL))
+
+    def get(self, identifier: str) -> Optional[Dict[str, Any]]:
+        """读取未过期的缓存记录"""
+        if self.conn is None:
+            return None
+
+        row = self.conn.execute(
+            "SELECT peer_type, peer_id, access_hash, name, username, updated_at"
+            " FROM entities WHERE identifier = ?",
+            (identifier,),
+        ).fetchone()
+        if row is None or time.time() - row[5] > self.ttl:
+            return None
+
+        peer_type, peer_id, access_hash, name, username, _ = row
+        if peer_type == "channel":
+            entity = InputPeerChannel(peer_id, access_hash)
+        elif peer_type == "chat":
+            entity = InputPeerChat(peer_id)
+        else:
+            entity = InputPeerUser(peer_id, access_hash)
+        return {"id": peer_id, "name": name, "username": username, "entity": entity}
+
+    def set(self, identifier: str, entity: Any, name: str):
+        """写入解析结果"""
+        if self.conn is None:
+            return
+
+        if isinstance(entity, Channel):
+            peer_type = "channel"
+        elif isinstance(entity, Chat):
+            peer_type = "chat"
+        elif isinstance(entity, User):
+            peer_type = "user"
+        else:
+            return
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                identifier,
+                peer_type,
+                entity.id,
+                getattr(entity, "access_hash", None) or 0,
+                name,
+                getattr(entity, "username", None),
+                time.time(),
+            ),
+        )
+
+    def invalidate(self, identifier: str):
+        """删除缓存记录（解析或发送失败时调用）"""
+        if self.conn is None:
+            return
+
+        self.conn.execute("DELETE FROM entities WHERE identifier = ?", (identifier,))
+        self.conn.commit()
+        logger.debug(f"🗑️  实体缓存已失效: {identifier}")
+
+    def commit(self):
+        """提交写入"""
+        if self.conn is not None:
+            self.conn.commit()
+
+    def close(self):
+        """关闭缓存"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class MediaCache:
+    """媒体句柄缓存（LRU，按数量和时间淘汰，同一媒体只上传一次）"""
+
+    def __init__(
+        self, max_size: int = DEFAULT_MEDIA_SIZE, max_age: int = DEFAULT_MEDIA_AGE
+    ):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.items: "OrderedDict[Any, Any]" = OrderedDict()
+        self.locks: Dict[Any, asyncio.Lock] = {}
+        # 每个上传锁的使用者（持有和等待）数量，为 0 时才清理
+        self.lock_users: Dict[Any, int] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "MediaCache":
+        """从配置创建媒体缓存"""
+        cache_config = config.get("cache") or {}
+        return cls(
+            max_size=cache_config.get("media_size", DEFAULT_MEDIA_SIZE),
+            max_age=cache_config.get("media_age", DEFAULT_MEDIA_AGE),
+        )
+
+    def get(self, key: Any) -> Optional[Any]:
+        """读取未过期的句柄"""
+        item = self.items.get(key)
+        if item is None:
+            return None
+
+        handle, created_at = item
+        if time.monotonic() - created_at > self.max_age:
+            del self.items[key]
+            return None
+        self.items.move_to_end(key)
+        return handle
+
+    def put(self, key: Any, handle: Any):
+        """写入句柄，超出数量时淘汰最久未使用的"""
+        self.items[key] = (handle, time.monotonic())
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+    def pop(self, key: Any):
+        """删除句柄（文件引用过期时调用）"""
+        self.items.pop(key, None)
+
+    @contextlib.asynccontextmanager
+    async def lock(self, key: Any) -> AsyncIterator[None]:
+        """持有媒体的上传锁，避免多个目标同时重复上传（退出时包括提前返回和出错都清理空闲的锁）"""
+        lock = self.locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.locks[key] = lock
+        self.lock_users[key] = self.lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self.release(key)
+
+    def release(self, key: Any):
+        """减少上传锁的使用者数量，没有持有或等待者时清理
+        （锁释放后等待者尚未取得锁时 locked() 为 False，不能据此清理）"""
+        users = self.lock_users.get(key, 0) - 1
+        if users > 0:
+            self.lock_users[key] = users
+            return
+        self.lock_users.pop(key, None)
+        self.locks.pop(key, None)
+
+
+class FileCache:
+    """本地文件上传句柄缓存（SQLite 持久化，文件未修改时重启后也不再重复上传）"""
+
+    def __init__(self, path: str = FILE_CACHE_FILE):
+        self.conn = None
+        try:
+            cache_dir = os.path.dirname(path)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    key TEXT PRIMARY KEY,
+                    media BLOB NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  文件缓存不可用: {e}")
+            self.conn = None
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取上传句柄（InputMedia）"""
+        if self.conn is None:
+            return None
+
+        row = self.conn.execute(
+            "SELECT media FROM files WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return BinaryReader(row[0]).tgread_object()
+        except Exception:
+            self.invalidate(key)
+            return None
+
+    def set(self, key: str, media: Any):
+        """写入上传句柄"""
+        if self.conn is None:
+            return
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+            (key, bytes(media), time.time()),
+        )
+        self.conn.commit()
+
+    def invalidate(self, key: str):
+        """删除上传句柄（文件引用过期时调用）"""
+        if self.conn is None:
+            return
+
+        self.conn.execute("DELETE FROM files WHERE key = ?", (key,))
+        self.conn.commit()
+        logger.debug(f"🗑️  文件缓存已失效: {key}")
+
+    def close(self):
+        """关闭缓存"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
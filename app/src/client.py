@@ -1,9 +1,34 @@
-from typing import List, Dict, Any
+from functools import partial
+from typing import List, Dict, Any, Optional
+import asyncio
 import logging
+import os
 import sys
-from telethon import TelegramClient
+import tempfile
+import time
+from telethon import TelegramClient, errors, functions, utils
+from telethon.tl.types import (
+    InputMediaUploadedDocument,
+    InputMediaUploadedPhoto,
+    InputPeerSelf,
+    MessageMediaWebPage,
+)
+from . import cache, journal, limiter, metrics, pool, sender, settings
 
 DATA_PATH = "/app/data/"
+# forward_messages 单次最多转发 100 条
+MAX_FORWARD_COUNT = 100
+# Telethon 默认在请求内等待 60 秒以内的 FloodWait（期间占用发送并发，发送队列无法暂停该目标），
+# 设为 0 后所有 FloodWait 都抛出，由发送队列暂停目标或换账号发送
+FLOOD_SLEEP_THRESHOLD = 0
+# 同时直接解析的实体数（大量用户名同时解析容易触发 ResolveUsername 限流）
+RESOLVE_CONCURRENCY = 5
+# 目标失效（无权限、已删除等）的错误，需清除实体缓存
+PEER_ERRORS = (
+    errors.ChannelPrivateError,
+    errors.ChannelInvalidError,
+    errors.PeerIdInvalidError,
+)
 logger = logging.getLogger(__name__)
 
 
@@ -11,6 +36,19 @@ class ClientManage:
     def __init__(self, config: Dict[str, Any]):
         self.client = None
         self.config = config
+        # 账号池（主账号负责定时任务，发送按策略分摊到各账号）
+        self.pool = pool.ClientPool.from_config(config)
+        self.entity_cache = cache.EntityCache.from_config(config)
+        self.media_cache = cache.MediaCache.from_config(config)
+        # 首次发送本地文件时才打开
+        self.file_cache: Optional[cache.FileCache] = None
+        self.journal = journal.DeliveryJournal.from_config(config)
+
+        # 转发限流与发送队列
+        self.limiter = limiter.RateLimiter.from_config(config)
+        self.send_queue = sender.SendQueue.from_config(config, self.limiter)
+        # 累计解析实体耗时（启动耗时分析）
+        self.resolve_seconds = 0.0
 
     async def init_client(self):
         telegram_config = self.config.get("telegram", {})
@@ -23,11 +61,8 @@ class ClientManage:
 
         try:
             # 创建客户端
-            self.client = TelegramClient(
-                DATA_PATH + "telegram.session",
-                api_id,
-                api_hash,
-                proxy=self.get_proxy(),
+            self.client = self.create_client(
+                DATA_PATH + "telegram.session", api_id, api_hash
             )
             # 启动客户端
             await self.client.start()
@@ -37,6 +72,68 @@ class ClientManage:
             logger.error(f"❌  Telegram客户端初始化失败: {e}")
             sys.exit(1)
 
+        global_rate = settings.Limits.from_config(self.config).global_rate
+        self.pool.add(
+            pool.Account(pool.PRIMARY_ACCOUNT, self.client, global_rate, primary=True)
+        )
+        await self.init_accounts(api_id, api_hash, global_rate)
+
+    def create_client(self, session: Any, api_id, api_hash) -> TelegramClient:
+        """创建客户端（FloodWait 不在请求内等待，交由发送队列处理）"""
+        return TelegramClient(
+            session,
+            api_id,
+            api_hash,
+            proxy=self.get_proxy(),
+            flood_sleep_threshold=FLOOD_SLEEP_THRESHOLD,
+        )
+
+    async def init_accounts(self, api_id, api_hash, global_rate: float):
+        """连接附加账号（需先用 login.py 登录，失败的账号跳过）"""
+        for account_config in self.config.get("accounts") or []:
+            if not account_config.get("enabled", False):
+                continue
+            name = str(account_config.get("name") or "").strip()
+            if not name or self.pool.get(name):
+                logger.error(f"❌  账号名称为空或重复: {name}")
+                continue
+
+            account_client = self.create_client(
+                DATA_PATH + str(account_config.get("session") or name),
+                account_config.get("api_id") or api_id,
+                account_config.get("api_hash") or api_hash,
+            )
+            try:
+                await account_client.connect()
+                if not await account_client.is_user_authorized():
+                    raise ValueError("未登录，请先生成Session文件")
+                me = await account_client.get_me()
+            except Exception as e:
+                logger.error(f"❌  账号 {name} 初始化失败: {e}")
+                await account_client.disconnect()
+                continue
+
+            self.pool.add(pool.Account(name, account_client, global_rate))
+            logger.info(f"📶  账号 {name} 连接成功: @{me.username} (ID: {me.id})")
+
+        if len(self.pool) > 1:
+            # 全局配额按账号累加，单个账号的配额由账号自身限制
+            self.limiter.set_global_rate(global_rate * len(self.pool))
+            logger.info(
+                f"👥  共 {len(self.pool)} 个账号分摊发送（策略: {self.pool.strategy}）"
+            )
+
+    async def disconnect(self):
+        """断开所有账号并输出各账号发送统计"""
+        for account in self.pool.accounts:
+            if len(self.pool) > 1:
+                metrics = account.metrics()
+                logger.info(
+                    f"📊  账号 {account.name}: 发送 {metrics['sent']} 批（{metrics['rate']} 批/分钟），失败 {metrics['failed']} 批，限流 {metrics['flood_waits']} 次"
+                )
+            if account.client.is_connected():
+                await account.client.disconnect()
+
     def get_proxy(self):
         """获取代理设置 - 支持多种代理类型"""
         proxy_config = self.config.get("proxy", {})
@@ -77,17 +174,54 @@ class ClientManage:
         logger.info(f"🔌  代理地址: {host}:{port}")
         return proxy_dict
 
-    async def resolve_entities(self, identifiers: List[str]) -> List[Any]:
-        """解析实体ID"""
-        entities = []
+    async def resolve_entities(
+        self, identifiers: List[str], account: pool.Account = None
+    ) -> List[Any]:
+        """解析实体ID（优先读取本地缓存，ID和用户名并发直接解析，其余从对话列表索引查找）"""
+        start_time = time.perf_counter()
+        account = account or self.pool.primary
+        # access_hash 因账号而异，附加账号的缓存单独存放
+        prefix = "" if account.primary else f"{account.name}:"
+        resolved = {}
 
+        # 方法0: 本地缓存
+        pending = []
         for identifier in identifiers:
-            try:
-                # 方法1: 直接解析
-                entity = await self.client.get_entity(identifier["id"])
-            except (ValueError, TypeError):
+            identifier.setdefault("key", str(identifier["id"]).strip())
+            cached = self.entity_cache.get(prefix + identifier["key"])
+            if cached:
+                identifier.update(cached)
+                resolved[id(identifier)] = identifier
+                logger.debug(
+                    f"✅  解析实体(缓存): {identifier['name']} (ID: {identifier['id']})"
+                )
+            else:
+                pending.append(identifier)
+
+        # 方法1: 直接解析（仅ID和用户名，名称无法直接解析）
+        direct = [i for i in pending if self.is_direct_identifier(i["id"])]
+        semaphore = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+
+        async def get_entity(identifier: Dict[str, Any]):
+            async with semaphore:
+                return await account.client.get_entity(identifier["id"])
+
+        results = await asyncio.gather(
+            *(get_entity(i) for i in direct), return_exceptions=True
+        )
+        direct_entities = {}
+        for identifier, result in zip(direct, results):
+            if isinstance(result, (ValueError, TypeError)):
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            direct_entities[id(identifier)] = result
+
+        for identifier in pending:
+            entity = direct_entities.get(id(identifier))
+            if entity is None:
                 # 方法2: 从对话列表查找
-                entity = await self.find_entity_in_dialogs(identifier["id"])
+                entity = await self.find_entity_in_dialogs(identifier["id"], account)
 
             if entity:
                 entity_id = getattr(entity, "id")
@@ -96,67 +230,342 @@ class ClientManage:
                 )
                 identifier["id"] = entity_id
                 identifier["name"] = entity_name
+                identifier["username"] = getattr(entity, "username", None)
                 identifier["entity"] = entity
-                entities.append(identifier)
+                resolved[id(identifier)] = identifier
+                self.entity_cache.set(prefix + identifier["key"], entity, entity_name)
                 logger.debug(f"✅  解析实体: {entity_name} (ID: {entity_id})")
             else:
+                self.entity_cache.invalidate(prefix + identifier["key"])
                 logger.error(f"❌  无法解析实体: {identifier['id']}")
+        self.entity_cache.commit()
 
+        entities = [i for i in identifiers if id(i) in resolved]
+        elapsed = time.perf_counter() - start_time
+        self.resolve_seconds += elapsed
+        logger.info(
+            f"🔎  解析实体 {len(entities)}/{len(identifiers)} 个（缓存 {len(identifiers) - len(pending)} 个），耗时 {elapsed:.2f} 秒"
+        )
         return entities
 
-    async def find_entity_in_dialogs(self, identifier):
-        """在对话列表中查找实体"""
-        identifier_str = str(identifier).lower()
+    @staticmethod
+    def is_direct_identifier(identifier) -> bool:
+        """是否可直接解析（数字ID、用户名或链接）"""
+        if isinstance(identifier, int):
+            return True
+        identifier_str = str(identifier).strip()
+        if identifier_str.lstrip("-").isdigit():
+            return True
+        username, _ = utils.parse_username(identifier_str)
+        return username is not None
 
-        async for dialog in self.client.iter_dialogs():
-            entity = dialog.entity
+    async def get_dialog_index(self, account: pool.Account = None) -> Dict[str, Any]:
+        """获取对话列表索引（每个账号只拉取一次，按ID、标题、用户名、名称建立索引）"""
+        account = account or self.pool.primary
+        if account.dialog_index is None:
+            dialog_index = {}
+            async for dialog in account.client.iter_dialogs():
+                entity = dialog.entity
+                keys = []
 
-            # 匹配ID
-            if hasattr(entity, "id") and str(entity.id) == identifier_str:
-                return entity
+                # 匹配ID
+                if hasattr(entity, "id"):
+                    keys.append(str(entity.id))
+                    keys.append(str(utils.get_peer_id(entity)))
+                # 匹配标题
+                if getattr(entity, "title", None):
+                    keys.append(entity.title.lower())
+                # 匹配用户名
+                if getattr(entity, "username", None):
+                    username = entity.username.lower()
+                    keys.append(username)
+                    keys.append(f"@{username}")
+                # 匹配名称
+                if getattr(entity, "first_name", None):
+                    keys.append(entity.first_name.lower())
 
-            # 匹配标题
-            if hasattr(entity, "title") and entity.title:
-                if entity.title.lower() == identifier_str:
-                    return entity
+                # 多个对话匹配同一标识时，以对话列表中靠前的为准
+                for key in keys:
+                    dialog_index.setdefault(key, entity)
+            account.dialog_index = dialog_index
+            logger.debug(
+                f"📋  账号 {account.name} 对话列表索引已建立，共 {len(dialog_index)} 项"
+            )
 
-            # 匹配用户名
-            if hasattr(entity, "username") and entity.username:
-                username = entity.username.lower()
-                if username == identifier_str or f"@{username}" == identifier_str:
-                    return entity
+        return account.dialog_index
 
-            # 匹配名称
-            if hasattr(entity, "first_name") and entity.first_name:
-                if entity.first_name.lower() == identifier_str:
-                    return entity
+    async def find_entity_in_dialogs(self, identifier, account: pool.Account = None):
+        """在对话列表中查找实体"""
+        dialog_index = await self.get_dialog_index(account)
+        return dialog_index.get(str(identifier).strip().lower())
 
-        return None
+    async def forward_message(self, messages: List[Any], destinations: List[Any]):
+        """转发消息到所有目标（加入发送队列，各目标独立发送，结果写入投递日志）"""
+        for chunk in self.chunk_messages(messages):
+            for dest in destinations:
+                on_done = None
+                if self.journal is not None:
+                    on_done = partial(
+                        self.journal.complete,
+                        chunk[0].chat_id,
+                        [m.id for m in chunk],
+                        dest["id"],
+                    )
+                self.send_queue.put(
+                    dest,
+                    lambda chunk=chunk, dest=dest: self.forward_to_destination(
+                        chunk, dest
+                    ),
+                    on_done,
+                )
+
+    def chunk_messages(self, messages: List[Any]) -> List[List[Any]]:
+        """按单次转发上限拆分消息（不拆分相册）"""
+        chunks = [[]]
+        for group in self.group_messages(messages):
+            if chunks[-1] and len(chunks[-1]) + len(group) > MAX_FORWARD_COUNT:
+                chunks.append([])
+            chunks[-1].extend(group)
+        return chunks
 
-    async def forward_message(self, event, destinations: List[Any]):
-        """转发消息到所有目标"""
-        message = event.message
-        message_text = message.text or message.raw_text or ""
-        media = message.media
+    async def forward_to_destination(self, messages: List[Any], dest: Dict[str, Any]):
+        """转发消息到单个目标（按策略选择账号，账号限流时换下一个，全部限流时交由发送队列重试）"""
+        for account in self.pool.candidates(dest["id"]):
+            peer = await account.input_peer(dest["entity"], dest.get("username"))
+            if peer is None:
+                continue
+            if len(self.pool) > 1:
+                await account.bucket.acquire()
 
-        for dest in destinations:
+            registry = metrics.REGISTRY
+            labels = {"destination": dest["name"], "account": account.name}
+            started = time.perf_counter()
             try:
-                # 直接转发原消息（保持原样）
-                await self.client.forward_messages(dest["entity"], message)
+                await self.send_to_destination(messages, dest, account, peer)
+            except errors.FloodWaitError as e:
+                account.flooded(dest["id"], e.seconds)
+                registry.inc("tg_flood_wait_seconds_total", e.seconds, **labels)
+                continue
+            except PEER_ERRORS:
+                account.stats["failed"] += 1
+                registry.inc("tg_forward_failures_total", **labels)
+                if account.primary:
+                    self.entity_cache.invalidate(dest["key"])
+                else:
+                    account.peers.pop(utils.get_peer_id(dest["entity"]), None)
+                raise
             except Exception:
-                try:
-                    if media:
-                        # 新建转发消息（不支持按钮）
-                        await self.client.send_file(
-                            dest["entity"],
-                            media,
-                            caption=message_text,
-                        )
-                    else:
-                        # 新建转发消息（仅支持文本）
-                        await self.client.send_message(
-                            dest["entity"],
-                            message_text,
-                        )
-                except Exception as e:
-                    logger.error(f"❌  转发消息到 {dest['name']} 失败: {e}")
+                account.stats["failed"] += 1
+                registry.inc("tg_forward_failures_total", **labels)
+                raise
+            account.stats["sent"] += 1
+            registry.inc("tg_forward_total", **labels)
+            registry.observe(
+                "tg_forward_seconds", time.perf_counter() - started, **labels
+            )
+            return
+
+        wait = self.pool.wait_time(dest["id"])
+        if wait > 0:
+            raise errors.FloodWaitError(None, capture=wait)
+        raise ValueError("没有可访问该目标的账号")
+
+    async def send_to_destination(
+        self,
+        messages: List[Any],
+        dest: Dict[str, Any],
+        account: pool.Account = None,
+        peer: Any = None,
+    ):
+        """发送消息到单个目标（多条消息一次转发，无法直接转发时新建消息）"""
+        account = account or self.pool.primary
+        peer = peer or dest["entity"]
+        try:
+            # 直接转发原消息（保持原样）
+            if messages[0].client in (None, account.client):
+                await account.client.forward_messages(peer, messages)
+            else:
+                # 消息由其他账号接收，按消息ID从该账号可见的来源转发
+                from_peer = await account.input_peer(messages[0].chat_id)
+                if from_peer is None:
+                    raise ValueError("账号无法访问来源")
+                await account.client.forward_messages(
+                    peer, [m.id for m in messages], from_peer=from_peer
+                )
+        except errors.FloodWaitError:
+            raise
+        except Exception:
+            metrics.REGISTRY.inc(
+                "tg_forward_fallback_total", destination=dest["name"], kind="copy"
+            )
+            for group in self.group_messages(messages):
+                await self.send_copy(group, dest, account, peer)
+
+    @staticmethod
+    def group_messages(messages: List[Any]) -> List[List[Any]]:
+        """按相册拆分消息（连续且 grouped_id 相同的媒体消息为一组）"""
+        groups = []
+        for message in messages:
+            if (
+                groups
+                and message.grouped_id
+                and message.media
+                and groups[-1][-1].grouped_id == message.grouped_id
+            ):
+                groups[-1].append(message)
+            else:
+                groups.append([message])
+        return groups
+
+    async def send_copy(
+        self,
+        messages: List[Any],
+        dest: Dict[str, Any],
+        account: pool.Account = None,
+        peer: Any = None,
+    ):
+        """新建消息发送（单条消息或相册）"""
+        account = account or self.pool.primary
+        peer = peer or dest["entity"]
+        captions = [m.text or m.raw_text or "" for m in messages]
+        message = messages[0]
+        if len(messages) == 1 and (
+            not message.media or isinstance(message.media, MessageMediaWebPage)
+        ):
+            # 新建转发消息（仅支持文本）
+            await account.client.send_message(
+                peer,
+                captions[0],
+            )
+            return
+
+        # 未受保护的媒体直接引用原文件发送（不支持按钮）
+        if not any(m.noforwards for m in messages):
+            try:
+                await self.send_media(
+                    account, peer, [m.media for m in messages], captions
+                )
+                return
+            except errors.FloodWaitError:
+                raise
+            except Exception as e:
+                logger.debug(f"📤  引用媒体发送失败，改为重新上传: {e}")
+
+        # 受保护的媒体下载后重新上传（同一媒体只上传一次，其余目标复用）
+        metrics.REGISTRY.inc(
+            "tg_forward_fallback_total", destination=dest["name"], kind="reupload"
+        )
+        for attempt in range(2):
+            handles = [await self.get_media_handle(m, account, peer) for m in messages]
+            try:
+                await self.send_media(account, peer, handles, captions)
+                return
+            except errors.FileReferenceExpiredError:
+                if attempt:
+                    raise
+                for m in messages:
+                    self.media_cache.pop((account.name, self.media_key(m)))
+
+    async def send_media(
+        self, account: pool.Account, peer: Any, media: List[Any], captions: List[str]
+    ):
+        """发送媒体（多个媒体为相册）"""
+        await account.client.send_file(
+            peer,
+            media if len(media) > 1 else media[0],
+            caption=captions if len(media) > 1 else captions[0],
+        )
+
+    @staticmethod
+    def media_key(message) -> Any:
+        """媒体缓存键（图片或文件ID）"""
+        if message.photo:
+            return ("photo", message.photo.id)
+        if message.document:
+            return ("document", message.document.id)
+        return None
+
+    async def get_media_handle(self, message, account: pool.Account, peer: Any) -> Any:
+        """获取可复用的媒体句柄（未缓存时下载并上传一次，句柄仅对上传的账号有效）"""
+        key = self.media_key(message)
+        if key is None:
+            return message.media
+        key = (account.name, key)
+
+        handle = self.media_cache.get(key)
+        if handle is not None:
+            return handle
+
+        async with self.media_cache.lock(key):
+            handle = self.media_cache.get(key)
+            if handle is not None:
+                return handle
+
+            start_time = time.perf_counter()
+            with tempfile.TemporaryDirectory() as temp_dir:
+                # 由接收该消息的账号下载，发送账号上传
+                path = await (message.client or account.client).download_media(
+                    message, file=temp_dir
+                )
+                uploaded = await account.client.upload_file(path)
+
+            if message.photo:
+                input_media = InputMediaUploadedPhoto(uploaded)
+            else:
+                input_media = InputMediaUploadedDocument(
+                    uploaded,
+                    mime_type=message.document.mime_type,
+                    attributes=message.document.attributes,
+                )
+            # 只上传不发送，得到可在多个目标复用的媒体引用
+            # peer 和上传的文件都属于发送账号，必须由同一账号请求
+            result = await account.client(
+                functions.messages.UploadMediaRequest(peer, input_media)
+            )
+            handle = utils.get_input_media(result)
+            self.media_cache.put(key, handle)
+            logger.debug(
+                f"📤  媒体重新上传完成 ({message.file.size or 0} 字节)，耗时 {time.perf_counter() - start_time:.2f} 秒"
+            )
+        return handle
+
+    async def get_file_handle(
+        self, path: str, account: pool.Account = None, stale: Any = None
+    ) -> Any:
+        """获取本地文件的上传句柄（按账号、路径、大小和修改时间缓存，文件未修改时只上传一次；
+        stale 为文件引用已过期的句柄，重新上传）"""
+        account = account or self.pool.primary
+        stat = os.stat(path)
+        key = (
+            f"{account.name}:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        )
+
+        if self.file_cache is None:
+            self.file_cache = cache.FileCache()
+        handle = self.file_cache.get(key)
+        if handle is not None and handle != stale:
+            return handle
+
+        async with self.media_cache.lock(key):
+            # 等待锁期间其他目标可能已重新上传
+            handle = self.file_cache.get(key)
+            if handle is None or handle == stale:
+                start_time = time.perf_counter()
+                uploaded = await account.client.upload_file(path)
+                if utils.is_image(path):
+                    input_media = InputMediaUploadedPhoto(uploaded)
+                else:
+                    attributes, mime_type = utils.get_attributes(path)
+                    input_media = InputMediaUploadedDocument(
+                        uploaded, mime_type=mime_type, attributes=attributes
+                    )
+                # 只上传不发送，得到可在多个目标和多次定时任务复用的媒体引用
+                result = await account.client(
+                    functions.messages.UploadMediaRequest(InputPeerSelf(), input_media)
+                )
+                handle = utils.get_input_media(result)
+                self.file_cache.set(key, handle)
+                logger.debug(
+                    f"📤  文件上传完成 {path} ({stat.st_size} 字节)，耗时 {time.perf_counter() - start_time:.2f} 秒"
+                )
+        return handle
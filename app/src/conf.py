@@ -1,23 +1,29 @@
+import asyncio
 import logging
 import os
-from typing import Dict, Any
+import sqlite3
+from typing import Dict, Any, Optional, Sequence
 import sys
-import time
 
 # 导入 ruamel.yaml
 from ruamel.yaml import YAML
 from ruamel.yaml.comments import CommentedMap, CommentedSeq
+from . import settings
 
 # 配置文件位置
 DATA_PATH = "/app/data/"
 CONFIG_FILE = DATA_PATH + "config.yaml"
 SESSION_FILE = DATA_PATH + "telegram.session"
+# 等待 Session 文件生成时的检查间隔秒数
+SESSION_POLL_INTERVAL = 5
 
 # 创建 YAML 实例并配置
 yaml = YAML()
 yaml.preserve_quotes = True
 yaml.indent(mapping=2, sequence=4, offset=2)
 yaml.width = 4096  # 防止长字符串换行
+# 运行时只读取配置，使用 C 解析器（不保留注释，比往返解析快约 6 倍），保存配置和定位出错行仍用 yaml
+fast_yaml = YAML(typ="safe")
 
 logger = logging.getLogger(__name__)
 
@@ -90,6 +96,13 @@ class ConfigManager:
                     ("id", "频道通知"),
                     ("include_keywords", ["重要", "通知"]),
                     ("exclude_keywords", ["广告", "推广"]),
+                    ("match_mode", "plain"),
+                    (
+                        "batch",
+                        CommentedMap(
+                            [("enable", False), ("window", 5), ("max_count", 20)]
+                        ),
+                    ),
                 ]
             )
             sources.append(source_item)
@@ -112,6 +125,21 @@ class ConfigManager:
             source_item.yaml_set_comment_before_after_key(
                 "exclude_keywords", before="排除关键词（可选）"
             )
+            source_item.yaml_set_comment_before_after_key(
+                "match_mode", before="匹配模式: plain(包含), word(整词), regex(正则)"
+            )
+            source_item.yaml_set_comment_before_after_key(
+                "batch", before="合并转发（高频来源可选）"
+            )
+            source_item["batch"].yaml_set_comment_before_after_key(
+                "enable", before="是否启用合并转发"
+            )
+            source_item["batch"].yaml_set_comment_before_after_key(
+                "window", before="合并时间窗口（秒）"
+            )
+            source_item["batch"].yaml_set_comment_before_after_key(
+                "max_count", before="单批最多消息数（不超过100）"
+            )
 
             # 转发目标配置
             destinations = CommentedSeq()
@@ -166,7 +194,90 @@ class ConfigManager:
             )
             sche_item.yaml_set_comment_before_after_key(
                 "message",
-                before="发送信息内容",
+                before="发送信息内容（支持 {{ date }} {{ time }} {{ weekday }} {{ count }} 等模板变量）",
+            )
+
+            # 转发限流配置
+            default_config["limits"] = CommentedMap(
+                [
+                    ("concurrency", 10),
+                    ("global_rate", 30),
+                    ("chat_rate", 1),
+                    ("max_retries", 5),
+                ]
+            )
+            default_config.yaml_set_comment_before_after_key(
+                "limits", before="\n转发限流配置（可选）"
+            )
+            default_config["limits"].yaml_set_comment_before_after_key(
+                "concurrency", before="同时发送的最大请求数"
+            )
+            default_config["limits"].yaml_set_comment_before_after_key(
+                "global_rate", before="全局每秒最多发送条数"
+            )
+            default_config["limits"].yaml_set_comment_before_after_key(
+                "chat_rate", before="单个目标每秒最多发送条数"
+            )
+            default_config["limits"].yaml_set_comment_before_after_key(
+                "max_retries", before="限流或网络错误时最多重试次数"
+            )
+
+            # 缓存配置
+            default_config["cache"] = CommentedMap(
+                [("entity_ttl", 86400), ("media_size", 100), ("media_age", 3600)]
+            )
+            default_config.yaml_set_comment_before_after_key(
+                "cache", before="\n缓存配置（可选）"
+            )
+            default_config["cache"].yaml_set_comment_before_after_key(
+                "entity_ttl", before="实体解析缓存有效期（秒），0 为不缓存"
+            )
+            default_config["cache"].yaml_set_comment_before_after_key(
+                "media_size", before="重新上传的媒体缓存数量"
+            )
+            default_config["cache"].yaml_set_comment_before_after_key(
+                "media_age", before="重新上传的媒体缓存有效期（秒）"
+            )
+
+            # 去重配置
+            default_config["dedup"] = CommentedMap(
+                [
+                    ("enable", False),
+                    ("window", 86400),
+                    ("max_size", 10000),
+                    ("distance", 3),
+                    ("persist", False),
+                ]
+            )
+            default_config.yaml_set_comment_before_after_key(
+                "dedup", before="\n跨来源去重配置（可选）"
+            )
+            default_config["dedup"].yaml_set_comment_before_after_key(
+                "enable", before="是否启用跨来源去重"
+            )
+            default_config["dedup"].yaml_set_comment_before_after_key(
+                "window", before="去重时间窗口（秒）"
+            )
+            default_config["dedup"].yaml_set_comment_before_after_key(
+                "max_size", before="最多保留的消息指纹数"
+            )
+            default_config["dedup"].yaml_set_comment_before_after_key(
+                "distance", before="近似重复的 SimHash 汉明距离"
+            )
+            default_config["dedup"].yaml_set_comment_before_after_key(
+                "persist", before="是否保存去重记录（重启后仍有效）"
+            )
+
+            # 下载配置
+            default_config["download"] = CommentedMap([("workers", 2), ("parallel", 4)])
+            default_config.yaml_set_comment_before_after_key(
+                "download", before="\n媒体下载配置（可选）"
+            )
+            default_config["download"].yaml_set_comment_before_after_key(
+                "workers", before="同时下载的文件数"
+            )
+            default_config["download"].yaml_set_comment_before_after_key(
+                "parallel", before="单个大文件分段并行下载数"
             )
 
             # 确保配置目录存在
@@ -184,20 +295,37 @@ class ConfigManager:
 
     @staticmethod
     def load_config() -> Dict[str, Any]:
-        """加载配置文件（保留注释）"""
+        """加载配置文件"""
         if not os.path.exists(CONFIG_FILE):
             logger.error(f"❌  配置文件不存在: {CONFIG_FILE}")
             sys.exit(1)
 
         try:
             with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                config = yaml.load(f)
+                config = fast_yaml.load(f)
             logger.info(f"✅  配置文件加载成功: {CONFIG_FILE}")
             return config
         except Exception as e:
             logger.error(f"❌  配置文件加载失败: {e}")
             sys.exit(1)
 
+    @staticmethod
+    def reload_config() -> Optional[settings.RuntimeConfig]:
+        """重新加载配置文件（加载或校验失败时返回 None，继续使用当前配置）"""
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                config = fast_yaml.load(f)
+        except Exception as e:
+            logger.error(f"❌  配置文件加载失败，继续使用当前配置: {e}")
+            return None
+
+        runtime_config = ConfigManager.compile_config(config)
+        if runtime_config is None:
+            logger.error("❌  配置文件校验失败，继续使用当前配置")
+            return None
+        logger.info(f"✅  配置文件重新加载成功: {CONFIG_FILE}")
+        return runtime_config
+
     @staticmethod
     def save_config(config: Dict[str, Any]):
         """保存配置文件（保留注释和顺序）"""
@@ -273,8 +401,11 @@ class ConfigManager:
                 existing[key] = value
 
     @staticmethod
-    def validate_config(config: Dict[str, Any]) -> bool:
-        """验证配置文件的必需字段"""
+    def validate_config(config: Dict[str, Any]):
+        """验证配置文件的必需字段（出错时抛出 ConfigError）"""
+        if not isinstance(config, dict):
+            raise settings.ConfigError("配置文件为空或格式无效")
+
         required_fields = {
             "telegram": ["api_id", "api_hash"],
             "sources": [],
@@ -284,30 +415,86 @@ class ConfigManager:
 
         for section, fields in required_fields.items():
             if section not in config:
-                logger.error(f"❌  配置缺少必需部分: {section}")
-                return False
+                raise settings.ConfigError(f"缺少必需部分: {section}")
 
             for field in fields:
-                if field not in config[section]:
-                    logger.error(f"❌  配置 {section} 缺少必需字段: {field}")
-                    return False
+                if field not in settings.section(config, section):
+                    raise settings.ConfigError(f"缺少必需字段: {field}", (section,))
 
-        api_id = config.get("telegram").get("api_id")
+        telegram = settings.section(config, "telegram")
+        api_id = telegram.get("api_id")
         if not api_id or api_id == "API_ID":
-            logger.error("❌  telegram配置中没有可用api_id")
-            return False
-        api_hash = config.get("telegram").get("api_hash")
+            raise settings.ConfigError("没有可用api_id", ("telegram", "api_id"))
+        api_hash = telegram.get("api_hash")
         if not api_hash or api_hash == "API_HASH":
-            logger.error("❌  telegram配置中没有可用api_hash")
-            return False
+            raise settings.ConfigError("没有可用api_hash", ("telegram", "api_hash"))
+        # 日志在校验通过后才按配置初始化
+        settings.section(config, "log")
 
-        # 检查session文件
-        if not os.path.exists(SESSION_FILE):
-            logger.error(f"❌  Session文件不存在: {SESSION_FILE}")
-            logger.warning(
-                "⚠️  请终端运行 docker exec -it telegram-tools python /app/src/login.py 生成Session文件"
-            )
-            time.sleep(3600)
+    @staticmethod
+    def compile_config(config: Dict[str, Any]) -> Optional[settings.RuntimeConfig]:
+        """校验并编译运行时配置（出错时输出所在行号并返回 None）"""
+        try:
+            ConfigManager.validate_config(config)
+            return settings.RuntimeConfig.from_config(config)
+        except settings.ConfigError as e:
+            e.line = ConfigManager.locate(e.path)
+            logger.error(f"❌  配置无效: {e}")
+            return None
+
+    @staticmethod
+    def locate(path: Sequence[Any]) -> Optional[int]:
+        """配置项在配置文件中的行号（仅出错时调用，按保留位置信息的方式重新解析）"""
+        if not path:
+            return None
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                node = yaml.load(f)
+        except Exception:
+            return None
+
+        line = None
+        for key in path:
+            try:
+                if isinstance(node, CommentedMap):
+                    line = node.lc.key(key)[0] + 1
+                elif isinstance(node, CommentedSeq):
+                    line = node.lc.item(key)[0] + 1
+                else:
+                    break
+                node = node[key]
+            except (KeyError, IndexError, TypeError):
+                # 缺少的配置项定位到上一级
+                break
+        return line
+
+    @staticmethod
+    def session_ready(session_file: str = SESSION_FILE) -> bool:
+        """Session 文件是否已完成登录（登录工具连接后即创建文件，登录成功并断开后才写入实体）"""
+        if not os.path.exists(session_file):
+            return False
+        try:
+            conn = sqlite3.connect(f"file:{session_file}?mode=ro", uri=True)
+            try:
+                return (
+                    conn.execute("SELECT 1 FROM entities LIMIT 1").fetchone()
+                    is not None
+                )
+            finally:
+                conn.close()
+        except sqlite3.Error:
             return False
 
-        return True
+    @staticmethod
+    async def wait_for_session(interval: float = SESSION_POLL_INTERVAL):
+        """等待 Session 文件生成（不阻塞事件循环，生成后继续启动）"""
+        if ConfigManager.session_ready():
+            return
+
+        logger.error(f"❌  Session文件不存在: {SESSION_FILE}")
+        logger.warning(
+            "⚠️  请终端运行 docker exec -it telegram-tools python /app/src/login.py 生成Session文件"
+        )
+        while not ConfigManager.session_ready():
+            await asyncio.sleep(interval)
+        logger.info(f"✅  已检测到Session文件，继续启动: {SESSION_FILE}")
@@ -0,0 +1,283 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+# 持久化文件位置
+DATA_PATH = "/app/data/"
+DEDUP_FILE = DATA_PATH + "dedup.db"
+DEFAULT_WINDOW = 86400
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_DISTANCE = 3
+# 规范化后少于该长度的文本不参与去重（如“签到”等短消息）
+MIN_TEXT_LENGTH = 10
+SHINGLE_SIZE = 3
+SIMHASH_BITS = 64
+
+# 去重时忽略链接、空白和标点
+URL_RE = re.compile(r"https?://\S+|t\.me/\S+")
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本（小写，去掉链接、空白和标点）"""
+    return NON_WORD_RE.sub("", URL_RE.sub("", text.lower()))
+
+
+def hash64(data: str) -> int:
+    """稳定的 64 位哈希（跨进程一致，可持久化）"""
+    return int.from_bytes(
+        hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+# 字节的每一位展开到 16 位宽的计数槽，多个哈希相加即得到每一位的计数
+SPREAD = [
+    sum(((byte >> bit) & 1) << (16 * bit) for bit in range(8)) for byte in range(256)
+]
+
+
+def simhash(text: str) -> int:
+    """计算 SimHash（按字符 n-gram 分词，适用于中文）"""
+    shingles = {
+        text[i : i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))
+    }
+    counts = [0] * 8
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for index, byte in enumerate(digest):
+            counts[index] += SPREAD[byte]
+
+    threshold = len(shingles) / 2
+    value = 0
+    for index, count in enumerate(counts):
+        for bit in range(8):
+            if (count >> (16 * bit)) & 0xFFFF > threshold:
+                value |= 1 << (index * 8 + bit)
+    return value
+
+
+@dataclass(slots=True, eq=False)
+class Fingerprint:
+    """一条消息（或相册）的指纹及已收到该消息的 scope（按对象比较）"""
+
+    created_at: float
+    keys: List[str]
+    value: Optional[int]
+    scopes: Set[str]
+
+
+class DedupIndex:
+    """消息去重索引（文本哈希、SimHash 近似重复、媒体ID，按时间窗口和消息数量淘汰）"""
+
+    def __init__(
+        self,
+        window: int = DEFAULT_WINDOW,
+        max_size: int = DEFAULT_MAX_SIZE,
+        distance: int = DEFAULT_DISTANCE,
+        path: Optional[str] = None,
+    ):
+        self.window = window
+        self.max_size = max_size
+        self.distance = distance
+        # 汉明距离不超过 distance 时，分成 distance+1 段至少有一段完全相同
+        self.bands = distance + 1
+        self.band_bits = SIMHASH_BITS // self.bands
+        # 每条消息一个指纹（按时间顺序），键和分段桶指向指纹
+        self.entries: Deque[Fingerprint] = deque()
+        self.keys: Dict[str, List[Fingerprint]] = {}
+        self.buckets: Dict[Tuple[int, int], List[Fingerprint]] = {}
+        self.conn = None
+        # 记录指纹后立即提交；与投递日志一起使用时由日志提交后调用 commit
+        self.autocommit = True
+        if path:
+            self.open(path)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["DedupIndex"]:
+        """从配置创建去重索引（未启用时返回 None）"""
+        dedup_config = config.get("dedup") or {}
+        if not dedup_config.get("enable", False):
+            return None
+        return cls(
+            window=dedup_config.get("window", DEFAULT_WINDOW),
+            max_size=dedup_config.get("max_size", DEFAULT_MAX_SIZE),
+            distance=dedup_config.get("distance", DEFAULT_DISTANCE),
+            path=DEDUP_FILE if dedup_config.get("persist", False) else None,
+        )
+
+    def open(self, path: str):
+        """打开持久化文件并载入时间窗口内的记录"""
+        try:
+            data_dir = os.path.dirname(path)
+            if data_dir and not os.path.exists(data_dir):
+                os.makedirs(data_dir)
+            self.conn = sqlite3.connect(path)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints (created_at REAL NOT NULL,"
+                " keys TEXT NOT NULL, simhash TEXT, scopes TEXT NOT NULL DEFAULT '')"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS fingerprints_created_at"
+                " ON fingerprints (created_at)"
+            )
+            self.conn.execute(
+                "DELETE FROM fingerprints WHERE created_at < ?",
+                (time.time() - self.window,),
+            )
+            self.conn.commit()
+            rows = self.conn.execute(
+                "SELECT created_at, keys, simhash, scopes FROM fingerprints"
+                " ORDER BY created_at"
+            ).fetchall()
+            for created_at, keys, value, scopes in rows:
+                self.insert(
+                    Fingerprint(
+                        created_at,
+                        keys.split("\n"),
+                        int(value, 16) if value else None,
+                        set(scopes.split("\n")),
+                    )
+                )
+            self.expire(time.time())
+            self.conn.commit()
+            logger.info(f"♻️  已载入 {len(self.entries)} 条去重记录")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  去重记录持久化不可用: {e}")
+            self.conn = None
+
+    @staticmethod
+    def fingerprint(messages: List[Any]) -> Tuple[List[str], List[str], Optional[int]]:
+        """计算消息指纹：文本键、媒体键、SimHash"""
+        text = normalize_text(
+            "\n".join(m.raw_text or "" for m in messages if m.raw_text)
+        )
+        text_keys = []
+        value = None
+        if len(text) >= MIN_TEXT_LENGTH:
+            text_keys.append(f"text:{hash64(text):016x}")
+            value = simhash(text)
+
+        media_keys = []
+        for m in messages:
+            if m.photo:
+                media_keys.append(f"photo:{m.photo.id}")
+            elif m.document:
+                media_keys.append(f"document:{m.document.id}")
+        return text_keys, media_keys, value
+
+    def filter_scopes(self, messages: List[Any], scopes: List[str]) -> List[str]:
+        """返回尚未收到该消息的 scope（如目标ID）并记录指纹，不同 scope 互不去重"""
+        now = time.time()
+        self.expire(now)
+
+        text_keys, media_keys, value = self.fingerprint(messages)
+        if not text_keys and not media_keys:
+            return scopes
+
+        if text_keys:
+            # 有文本时按文本判断（完全相同或近似相同）
+            matches = self.keys.get(text_keys[0], []) + self.find_similar(value)
+            seen = set().union(*(f.scopes for f in matches))
+        else:
+            # 纯媒体时所有媒体都出现过才算重复
+            seen = set.intersection(
+                *(
+                    set().union(*(f.scopes for f in self.keys.get(key, ())))
+                    for key in media_keys
+                )
+            )
+        fresh = [scope for scope in scopes if scope not in seen]
+        if not fresh:
+            return fresh
+
+        entry = Fingerprint(now, text_keys + media_keys, value, set(fresh))
+        self.insert(entry)
+        self.expire(now)
+        if self.conn is not None:
+            self.conn.execute(
+                "INSERT INTO fingerprints VALUES (?, ?, ?, ?)",
+                (
+                    now,
+                    "\n".join(entry.keys),
+                    f"{value:016x}" if value is not None else None,
+                    "\n".join(fresh),
+                ),
+            )
+            if self.autocommit:
+                self.conn.commit()
+        return fresh
+
+    def commit(self):
+        """提交已记录的指纹"""
+        if self.conn is not None and self.conn.in_transaction:
+            self.conn.commit()
+
+    def find_similar(self, value: int) -> List[Fingerprint]:
+        """按分段桶查找汉明距离在阈值内的 SimHash"""
+        similar = []
+        for band_key in self.band_keys(value):
+            for entry in self.buckets.get(band_key, ()):
+                if (
+                    bin(entry.value ^ value).count("1") <= self.distance
+                    and entry not in similar
+                ):
+                    similar.append(entry)
+        return similar
+
+    def band_keys(self, value: int):
+        """SimHash 分段桶"""
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.bands):
+            yield band, (value >> (band * self.band_bits)) & mask
+
+    def insert(self, entry: Fingerprint):
+        """写入内存索引"""
+        self.entries.append(entry)
+        for key in entry.keys:
+            self.keys.setdefault(key, []).append(entry)
+        if entry.value is not None:
+            for band_key in self.band_keys(entry.value):
+                self.buckets.setdefault(band_key, []).append(entry)
+
+    def expire(self, now: float):
+        """淘汰超出时间窗口或数量上限的记录（同时删除持久化的记录）"""
+        expired_at = None
+        while self.entries and (
+            len(self.entries) > self.max_size
+            or now - self.entries[0].created_at > self.window
+        ):
+            entry = self.entries.popleft()
+            expired_at = entry.created_at
+            for key in entry.keys:
+                self.remove(self.keys, key, entry)
+            if entry.value is not None:
+                for band_key in self.band_keys(entry.value):
+                    self.remove(self.buckets, band_key, entry)
+
+        if self.conn is not None and expired_at is not None:
+            self.conn.execute(
+                "DELETE FROM fingerprints WHERE created_at <= ?", (expired_at,)
+            )
+
+    @staticmethod
+    def remove(index: Dict[Any, List[Fingerprint]], key: Any, entry: Fingerprint):
+        """从键或分段桶中移除指纹"""
+        entries = index.get(key)
+        if entries:
+            entries.remove(entry)
+            if not entries:
+                del index[key]
+
+    def close(self):
+        """关闭持久化文件"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
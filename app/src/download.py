@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from . import metrics
+
+# 下载目录
+DOWNLOAD_PATH = "/app/downloads"
+# 未完成文件后缀（下载完成后原子重命名）
+PART_SUFFIX = ".part"
+# 已完成分段记录文件后缀（并行下载续传用）
+DONE_SUFFIX = ".done"
+# 单次请求大小（Telegram 允许的最大分块）
+CHUNK_SIZE = 512 * 1024
+# 并行下载时每段大小（分块大小的整数倍）
+PART_SIZE = 16 * CHUNK_SIZE
+DEFAULT_WORKERS = 2
+DEFAULT_PARALLEL = 4
+DEFAULT_RETRIES = 3
+# 下载任务在投递日志中的目标ID（0 不是有效的 peer id），未完成的下载重启后重新加入队列
+JOURNAL_DEST = 0
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadManager:
+    """媒体下载管理器（后台有限并发，分块流式写入最终目录，支持断点续传）"""
+
+    def __init__(
+        self,
+        client,
+        download_path: str = DOWNLOAD_PATH,
+        workers: int = DEFAULT_WORKERS,
+        retries: int = DEFAULT_RETRIES,
+        parallel: int = DEFAULT_PARALLEL,
+    ):
+        self.client = client
+        self.download_path = download_path
+        self.worker_count = max(1, workers)
+        self.retries = retries
+        self.parallel = max(1, parallel)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.workers = []
+        # 正在下载的目标文件，避免并发任务写同一个文件
+        self.reserved: Set[str] = set()
+
+    @classmethod
+    def from_config(cls, client, config: Dict[str, Any]) -> "DownloadManager":
+        """从配置创建下载管理器"""
+        download_config = config.get("download") or {}
+        return cls(
+            client,
+            download_path=download_config.get("path", DOWNLOAD_PATH),
+            workers=download_config.get("workers", DEFAULT_WORKERS),
+            retries=download_config.get("retries", DEFAULT_RETRIES),
+            parallel=download_config.get("parallel", DEFAULT_PARALLEL),
+        )
+
+    def submit(
+        self,
+        message,
+        filename: str,
+        on_done: Optional[Callable[[bool], Any]] = None,
+    ):
+        """加入下载队列（立即返回，不阻塞消息处理；下载完成或失败后调用 on_done）"""
+        if not self.workers:
+            self.workers = [
+                asyncio.create_task(self.worker()) for _ in range(self.worker_count)
+            ]
+        self.queue.put_nowait((message, filename, on_done))
+        logger.debug(f"📥  加入下载队列: {filename}（排队 {self.queue.qsize()} 个）")
+
+    async def worker(self):
+        """逐个处理下载任务"""
+        while True:
+            message, filename, on_done = await self.queue.get()
+            try:
+                await self.download(message, filename)
+                done = True
+            except Exception as e:
+                logger.error(f"❌  下载失败 {filename}: {e}")
+                done = False
+            finally:
+                self.queue.task_done()
+            # 被取消（停止运行）时不回调，未完成的下载保留在投递日志中
+            if on_done is not None:
+                on_done(done)
+
+    async def download(self, message, filename: str) -> str:
+        """下载媒体到最终目录，失败时从已下载部分继续"""
+        os.makedirs(self.download_path, exist_ok=True)
+        final_path = self.reserve_path(filename)
+        part_path = final_path + PART_SUFFIX
+        expected_size = message.file.size if message.file else None
+
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    start_time = time.perf_counter()
+                    # 大文件分段并行下载，小文件或大小未知时顺序下载
+                    if (
+                        self.parallel > 1
+                        and expected_size
+                        and expected_size > PART_SIZE
+                    ):
+                        offset, written = await self.fetch_parallel(
+                            message, part_path, expected_size
+                        )
+                    else:
+                        offset, written = await self.fetch(message, part_path)
+                    break
+                except (ConnectionError, asyncio.TimeoutError) as e:
+                    if attempt >= self.retries:
+                        raise
+                    logger.warning(
+                        f"⚠️  下载中断 {filename}，{2**attempt} 秒后继续: {e}"
+                    )
+                    await asyncio.sleep(2**attempt)
+
+            size = os.path.getsize(part_path)
+            if expected_size and size != expected_size:
+                raise IOError(f"文件大小不一致: {size}/{expected_size}")
+
+            # 下载完成后原子重命名为最终文件
+            os.replace(part_path, final_path)
+            if os.path.exists(part_path + DONE_SUFFIX):
+                os.remove(part_path + DONE_SUFFIX)
+        finally:
+            self.reserved.discard(final_path)
+
+        elapsed = max(time.perf_counter() - start_time, 1e-6)
+        metrics.REGISTRY.inc("tg_download_bytes_total", written)
+        metrics.REGISTRY.set("tg_download_speed_bytes", written / elapsed)
+        resumed = f"，续传自 {offset / 1024 / 1024:.1f} MB" if offset else ""
+        logger.info(
+            f"✅  下载完成: {final_path}（{size / 1024 / 1024:.1f} MB，{written / 1024 / 1024 / elapsed:.2f} MB/s{resumed}）"
+        )
+        return final_path
+
+    async def fetch(self, message, part_path: str) -> Tuple[int, int]:
+        """流式写入未完成文件，返回起始位置和本次写入字节数"""
+        # 从已下载部分继续（按分块大小对齐）
+        offset = 0
+        if os.path.exists(part_path):
+            offset = os.path.getsize(part_path)
+            offset -= offset % CHUNK_SIZE
+
+        written = 0
+        # 由接收该消息的账号下载（文件引用因账号而异）
+        client = message.client or self.client
+        with open(part_path, "r+b" if offset else "wb") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            async for chunk in client.iter_download(
+                message.media, offset=offset, request_size=CHUNK_SIZE
+            ):
+                # 磁盘写入放到线程中执行，不阻塞事件循环
+                await asyncio.to_thread(f.write, chunk)
+                written += len(chunk)
+            f.flush()
+            await asyncio.to_thread(os.fsync, f.fileno())
+        return offset, written
+
+    async def fetch_parallel(
+        self, message, part_path: str, size: int
+    ) -> Tuple[int, int]:
+        """分段并行下载，写入预分配文件的对应位置，返回已完成大小和本次写入字节数"""
+        part_count = (size + PART_SIZE - 1) // PART_SIZE
+        done_path = part_path + DONE_SUFFIX
+
+        # 读取已完成的分段（文件大小不符则重新下载）
+        done: Set[int] = set()
+        if (
+            os.path.exists(part_path)
+            and os.path.exists(done_path)
+            and os.path.getsize(part_path) == size
+        ):
+            with open(done_path, "r", encoding="utf-8") as f:
+                done = {int(line) for line in f if line.strip()}
+        else:
+            # 预分配文件
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            open(done_path, "w").close()
+
+        offset = sum(min(PART_SIZE, size - i * PART_SIZE) for i in done)
+        written = 0
+        semaphore = asyncio.Semaphore(self.parallel)
+        client = message.client or self.client
+        fd = os.open(part_path, os.O_WRONLY)
+        writes: Set[asyncio.Future] = set()
+
+        async def write(func, *args):
+            # 磁盘写入放到线程中执行，不阻塞事件循环；
+            # 分段被取消时线程仍在写入，关闭文件前等待其结束
+            future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+            writes.add(future)
+            future.add_done_callback(writes.discard)
+            return await asyncio.shield(future)
+
+        async def fetch_part(index: int):
+            nonlocal written
+            async with semaphore:
+                position = index * PART_SIZE
+                limit = (min(PART_SIZE, size - position) + CHUNK_SIZE - 1) // CHUNK_SIZE
+                async for chunk in client.iter_download(
+                    message.media,
+                    offset=position,
+                    limit=limit,
+                    request_size=CHUNK_SIZE,
+                    file_size=size,
+                ):
+                    await write(os.pwrite, fd, chunk, position)
+                    position += len(chunk)
+                    written += len(chunk)
+                # 分段数据落盘后再记录完成，避免崩溃后记录了未写入磁盘的分段
+                await write(os.fsync, fd)
+                with open(done_path, "a", encoding="utf-8") as f:
+                    f.write(f"{index}\n")
+
+        # iter_download 按媒体所在数据中心借用对应连接（自动导出授权）
+        tasks = [
+            asyncio.create_task(fetch_part(i))
+            for i in range(part_count)
+            if i not in done
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # 任一分段失败时停止其余分段，已完成分段下次续传
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.gather(*writes, return_exceptions=True)
+            os.close(fd)
+        return offset, written
+
+    def reserve_path(self, filename: str) -> str:
+        """分配目标文件路径（重名自动编号，同名未完成文件直接续传）"""
+        filename = filename.replace("/", "_").replace("\\", "_")
+        name, ext = os.path.splitext(filename)
+        index = 0
+        while True:
+            candidate = os.path.join(
+                self.download_path, f"{name} ({index}){ext}" if index else filename
+            )
+            if candidate not in self.reserved and not os.path.exists(candidate):
+                self.reserved.add(candidate)
+                return candidate
+            index += 1
+
+    def collect_metrics(self, registry):
+        """指标采集：下载队列积压"""
+        registry.set("tg_download_queue_depth", self.queue.qsize())
+
+    async def close(self):
+        """停止下载任务（未完成文件保留，启用投递日志时重启后续传）"""
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
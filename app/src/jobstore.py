@@ -0,0 +1,179 @@
+import logging
+import os
+import pickle
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+# 定时任务状态位置（与 telegram.session 同目录）
+DATA_PATH = "/app/data/"
+JOBSTORE_FILE = DATA_PATH + "scheduler.db"
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteJobStore(BaseJobStore):
+    """定时任务持久化（SQLite，保存触发器、下次和上次执行时间，重启后不丢失错过的执行）"""
+
+    def __init__(self, path: str = JOBSTORE_FILE):
+        super().__init__()
+        self.path = path
+        self.conn = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["SQLiteJobStore"]:
+        """从配置创建任务存储（未启用时返回 None，使用内存存储）"""
+        scheduler_config = config.get("scheduler") or {}
+        if not scheduler_config.get("persist", False):
+            return None
+        return cls()
+
+    def start(self, scheduler, alias: str):
+        super().start(scheduler, alias)
+        data_dir = os.path.dirname(self.path)
+        if data_dir and not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                next_run_time REAL,
+                last_run_time REAL,
+                run_count INTEGER NOT NULL DEFAULT 0,
+                job_state BLOB NOT NULL
+            )
+            """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")]
+        if "run_count" not in columns:
+            self.conn.execute(
+                "ALTER TABLE jobs ADD COLUMN run_count INTEGER NOT NULL DEFAULT 0"
+            )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_next_run_time ON jobs (next_run_time)"
+        )
+        self.conn.commit()
+
+    def lookup_job(self, job_id: str) -> Optional[Job]:
+        row = self.conn.execute(
+            "SELECT id, job_state FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        jobs = self.load_jobs([row]) if row else []
+        return jobs[0] if jobs else None
+
+    def get_due_jobs(self, now: datetime) -> List[Job]:
+        return self.query_jobs(
+            "WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),)
+        )
+
+    def get_next_run_time(self) -> Optional[datetime]:
+        row = self.conn.execute(
+            "SELECT MIN(next_run_time) FROM jobs WHERE next_run_time IS NOT NULL"
+        ).fetchone()
+        return utc_timestamp_to_datetime(row[0])
+
+    def get_all_jobs(self) -> List[Job]:
+        jobs = self.query_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job: Job):
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO jobs (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                    (
+                        job.id,
+                        datetime_to_utc_timestamp(job.next_run_time),
+                        pickle.dumps(job.__getstate__(), pickle.HIGHEST_PROTOCOL),
+                    ),
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job: Job):
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (
+                    datetime_to_utc_timestamp(job.next_run_time),
+                    pickle.dumps(job.__getstate__(), pickle.HIGHEST_PROTOCOL),
+                    job.id,
+                ),
+            )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id: str):
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM jobs")
+
+    def shutdown(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def record_run(self, job_id: str, run_time: datetime):
+        """记录上次执行时间"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET last_run_time = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(run_time), job_id),
+            )
+
+    def last_run_time(self, job_id: str) -> Optional[datetime]:
+        """上次执行时间（未执行过时为 None）"""
+        row = self.conn.execute(
+            "SELECT last_run_time FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def run_count(self, job_id: str) -> int:
+        """已发送次数"""
+        row = self.conn.execute(
+            "SELECT run_count FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def record_count(self, job_id: str, count: int):
+        """记录已发送次数"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET run_count = ? WHERE id = ?", (count, job_id)
+            )
+
+    def query_jobs(self, where: str = "", params: tuple = ()) -> List[Job]:
+        rows = self.conn.execute(
+            f"SELECT id, job_state FROM jobs {where} ORDER BY next_run_time", params
+        ).fetchall()
+        return self.load_jobs(rows)
+
+    def load_jobs(self, rows: List[tuple]) -> List[Job]:
+        """还原任务（无法还原的任务删除，由配置重新创建）"""
+        jobs = []
+        failed = []
+        for job_id, job_state in rows:
+            try:
+                state = pickle.loads(job_state)
+                state["jobstore"] = self
+                job = Job.__new__(Job)
+                job.__setstate__(state)
+                job._scheduler = self._scheduler
+                job._jobstore_alias = self._alias
+                jobs.append(job)
+            except Exception as e:
+                logger.warning(f"⚠️  定时任务 {job_id} 无法还原，已删除: {e}")
+                failed.append((job_id,))
+        if failed:
+            with self.conn:
+                self.conn.executemany("DELETE FROM jobs WHERE id = ?", failed)
+        return jobs
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 投递日志位置（与 telegram.session 同目录）
+DATA_PATH = "/app/data/"
+JOURNAL_FILE = DATA_PATH + "journal.db"
+DEFAULT_FLUSH_INTERVAL = 1
+DEFAULT_RETENTION = 604800
+DEFAULT_CATCHUP_LIMIT = 500
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryJournal:
+    """投递日志（SQLite WAL 模式，批量提交；重启后重发未完成的投递，按高水位补发停机期间的消息）"""
+
+    def __init__(
+        self,
+        path: str = JOURNAL_FILE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        retention: int = DEFAULT_RETENTION,
+        catchup_limit: int = DEFAULT_CATCHUP_LIMIT,
+    ):
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.catchup_limit = catchup_limit
+        # 待提交的投递记录：(来源ID, 消息ID, 目标ID, 状态, 时间)
+        self.rows: List[Tuple[int, int, Any, str, float]] = []
+        # 每个来源已处理的最大消息ID
+        self.watermarks: Dict[int, int] = {}
+        self.dirty: Dict[int, int] = {}
+        # 日志提交后调用（如提交去重指纹，保证指纹不会先于投递记录落盘）
+        self.after_flush: List[Callable[[], Any]] = []
+        self.flusher = None
+        self.conn = None
+        self.open(path)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["DeliveryJournal"]:
+        """从配置创建投递日志（未启用时返回 None，回溯依赖日志记录的处理位置，启用回溯时同时启用）"""
+        journal_config = config.get("journal") or {}
+        backfill_config = config.get("backfill") or {}
+        if not (
+            journal_config.get("enable", False) or backfill_config.get("enable", False)
+        ):
+            return None
+        return cls(
+            flush_interval=journal_config.get("flush_interval", DEFAULT_FLUSH_INTERVAL),
+            retention=journal_config.get("retention", DEFAULT_RETENTION),
+            catchup_limit=journal_config.get("catchup_limit", DEFAULT_CATCHUP_LIMIT),
+        )
+
+    def open(self, path: str):
+        """打开日志文件，清理过期记录并载入高水位"""
+        try:
+            data_dir = os.path.dirname(path)
+            if data_dir and not os.path.exists(data_dir):
+                os.makedirs(data_dir)
+            self.conn = sqlite3.connect(path)
+            # WAL 模式下每次提交只追加写日志文件，批量提交减少 fsync 次数
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=FULL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS deliveries (
+                    source_id INTEGER NOT NULL,
+                    msg_id INTEGER NOT NULL,
+                    dest_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (source_id, msg_id, dest_id)
+                ) WITHOUT ROWID
+                """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    source_id INTEGER PRIMARY KEY,
+                    msg_id INTEGER NOT NULL
+                )
+                """)
+            self.conn.execute(
+                "DELETE FROM deliveries WHERE status != ? AND updated_at < ?",
+                (PENDING, time.time() - self.retention),
+            )
+            self.conn.commit()
+            self.watermarks = dict(
+                self.conn.execute("SELECT source_id, msg_id FROM watermarks")
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  投递日志不可用: {e}")
+            self.conn = None
+
+    def advance(self, source_id: int, msg_ids: List[int]):
+        """更新来源高水位（收到消息时调用，不论是否转发）"""
+        msg_id = max(msg_ids)
+        if msg_id > self.watermarks.get(source_id, 0):
+            self.watermarks[source_id] = msg_id
+            self.dirty[source_id] = msg_id
+            self.schedule()
+
+    def record(self, source_id: int, msg_ids: List[int], dest_ids: List[Any]):
+        """记录待投递（与高水位在同一批提交）"""
+        now = time.time()
+        self.rows += [
+            (source_id, msg_id, dest_id, PENDING, now)
+            for msg_id in msg_ids
+            for dest_id in dest_ids
+        ]
+        self.schedule()
+
+    def complete(self, source_id: int, msg_ids: List[int], dest_id: Any, sent: bool):
+        """记录投递结果"""
+        now = time.time()
+        status = SENT if sent else FAILED
+        self.rows += [(source_id, msg_id, dest_id, status, now) for msg_id in msg_ids]
+        self.schedule()
+
+    def schedule(self):
+        """等待一个提交间隔后批量提交"""
+        if self.flusher is None and self.conn is not None:
+            self.flusher = asyncio.create_task(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self.flusher = None
+        self.flush()
+
+    def flush(self):
+        """提交缓存的记录（一次事务，一次 fsync）"""
+        rows, self.rows = self.rows, []
+        dirty, self.dirty = self.dirty, {}
+        if self.conn is None:
+            return
+
+        if rows or dirty:
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO deliveries VALUES (?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO watermarks VALUES (?, ?)", dirty.items()
+                    )
+            except sqlite3.Error as e:
+                # 保留未写入的记录（排在之后产生的记录之前），下个提交间隔重试
+                logger.error(f"❌  写入投递日志失败，稍后重试: {e}")
+                self.rows = rows + self.rows
+                for source_id, msg_id in dirty.items():
+                    self.dirty[source_id] = max(msg_id, self.dirty.get(source_id, 0))
+                self.schedule()
+                return
+        for callback in self.after_flush:
+            callback()
+
+    def pending(self) -> Dict[int, Dict[Any, List[int]]]:
+        """未完成的投递：来源ID -> 目标ID -> 消息ID列表"""
+        self.flush()
+        result: Dict[int, Dict[Any, List[int]]] = {}
+        if self.conn is None:
+            return result
+
+        rows = self.conn.execute(
+            "SELECT source_id, dest_id, msg_id FROM deliveries WHERE status = ?"
+            " ORDER BY source_id, msg_id",
+            (PENDING,),
+        )
+        for source_id, dest_id, msg_id in rows:
+            result.setdefault(source_id, {}).setdefault(dest_id, []).append(msg_id)
+        return result
+
+    def watermark(self, source_id: int) -> Optional[int]:
+        """来源已处理的最大消息ID（未记录时为 None）"""
+        return self.watermarks.get(source_id)
+
+    async def close(self):
+        """提交剩余记录并关闭"""
+        self.flush()
+        # 已安排的提交（包括提交失败后的重试）不再执行
+        if self.flusher is not None:
+            self.flusher.cancel()
+            self.flusher = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
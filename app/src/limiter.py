@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import Any, Dict
+from . import settings
+from .settings import DEFAULT_CHAT_RATE, DEFAULT_GLOBAL_RATE
+
+
+class TokenBucket:
+    """令牌桶"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """获取一个令牌（不足时等待，按调用顺序排队）"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """发送限流器（全局令牌桶 + 每个目标独立令牌桶）"""
+
+    def __init__(
+        self,
+        global_rate: float = DEFAULT_GLOBAL_RATE,
+        chat_rate: float = DEFAULT_CHAT_RATE,
+    ):
+        self.chat_rate = chat_rate
+        self.global_bucket = TokenBucket(global_rate, max(1, global_rate))
+        self.chat_buckets: Dict[Any, TokenBucket] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RateLimiter":
+        """从配置创建限流器"""
+        limits = settings.Limits.from_config(config)
+        return cls(global_rate=limits.global_rate, chat_rate=limits.chat_rate)
+
+    def set_global_rate(self, global_rate: float):
+        """调整全局配额（多账号时按账号数累加）"""
+        self.global_bucket = TokenBucket(global_rate, max(1, global_rate))
+
+    async def acquire(self, chat_id: Any):
+        """获取指定目标的发送许可"""
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, max(1, self.chat_rate))
+            self.chat_buckets[chat_id] = bucket
+
+        # 先按目标排队，再占用全局配额，避免慢目标占住全局令牌
+        await bucket.acquire()
+        await self.global_bucket.acquire()
@@ -1,28 +1,132 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+from typing import Any, Dict
 
 # 日志文件位置
 LOG_FILE = "/app/log/console.log"
+DEFAULT_LEVEL = "INFO"
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+# 轮转方式：size 按大小，time 按时间（每天零点）
+ROTATE_MODES = ("size", "time")
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON 日志格式（每行一条，便于日志采集）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """日志入队（只合并参数和异常文本，格式化留给后台线程）"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
 
 
 class Log:
-    def __init__(self, level: str):
+    """日志配置（事件循环只把日志放入队列，由后台线程写文件和控制台）"""
+
+    def __init__(
+        self,
+        level: str = DEFAULT_LEVEL,
+        rotate: str = "size",
+        max_size: int = DEFAULT_MAX_SIZE,
+        backup_count: int = DEFAULT_BACKUP_COUNT,
+        json_format: bool = False,
+    ):
         # 确保配置目录存在
         log_dir = os.path.dirname(LOG_FILE)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir)
 
-        # 配置日志
-        logging.basicConfig(
-            level=level,
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            handlers=[
-                logging.FileHandler(LOG_FILE, mode="w", encoding="utf-8"),
-                logging.StreamHandler(),
-            ],
+        if rotate == "time":
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                LOG_FILE, when="midnight", backupCount=backup_count, encoding="utf-8"
+            )
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                LOG_FILE, maxBytes=max_size, backupCount=backup_count, encoding="utf-8"
+            )
+        formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+        handlers = [file_handler, logging.StreamHandler()]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        # 配置日志（替换已有的处理器）
+        self.listener = logging.handlers.QueueListener(
+            queue.SimpleQueue(), *handlers, respect_handler_level=True
         )
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(QueueHandler(self.listener.queue))
+        self.set_level(level)
+        self.listener.start()
+        # 后台线程是否在运行（stop 可能被调用多次：替换配置时和程序退出时）
+        self.running = True
+        # 程序退出（包括配置错误直接退出）前写完队列中的日志
+        atexit.register(self.stop)
 
         # 关闭 Telethon 的频道更新 INFO 日志，只显示 WARNING 及以上级别
         logging.getLogger("telethon").setLevel(logging.WARNING)
         # 关闭 APScheduler 的 INFO 日志，只显示 WARNING 及以上级别
         logging.getLogger("apscheduler").setLevel(logging.WARNING)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Log":
+        """从配置创建日志"""
+        log_config = config.get("log") or {}
+        rotate = log_config.get("rotate", "size")
+        if rotate not in ROTATE_MODES:
+            rotate = "size"
+        return cls(
+            level=log_config.get("level", DEFAULT_LEVEL),
+            rotate=rotate,
+            max_size=log_config.get("max_size", DEFAULT_MAX_SIZE),
+            backup_count=log_config.get("backup_count", DEFAULT_BACKUP_COUNT),
+            json_format=log_config.get("json", False),
+        )
+
+    @staticmethod
+    def set_level(level: Any):
+        """设置日志级别（不支持的级别使用 INFO）"""
+        level = str(level or DEFAULT_LEVEL).upper()
+        if not isinstance(logging.getLevelName(level), int):
+            logging.getLogger(__name__).warning(f"⚠️  不支持的日志级别: {level}")
+            level = DEFAULT_LEVEL
+        logging.getLogger().setLevel(level)
+
+    def stop(self):
+        """写完队列中的日志并关闭文件"""
+        if not self.running:
+            return
+        self.running = False
+        atexit.unregister(self.stop)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
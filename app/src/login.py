@@ -1,5 +1,6 @@
 import asyncio
 import os
+import sys
 from telethon import TelegramClient
 from telethon.tl.types import User
 from ruamel.yaml import YAML
@@ -65,8 +66,8 @@ def get_proxy(proxy_config):
     return proxy_dict
 
 
-async def generate_session_file():
-    """生成.session文件"""
+async def generate_session_file(session_file: str = SESSION_FILE):
+    """生成.session文件（附加账号传入会话名称，如 login.py backup）"""
 
     print("=" * 50)
     print("🧰  Telegram Session文件生成工具  🧰")
@@ -98,11 +99,11 @@ async def generate_session_file():
         print("❌  错误: API ID必须是数字")
         return
 
-    print(f"\n📁  Session文件将保存为: {SESSION_FILE}")
+    print(f"\n📁  Session文件将保存为: {session_file}")
 
     # 创建客户端
     client = TelegramClient(
-        SESSION_FILE.replace(".session", ""),
+        session_file.replace(".session", ""),
         api_id,
         api_hash,
         proxy=get_proxy(config.get("proxy")),
@@ -124,13 +125,13 @@ async def generate_session_file():
             )
 
         # 检查session文件是否生成
-        if os.path.exists(SESSION_FILE):
-            print(f"\n📁  Session文件已生成: {SESSION_FILE}")
+        if os.path.exists(session_file):
+            print(f"\n📁  Session文件已生成: {session_file}")
             print("\n⚠️  重要提示:")
             print("   - 请妥善保管.session文件，不要分享给他人")
             print("   - 此文件具有账户的完全访问权限")
         else:
-            print(f"\n❌  Session文件生成失败: {SESSION_FILE}")
+            print(f"\n❌  Session文件生成失败: {session_file}")
 
     except Exception as e:
         print(f"\n❌  错误: {e}")
@@ -141,7 +142,10 @@ async def generate_session_file():
 def main():
     """主函数"""
     try:
-        asyncio.run(generate_session_file())
+        session_file = SESSION_FILE
+        if len(sys.argv) > 1:
+            session_file = DATA_PATH + sys.argv[1].removesuffix(".session") + ".session"
+        asyncio.run(generate_session_file(session_file))
     except KeyboardInterrupt:
         print("\n\n↘️  用户取消操作")
     except Exception as e:
@@ -0,0 +1,85 @@
+import re
+from typing import Any, Dict, List, Optional, Pattern
+
+# 匹配模式：plain 包含匹配，word 整词匹配，regex 正则匹配
+MATCH_MODES = ("plain", "word", "regex")
+
+
+def trie_pattern(keywords: List[str]) -> str:
+    """将关键词构建为前缀树正则（公共前缀只匹配一次，效果接近 Aho-Corasick）"""
+    trie: Dict[str, Any] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = []
+        chars = []
+        for char in sorted(key for key in node if key):
+            child = build(node[char])
+            if child:
+                branches.append(re.escape(char) + child)
+            else:
+                chars.append(re.escape(char))
+        if chars:
+            branches.append(chars[0] if len(chars) == 1 else f"[{''.join(chars)}]")
+        if not branches:
+            return ""
+
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # 当前节点本身是关键词结尾时，后续部分可选
+        if "" in node:
+            pattern = f"(?:{pattern})?"
+        return pattern
+
+    return build(trie)
+
+
+def compile_keywords(keywords: List[Any], mode: str = "plain") -> Optional[Pattern]:
+    """将关键词列表编译为单个正则（一次扫描匹配全部关键词）"""
+    keywords = [str(keyword) for keyword in keywords or [] if str(keyword)]
+    if not keywords:
+        return None
+
+    if mode == "regex":
+        return re.compile(
+            "|".join(f"(?:{keyword})" for keyword in keywords), re.IGNORECASE
+        )
+
+    # 文本统一小写后匹配
+    pattern = trie_pattern({keyword.lower() for keyword in keywords})
+    if mode == "word":
+        pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+    return re.compile(pattern)
+
+
+class KeywordFilter:
+    """关键词过滤器（启动时预编译包含/排除关键词）"""
+
+    def __init__(
+        self,
+        include_keywords: List[Any],
+        exclude_keywords: List[Any],
+        mode: str = "plain",
+    ):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"不支持的匹配模式: {mode}")
+        self.mode = mode
+        self.include = compile_keywords(include_keywords, mode)
+        self.exclude = compile_keywords(exclude_keywords, mode)
+
+    def match(self, text: str) -> bool:
+        """判断消息是否满足包含且不满足排除条件"""
+        if not text:
+            return False
+
+        # 正则模式忽略大小写编译，其余模式只做一次小写转换
+        if self.mode != "regex":
+            text = text.lower()
+
+        if self.exclude is not None and self.exclude.search(text):
+            return False
+        # 如果没有设置包含关键词，则默认所有消息都满足包含条件
+        return self.include is None or self.include.search(text) is not None
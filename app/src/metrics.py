@@ -0,0 +1,218 @@
+import asyncio
+import bisect
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9090
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+FILTER_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01)
+
+# 指标定义：名称 -> (类型, 说明, 直方图分桶)
+DEFINITIONS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "tg_messages_received_total": ("counter", "来源收到的消息数", ()),
+    "tg_messages_matched_total": ("counter", "关键词匹配的消息数", ()),
+    "tg_messages_duplicate_total": ("counter", "去重跳过的消息数", ()),
+    "tg_filter_seconds": ("histogram", "关键词过滤耗时", FILTER_BUCKETS),
+    "tg_forward_seconds": ("histogram", "单个目标发送耗时", LATENCY_BUCKETS),
+    "tg_forward_total": ("counter", "发送成功的批次数", ()),
+    "tg_forward_failures_total": ("counter", "发送失败的批次数", ()),
+    "tg_forward_fallback_total": ("counter", "无法直接转发改为新建消息的次数", ()),
+    "tg_flood_wait_seconds_total": ("counter", "FloodWait 等待秒数", ()),
+    "tg_send_queue_depth": ("gauge", "发送队列积压数", ()),
+    "tg_send_queue_wait_seconds": (
+        "histogram",
+        "消息在发送队列中的等待秒数",
+        LATENCY_BUCKETS,
+    ),
+    "tg_send_parked_destinations": ("gauge", "因限流或重试暂停中的目标数", ()),
+    "tg_send_retries_total": ("counter", "发送重试次数", ()),
+    "tg_send_flood_parks_total": ("counter", "发送队列因 FloodWait 暂停目标的次数", ()),
+    "tg_send_parked_seconds_total": ("counter", "目标因限流或重试退避暂停的总秒数", ()),
+    "tg_download_bytes_total": ("counter", "下载字节数", ()),
+    "tg_download_speed_bytes": ("gauge", "最近一次下载速度（字节/秒）", ()),
+    "tg_download_queue_depth": ("gauge", "下载队列积压数", ()),
+    "tg_scheduler_lateness_seconds": (
+        "histogram",
+        "定时任务延迟执行秒数",
+        LATENCY_BUCKETS,
+    ),
+    "tg_scheduler_duration_seconds": (
+        "histogram",
+        "定时任务发送到全部目标的耗时",
+        LATENCY_BUCKETS,
+    ),
+    "tg_scheduler_missed_total": ("counter", "错过执行的定时任务数", ()),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """指标注册表（Prometheus 文本格式，未启用时记录方法直接返回）"""
+
+    def __init__(self):
+        self.enabled = False
+        self.values: Dict[Tuple[str, Labels], float] = {}
+        # 直方图：(名称, 标签) -> [各分桶计数, 总和, 总数]
+        self.histograms: Dict[Tuple[str, Labels], List[Any]] = {}
+        # 抓取时计算的指标（如队列积压）
+        self.collectors: List[Callable[["Metrics"], None]] = []
+
+    def inc(self, name: str, value: float = 1, **labels: Any):
+        """计数器累加"""
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: Any):
+        """设置仪表值"""
+        if not self.enabled:
+            return
+        self.values[(name, label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels: Any):
+        """直方图记录一次观测"""
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = [[0] * (len(DEFINITIONS[name][2]) + 1), 0.0, 0]
+            self.histograms[key] = histogram
+        histogram[0][bisect.bisect_left(DEFINITIONS[name][2], value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    def add_collector(self, collector: Callable[["Metrics"], None]):
+        """注册抓取时调用的采集函数"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        for collector in self.collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                logger.debug(f"❗  指标采集失败: {e}")
+
+        lines = []
+        for name, (kind, help_text, buckets) in DEFINITIONS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                for (key_name, labels), value in self.values.items():
+                    if key_name == name:
+                        lines.append(f"{name}{format_labels(labels)} {value:g}")
+                continue
+
+            for (key_name, labels), (counts, total, count) in self.histograms.items():
+                if key_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    bucket_labels = format_labels(labels + (("le", le),))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: Labels) -> str:
+    """格式化标签（转义反斜杠、引号和换行）"""
+    if not labels:
+        return ""
+    pairs = (
+        '{}="{}"'.format(
+            key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for key, value in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def label_key(labels: Dict[str, Any]) -> Labels:
+    """标签排序后作为索引键"""
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+# 全局指标注册表
+REGISTRY = Metrics()
+
+
+class MetricsServer:
+    """本地 HTTP 指标服务（GET /metrics）"""
+
+    def __init__(
+        self,
+        registry: Metrics = REGISTRY,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["MetricsServer"]:
+        """从配置创建指标服务（未启用时返回 None）"""
+        metrics_config = config.get("metrics") or {}
+        if not metrics_config.get("enable", False):
+            return None
+        return cls(
+            host=metrics_config.get("host", DEFAULT_HOST),
+            port=metrics_config.get("port", DEFAULT_PORT),
+        )
+
+    async def start(self):
+        """启用指标记录并开始监听"""
+        self.registry.enabled = True
+        try:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+            logger.info(f"📈  指标服务已启动: http://{self.host}:{self.port}/metrics")
+        except OSError as e:
+            logger.error(f"❌  指标服务启动失败: {e}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理单个 HTTP 请求"""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 读完请求头
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (
+                b"\r\n",
+                b"\n",
+                b"",
+            ):
+                pass
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] == "/metrics":
+                status = "200 OK"
+                body = self.registry.render().encode("utf-8")
+            else:
+                status = "404 Not Found"
+                body = b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        """停止监听"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
@@ -1,173 +1,667 @@
-from telethon import events
+from datetime import date, datetime
+from telethon import events, utils
+from telethon.tl.types import PeerUser
+import asyncio
 import logging
-from typing import Dict, Any
-from . import client
-import os
+import time
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from . import batcher, client, dedup, download, metrics, pool, settings
 import re
-import shutil
+from functools import partial
+
+# 回溯每页消息数（GetHistory 单次请求上限为 100）
+BACKFILL_PAGE_SIZE = 100
+DEFAULT_BACKFILL_LIMIT = 1000
 
 logger = logging.getLogger(__name__)
-temp_filepath = "/app/temp"
-download_filepath = "/app/downloads"
 
 
 class TelegramMonitor:
     """Telegram监控器"""
 
     def __init__(self, config: Dict[str, Any]):
-        self.config = config
+        self.config = settings.RuntimeConfig.from_config(config)
+        self.client_manage = None
+        self.downloader = None
+        self.dedup = None
+        # 来源索引：peer id -> 来源名称、过滤器、目标列表
+        self.source_index: Dict[int, settings.Route] = {}
+        # 回溯中的来源：peer id -> 暂存的实时消息
+        self.backfilling: Dict[int, List[List[Any]]] = {}
+        self.backfill_task = None
+        # 已解析的实体：(账号, 配置标识) -> 解析结果
+        self.resolved: Dict[Any, Dict[str, Any]] = {}
+        # 已注册消息处理器的客户端
+        self.handler_clients: List[Any] = []
 
     async def start_monitor(self, client_manage: client.ClientManage):
         """开始监控"""
+        self.client_manage = client_manage
+        self.downloader = download.DownloadManager.from_config(
+            client_manage.client, self.config
+        )
+        self.dedup = dedup.DedupIndex.from_config(self.config)
+        # 去重指纹在投递日志（高水位、待投递记录）落盘后再提交，
+        # 否则崩溃后补发的消息会被当作重复跳过
+        journal = client_manage.journal
+        if self.dedup is not None and journal is not None and journal.conn is not None:
+            self.dedup.autocommit = False
+            journal.after_flush.append(self.dedup.commit)
+
+        valid_destinations = await self.configure(client_manage)
+        if not valid_destinations:
+            return
+        logger.info("🔍  实时监控转发已启动，等待新消息...")
+
+        # 后台重发上次未完成的投递并回溯历史消息，期间实时消息暂存
+        if client_manage.journal is not None:
+            self.backfilling = {source_id: [] for source_id in self.source_index}
+            self.backfill_task = asyncio.create_task(
+                self.recover(client_manage, valid_destinations)
+            )
+
+    async def reload(self, config: Dict[str, Any]):
+        """热更新来源、目标、关键词和路由（保持连接，只解析变更的实体）"""
+        self.config = settings.RuntimeConfig.from_config(config)
+        # 按名称查找的新实体可能是启动后才加入的对话
+        for account in self.client_manage.pool.accounts:
+            account.dialog_index = None
+        if await self.configure(self.client_manage):
+            logger.info("🔄  监控配置已更新")
+
+    async def configure(
+        self, client_manage: client.ClientManage
+    ) -> List[Dict[str, Any]]:
+        """解析来源和目标、建立路由表并注册消息处理器，返回有效目标（过滤器已在加载配置时编译）"""
         # 检查是否有启用的源和目标
-        enabled_sources = [
-            s for s in self.config.get("sources", []) if s.get("enabled", False)
-        ]
-        enabled_destinations = [
-            d for d in self.config.get("destinations", []) if d.get("enabled", False)
-        ]
-        if not enabled_sources and not enabled_destinations:
+        config = self.config
+        if not config.sources and not config.destinations:
             logger.warning("⚠️  没有启用的来源和目标，关闭转发功能")
-            return
+            await self.swap({}, [])
+            return []
 
         # 获取源实体
-        sources = self.config.get("sources", [])
-        enabled_sources = [s for s in sources if s.get("enabled", False)]
-        logger.info(f"📡  来源数量: {len(enabled_sources)}/{len(sources)}")
-        source_entities = await client_manage.resolve_entities(enabled_sources)
-        valid_sources = [s for s in source_entities if s["entity"] is not None]
+        logger.info(f"📡  来源数量: {len(config.sources)}/{config.source_count}")
+        # 各账号监控自己的来源（未指定账号的由主账号监控）
+        source_accounts = {}
+        for source in config.sources:
+            account_name = source.account or pool.PRIMARY_ACCOUNT
+            account = client_manage.pool.get(account_name)
+            if account is None:
+                logger.error(f"❌  来源 {source.id} 的账号 {account_name} 不可用")
+                continue
+            # 解析结果写入新的标识字典，配置本身保持不变
+            source_accounts.setdefault(account.name, (account, []))[1].append(
+                {"id": source.id, "source": source}
+            )
+
+        valid_sources = []
+        for account, account_sources in source_accounts.values():
+            valid_sources += await self.resolve(client_manage, account_sources, account)
 
         if not valid_sources:
             logger.error("❌  没有有效来源实体，转发功能无法启动")
-            return
+            await self.swap({}, [])
+            return []
 
         # 显示监控配置
         logger.info(f"📡  开始监控 {len(valid_sources)} 个来源")
         for source in valid_sources:
-            source_config = next(
-                (s for s in enabled_sources if s["id"] == source["id"]), {}
-            )
-            include_keywords = source_config.get("include_keywords", [])
-            exclude_keywords = source_config.get("exclude_keywords", [])
+            source_config = source["source"]
             logger.info(
-                f"    - {source['name']} (ID: {source['id']}, 包含: {include_keywords}, 排除: {exclude_keywords})"
+                f"    - {source['name']} (ID: {source['id']}, 包含: {list(source_config.include_keywords)}, 排除: {list(source_config.exclude_keywords)}, 模式: {source_config.match_mode})"
             )
 
         # 获取目标实体
-        destinations = self.config.get("destinations", [])
-        enabled_destinations = [d for d in destinations if d.get("enabled", False)]
-        logger.info(f"🎯  目标数量: {len(enabled_destinations)}/{len(destinations)}")
-        destination_entities = await client_manage.resolve_entities(
-            enabled_destinations
+        logger.info(
+            f"🎯  目标数量: {len(config.destinations)}/{config.destination_count}"
+        )
+        valid_destinations = await self.resolve(
+            client_manage, [{"id": dest.id} for dest in config.destinations]
         )
-        valid_destinations = [
-            s for s in destination_entities if s["entity"] is not None
-        ]
+
+        # 来源/规则中直接填写、未在目标配置中的目标
+        destination_lookup = self.build_destination_lookup(valid_destinations)
+        inline_destinations = []
+        for ref in self.destination_refs([s["source"] for s in valid_sources]):
+            key = str(ref).strip().lower()
+            if key in destination_lookup or key in config.disabled_destinations:
+                continue
+            if all(str(d["id"]).strip().lower() != key for d in inline_destinations):
+                inline_destinations.append({"id": ref})
+        if inline_destinations:
+            inline_destinations = await self.resolve(client_manage, inline_destinations)
+            valid_destinations += inline_destinations
+            destination_lookup = self.build_destination_lookup(valid_destinations)
 
         if not valid_destinations:
             logger.error("❌  没有有效的目标实体，转发功能无法启动")
-            return
+            await self.swap({}, [])
+            return []
 
         # 显示目标配置
         logger.info(f"🎯  开始转发 {len(valid_destinations)} 个目标")
         for dest in valid_destinations:
             logger.info(f"    - {dest['name']} (ID: {dest['id']})")
 
-        # 创建消息处理器
-        @client_manage.client.on(
-            events.NewMessage(chats=[s["entity"] for s in valid_sources])
+        # 建立来源索引（含路由表），消息处理时按 chat_id 直接查找
+        default_destinations = [
+            d for d in valid_destinations if d not in inline_destinations
+        ]
+        source_index = self.build_source_index(
+            valid_sources, default_destinations, destination_lookup
         )
-        async def handler(event):
-            try:
-                # 获取消息信息
-                chat = await event.get_chat()
-                source_id = chat.id
-                source_name = getattr(
-                    chat, "title", getattr(chat, "username", f"源_{source_id}")
+        for source in source_index.values():
+            routes = [source.destinations] + [r[1] for r in source.rules]
+            names = {d["name"] for route in routes for d in route}
+            logger.info(f"🔀  路由 {source.name} ⏩ {', '.join(names) or '无'}")
+
+        # 注册消息处理器（替换旧的注册，连接保持不变）
+        valid_ids = {id(s) for s in valid_sources}
+        handler_chats = []
+        for account, account_sources in source_accounts.values():
+            chats = [s["entity"] for s in account_sources if id(s) in valid_ids]
+            if chats:
+                handler_chats.append((account, chats))
+                if len(source_accounts) > 1:
+                    logger.info(f"👤  账号 {account.name} 监控 {len(chats)} 个来源")
+        await self.swap(source_index, handler_chats)
+        return valid_destinations
+
+    async def resolve(
+        self,
+        client_manage: client.ClientManage,
+        identifiers: List[Dict[str, Any]],
+        account: pool.Account = None,
+    ) -> List[Dict[str, Any]]:
+        """解析实体（已解析过的标识直接复用，重新加载配置时只解析新增或变更的部分）"""
+        account = account or client_manage.pool.primary
+        pending = []
+        for identifier in identifiers:
+            known = self.resolved.get((account.name, str(identifier["id"]).strip()))
+            if known is not None:
+                identifier.update(known)
+            else:
+                pending.append(identifier)
+
+        if pending:
+            for identifier in await client_manage.resolve_entities(pending, account):
+                self.resolved[(account.name, identifier["key"])] = {
+                    key: identifier[key]
+                    for key in ("key", "id", "name", "username", "entity")
+                }
+        return [i for i in identifiers if i.get("entity") is not None]
+
+    async def swap(
+        self,
+        source_index: Dict[int, settings.Route],
+        handler_chats: List[Any],
+    ):
+        """替换来源索引和消息处理器（旧索引中未转发的合并批次随后转发）"""
+        old_index = self.source_index
+        self.source_index = source_index
+        for account_client in self.handler_clients:
+            account_client.remove_event_handler(self.on_message)
+            account_client.remove_event_handler(self.on_album)
+        self.handler_clients = []
+
+        # 创建消息处理器（相册消息由相册处理器合并处理）
+        for account, chats in handler_chats:
+            account.client.add_event_handler(
+                self.on_message,
+                events.NewMessage(chats=chats, func=lambda e: not e.message.grouped_id),
+            )
+            account.client.add_event_handler(self.on_album, events.Album(chats=chats))
+            self.handler_clients.append(account.client)
+
+        for source in old_index.values():
+            if source.batcher is not None:
+                await source.batcher.flush()
+
+    async def on_message(self, event):
+        await self.handle_messages(self.client_manage, event.chat_id, [event.message])
+
+    async def on_album(self, event):
+        await self.handle_messages(self.client_manage, event.chat_id, event.messages)
+
+    async def handle_messages(
+        self, client_manage: client.ClientManage, source_id: int, messages: List[Any]
+    ):
+        """处理来源消息（单条消息或整个相册）"""
+        # 回溯进行中时暂存实时消息，回溯完成后按顺序处理（避免乱序和重复转发）
+        buffered = self.backfilling.get(source_id)
+        if buffered is not None:
+            buffered.append(messages)
+            return
+        await self.process_messages(client_manage, source_id, messages)
+
+    async def process_messages(
+        self, client_manage: client.ClientManage, source_id: int, messages: List[Any]
+    ):
+        """过滤并转发消息"""
+        try:
+            # 获取消息信息
+            source = self.source_index.get(source_id)
+            if source is None:
+                logger.warning(f"⚠️  收到未知源的消息 (ID: {source_id})")
+                return
+
+            destinations = self.prepare_messages(
+                client_manage, source_id, source, messages
+            )
+            if not destinations:
+                return
+
+            # 转发消息到所有目标（相册整体转发，开启合并时按批转发）
+            if source.batcher is not None:
+                await source.batcher.add(messages, destinations)
+            else:
+                await client_manage.forward_message(messages, destinations)
+
+        except Exception as e:
+            logger.error(f"❌  处理消息时出错: {e}")
+
+    def prepare_messages(
+        self,
+        client_manage: client.ClientManage,
+        source_id: int,
+        source: settings.Route,
+        messages: List[Any],
+    ) -> Sequence[Dict[str, Any]]:
+        """过滤、路由、去重并记录投递日志，返回需要转发的目标（无需转发时为空）"""
+        # 更新高水位（重启后从此处补发）
+        journal = client_manage.journal
+        if journal is not None:
+            journal.advance(source_id, [m.id for m in messages])
+
+        source_name = source.name
+        # 相册只有部分消息带说明文字，合并后统一过滤
+        message_text = "\n".join(
+            text for text in (m.text or m.raw_text for m in messages) if text
+        )
+
+        # 记录消息信息
+        album_note = f"（相册 {len(messages)} 条）" if len(messages) > 1 else ""
+        logger.debug(f"👀  收到消息 [{source_name}]{album_note}: \n{message_text}")
+
+        registry = metrics.REGISTRY
+        registry.inc("tg_messages_received_total", len(messages), source=source_name)
+
+        # 应用关键词过滤（只对文本内容过滤，未启用指标时不计时）
+        if registry.enabled:
+            started = time.perf_counter()
+            matched = source.filter.match(message_text)
+            registry.observe(
+                "tg_filter_seconds", time.perf_counter() - started, source=source_name
+            )
+        else:
+            matched = source.filter.match(message_text)
+        if not matched:
+            logger.debug(f"❗  [{source_name}] 消息关键词不匹配")
+            return []
+        registry.inc("tg_messages_matched_total", len(messages), source=source_name)
+        logger.info(f"🎯  [{source_name}] 匹配到消息: \n{message_text}")
+
+        # 按路由表确定目标
+        destinations = self.route(source, message_text)
+        if not destinations:
+            logger.debug(f"❗  [{source_name}] 消息未匹配任何路由规则")
+            return []
+
+        # 跳过已收到相同内容的目标（可能来自其他来源）
+        if self.dedup is not None:
+            fresh = set(
+                self.dedup.filter_scopes(messages, [str(d["id"]) for d in destinations])
+            )
+            if not fresh:
+                registry.inc("tg_messages_duplicate_total", source=source_name)
+                logger.info(f"♻️  [{source_name}] 重复消息，跳过转发")
+                return []
+            if len(fresh) < len(destinations):
+                destinations = [d for d in destinations if str(d["id"]) in fresh]
+
+        # ---------------- 新增：音频下载逻辑开始 ----------------
+        # 判断消息中是否包含音频文件 (Telethon中通常用 message.audio 或 message.file)
+        audio_messages = [
+            m
+            for m in messages
+            if m.audio
+            or (m.file and m.file.mime_type and m.file.mime_type.startswith("audio/"))
+        ]
+        if source_name == "music_v1bot" and audio_messages:
+            for message in audio_messages:
+                original_filename = self.audio_filename(
+                    message.text or message.raw_text or message_text
                 )
-                message_text = event.message.text or event.message.raw_text or ""
+                if not original_filename:
+                    continue
 
-                # 记录消息信息
-                logger.debug(f"👀  收到消息 [{source_name}]: \n{message_text}")
+                # 交给后台下载，不阻塞后续消息处理
+                logger.info(
+                    f"🎵 检测到[{source_name}]音频，加入下载队列: {original_filename}"
+                )
+                self.submit_download(journal, source_id, message, original_filename)
+            return []
+        # ---------------- 新增：音频下载逻辑结束 ----------------
 
-                # 查找对应的源配置
-                source_config = next(
-                    (s for s in enabled_sources if s["id"] == source_id),
-                    {},
+        # 先记录待投递，发送完成前重启会重发
+        if journal is not None:
+            journal.record(
+                source_id,
+                [m.id for m in messages],
+                [d["id"] for d in destinations],
+            )
+        return destinations
+
+    @staticmethod
+    def audio_filename(text: Optional[str]) -> Optional[str]:
+        """从消息文字中取歌曲名作为下载文件名（没有歌曲名时为 None）"""
+        match = re.search(r"歌曲：(.+)", text or "")
+        return f"{match.group(1).strip()}.flac" if match else None
+
+    def submit_download(self, journal, source_id: int, message, filename: str):
+        """加入下载队列（启用投递日志时记录为待完成，重启后未完成的下载重新加入队列）"""
+        on_done = None
+        if journal is not None:
+            journal.record(source_id, [message.id], [download.JOURNAL_DEST])
+            on_done = partial(
+                journal.complete, source_id, [message.id], download.JOURNAL_DEST
+            )
+        self.downloader.submit(message, filename, on_done)
+
+    def resume_downloads(
+        self, journal, source_id: int, msg_ids: List[int], messages: Dict[int, Any]
+    ):
+        """未完成的下载（含停止时仍在排队的）重新加入队列，已下载部分续传"""
+        missing = []
+        for msg_id in msg_ids:
+            message = messages.get(msg_id)
+            filename = message and self.audio_filename(message.text or message.raw_text)
+            # 来源已移除或消息已删除，不再下载
+            if not filename:
+                missing.append(msg_id)
+                continue
+            logger.info(f"🔁  继续下载: {filename}")
+            self.downloader.submit(
+                message,
+                filename,
+                partial(journal.complete, source_id, [msg_id], download.JOURNAL_DEST),
+            )
+        if missing:
+            journal.complete(source_id, missing, download.JOURNAL_DEST, False)
+
+    def build_source_index(
+        self,
+        sources: List[Dict[str, Any]],
+        destinations: List[Dict[str, Any]],
+        destination_lookup: Dict[str, Dict[str, Any]] = None,
+    ) -> Dict[int, settings.Route]:
+        """按 peer id 建立来源索引（预先计算每个来源及规则的目标列表）"""
+        destination_lookup = destination_lookup or self.build_destination_lookup(
+            destinations
+        )
+        destinations = tuple(destinations)
+        source_index = {}
+        for source in sources:
+            source_config: settings.Source = source["source"]
+            entity = source["entity"]
+            # 频道/群组显示标题，用户/机器显示用户名
+            if isinstance(utils.get_peer(entity), PeerUser):
+                source_name = source.get("username") or f"源_{source['id']}"
+            else:
+                source_name = source["name"]
+            # 高频来源可开启合并转发
+            source_batcher = None
+            if source_config.batch is not None:
+                source_batcher = batcher.MessageBatcher(
+                    self.client_manage.forward_message,
+                    window=source_config.batch.window,
+                    max_count=source_config.batch.max_count,
+                )
+
+            # 未指定目标的来源转发到全部目标
+            source_destinations = destinations
+            if source_config.destinations:
+                source_destinations = self.lookup_destinations(
+                    source_config.destinations, destination_lookup
+                )
+            rules = tuple(
+                (
+                    rule.filter,
+                    self.lookup_destinations(rule.destinations, destination_lookup),
                 )
-                if not source_config:
-                    logger.warning(
-                        f"⚠️  收到未知源的消息: {source_name} (ID: {source_id})"
+                for rule in source_config.rules
+            )
+
+            source_index[utils.get_peer_id(entity)] = settings.Route(
+                name=source_name,
+                account=self.client_manage.pool.get(
+                    source_config.account or pool.PRIMARY_ACCOUNT
+                ),
+                entity=entity,
+                filter=source_config.filter,
+                destinations=source_destinations,
+                rules=rules,
+                batcher=source_batcher,
+            )
+        return source_index
+
+    async def recover(
+        self, client_manage: client.ClientManage, destinations: List[Dict[str, Any]]
+    ):
+        """按投递日志重发未完成的投递，再回溯各来源停机期间的消息"""
+        journal = client_manage.journal
+        dest_index = {d["id"]: d for d in destinations}
+        try:
+            pending = journal.pending()
+        except Exception as e:
+            logger.error(f"❌  读取投递日志失败: {e}")
+            pending = {}
+
+        for source_id, dest_msg_ids in pending.items():
+            source = self.source_index.get(source_id)
+            try:
+                messages = {}
+                if source is not None:
+                    msg_ids = sorted({i for ids in dest_msg_ids.values() for i in ids})
+                    fetched = await source.account.client.get_messages(
+                        source.entity, ids=msg_ids
                     )
-                    return
-
-                # 应用关键词过滤（只对文本内容过滤）
-                if self.message_filter(message_text, source_config):
-                    logger.info(f"🎯  [{source_name}] 匹配到消息: \n{message_text}")
-
-                    # ---------------- 新增：音频下载逻辑开始 ----------------
-                    # 判断消息中是否包含音频文件 (Telethon中通常用 event.message.audio 或 event.message.file)
-                    if source_name == "music_v1bot" and (
-                        event.message.audio
-                        or (
-                            event.message.file
-                            and event.message.file.mime_type
-                            and event.message.file.mime_type.startswith("audio/")
-                        )
-                    ):
-                        original_filename = ""
-                        match = re.search(r"歌曲：(.+)", message_text)
-                        if match:
-                            original_filename = f"{match.group(1).strip()}.flac"
-                        else:
-                            return
-
-                        # 先下载到临时目录
-                        os.makedirs(temp_filepath, exist_ok=True)
-                        temp_save_path = os.path.join(temp_filepath, original_filename)
+                    messages = {m.id: m for m in fetched if m is not None}
+
+                for dest_id, msg_ids in dest_msg_ids.items():
+                    if dest_id == download.JOURNAL_DEST:
+                        self.resume_downloads(journal, source_id, msg_ids, messages)
+                        continue
+                    dest = dest_index.get(dest_id)
+                    found = [messages[i] for i in msg_ids if i in messages]
+                    # 来源/目标已移除或消息已删除，不再重发
+                    missing = [i for i in msg_ids if dest is None or i not in messages]
+                    if missing:
+                        journal.complete(source_id, missing, dest_id, False)
+                    if dest is not None and found:
                         logger.info(
-                            f"🎵 检测到[{source_name}]音频，下载至临时目录: {temp_save_path}"
+                            f"🔁  [{source.name}] 重发 {len(found)} 条未完成投递到 {dest['name']}"
                         )
-                        await event.message.download_media(file=temp_save_path)
+                        await client_manage.forward_message(found, [dest])
+            except Exception as e:
+                logger.error(f"❌  重发未完成投递失败 (来源ID: {source_id}): {e}")
 
-                        # 移动到最终下载目录
-                        os.makedirs(download_filepath, exist_ok=True)
-                        final_path = os.path.join(download_filepath, original_filename)
-                        shutil.move(temp_save_path, final_path)
+        # 有处理位置的来源从该位置补发，没有的按配置的起始时间回溯
+        backfill_config = self.config.get("backfill") or {}
+        since = None
+        if backfill_config.get("enable", False):
+            since = self.parse_since(backfill_config.get("since"))
+        tasks = []
+        for source_id in list(self.backfilling):
+            min_id = journal.watermark(source_id)
+            limit = backfill_config.get("limit", DEFAULT_BACKFILL_LIMIT)
+            if min_id:
+                limit = journal.catchup_limit
+            tasks.append(self.backfill(client_manage, source_id, min_id, since, limit))
+        await asyncio.gather(*tasks)
 
-                        logger.info(f"✅ [{source_name}]音频下载成功: {final_path}")
-                        return
-                    # ---------------- 新增：音频下载逻辑结束 ----------------
+    async def backfill(
+        self,
+        client_manage: client.ClientManage,
+        source_id: int,
+        min_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: int = DEFAULT_BACKFILL_LIMIT,
+    ):
+        """回溯来源历史消息（整页拉取，按页合并转发），完成后按顺序处理期间暂存的实时消息"""
+        source_name = source_id
+        last_id = min_id or 0
+        count = 0
+        try:
+            # 回溯开始前来源可能已被热更新移除
+            source = self.source_index[source_id]
+            source_name = source.name
+            if min_id or since:
+                # 从最新的消息往前拉取，达到上限时跳过的是最早的消息（而不是最接近实时的消息）；
+                # 已有暂存的实时消息时拉取到第一条暂存消息为止
+                buffered = self.backfilling.get(source_id)
+                max_id = buffered[0][0].id if buffered else 0
+                if since is not None and since.tzinfo is None:
+                    since = since.astimezone()
+                history: List[Any] = []
+                async for message in source.account.client.iter_messages(
+                    source.entity, min_id=min_id or 0, max_id=max_id, limit=limit
+                ):
+                    if not min_id and message.date < since:
+                        break
+                    history.append(message)
+                history.reverse()
 
-                    # 转发消息到所有目标
-                    await client_manage.forward_message(event, valid_destinations)
-                else:
-                    logger.debug(f"❗  [{source_name}] 消息关键词不匹配")
+                page: List[Any] = []
+                for message in history:
+                    # 整页转发（不拆分相册）
+                    if len(page) >= BACKFILL_PAGE_SIZE and (
+                        not message.grouped_id
+                        or message.grouped_id != page[-1].grouped_id
+                    ):
+                        await self.forward_page(client_manage, source_id, source, page)
+                        page = []
+                    page.append(message)
+                    last_id = max(last_id, message.id)
+                    count += 1
+                if page:
+                    await self.forward_page(client_manage, source_id, source, page)
 
+            if count:
+                logger.info(f"⏪  [{source.name}] 回溯 {count} 条历史消息")
+            if count >= limit:
+                logger.warning(
+                    f"⚠️  [{source.name}] 回溯数量达到上限 {limit}，只处理了最新的 {limit} 条，更早的消息已跳过"
+                )
+        except Exception as e:
+            logger.error(f"❌  [{source_name}] 回溯历史消息失败: {e}")
+        finally:
+            # 处理回溯期间暂存的实时消息（回溯已处理的跳过），失败时也恢复实时处理
+            buffered = self.backfilling.get(source_id) or []
+            try:
+                while buffered:
+                    messages = [m for m in buffered.pop(0) if m.id > last_id]
+                    if messages:
+                        await self.process_messages(client_manage, source_id, messages)
+            finally:
+                self.backfilling.pop(source_id, None)
+
+    async def forward_page(
+        self,
+        client_manage: client.ClientManage,
+        source_id: int,
+        source: settings.Route,
+        messages: List[Any],
+    ):
+        """过滤一页历史消息，按目标合并转发"""
+        selected = []
+        destinations = {}
+        for group in client_manage.group_messages(messages):
+            try:
+                dests = self.prepare_messages(client_manage, source_id, source, group)
             except Exception as e:
                 logger.error(f"❌  处理消息时出错: {e}")
+                continue
+            if dests:
+                selected += group
+                for message in group:
+                    destinations[message.id] = dests
 
-        logger.info("🔍  实时监控转发已启动，等待新消息...")
+        if selected:
+            for batch, dests in batcher.MessageBatcher.group_by_destinations(
+                selected, destinations
+            ):
+                await client_manage.forward_message(batch, dests)
 
-    def message_filter(self, text: str, source_config: Dict[str, Any]) -> bool:
-        """消息过滤"""
-        if not text:
-            return False
+    @staticmethod
+    def parse_since(value: Any) -> Optional[datetime]:
+        """解析回溯起始时间（如 2026-10-01 或 2026-10-01 08:00）"""
+        if not value:
+            return None
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, date):
+            return datetime.combine(value, datetime.min.time())
+        try:
+            return datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            logger.error(f"❌  回溯起始时间格式无效: {value}")
+            return None
 
-        include_keywords = source_config.get("include_keywords", [])
-        exclude_keywords = source_config.get("exclude_keywords", [])
+    @staticmethod
+    def destination_refs(sources: List[settings.Source]) -> List[Any]:
+        """来源及规则中引用的目标"""
+        refs = []
+        for source in sources:
+            refs += source.destinations
+            for rule in source.rules:
+                refs += rule.destinations
+        return refs
 
-        # 如果没有设置包含关键词，则默认所有消息都满足包含条件
-        include_condition = (
-            any(keyword.lower() in text.lower() for keyword in include_keywords)
-            if include_keywords
-            else True
-        )
-        # 如果没有设置排除关键词，则默认所有消息都满足排除条件
-        exclude_condition = (
-            not any(keyword.lower() in text.lower() for keyword in exclude_keywords)
-            if exclude_keywords
-            else True
-        )
+    @staticmethod
+    def build_destination_lookup(
+        destinations: List[Dict[str, Any]],
+    ) -> Dict[str, Dict[str, Any]]:
+        """目标查找表（配置ID、实体ID、名称、用户名均可引用）"""
+        lookup = {}
+        for dest in destinations:
+            keys = [dest.get("key"), dest["id"], dest.get("name")]
+            if dest.get("entity") is not None:
+                keys.append(utils.get_peer_id(dest["entity"]))
+            if dest.get("username"):
+                keys += [dest["username"], f"@{dest['username']}"]
+            for key in keys:
+                if key is not None:
+                    lookup.setdefault(str(key).strip().lower(), dest)
+        return lookup
+
+    @staticmethod
+    def lookup_destinations(
+        refs: List[Any], destination_lookup: Dict[str, Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], ...]:
+        """将目标引用转换为目标列表（去重，保持顺序）"""
+        result = []
+        for ref in refs:
+            dest = destination_lookup.get(str(ref).strip().lower())
+            if dest is None:
+                logger.warning(f"⚠️  路由目标不存在或未启用: {ref}")
+            elif dest not in result:
+                result.append(dest)
+        return tuple(result)
 
-        return include_condition and exclude_condition
+    @staticmethod
+    def route(source: settings.Route, text: str) -> Sequence[Dict[str, Any]]:
+        """计算消息的目标列表（有规则时取匹配规则的目标并集）"""
+        if not source.rules:
+            return source.destinations
+
+        matched = [
+            dests for rule_filter, dests in source.rules if rule_filter.match(text)
+        ]
+        if len(matched) == 1:
+            return matched[0]
+        result = []
+        for dests in matched:
+            result += [d for d in dests if d not in result]
+        return result
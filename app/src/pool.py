@@ -0,0 +1,138 @@
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional
+from telethon import utils
+from . import limiter, settings
+from .settings import STRATEGIES
+
+# 主账号名称（telegram.session）
+PRIMARY_ACCOUNT = "main"
+
+logger = logging.getLogger(__name__)
+
+
+class Account:
+    """发送账号（独立会话、发送配额和吞吐统计）"""
+
+    def __init__(
+        self,
+        name: str,
+        client,
+        global_rate: float = limiter.DEFAULT_GLOBAL_RATE,
+        primary: bool = False,
+    ):
+        self.name = name
+        self.client = client
+        self.primary = primary
+        self.bucket = limiter.TokenBucket(global_rate, max(1, global_rate))
+        self.dialog_index = None
+        # 目标在该账号下的 peer（access_hash 因账号而异）
+        self.peers: Dict[int, Any] = {}
+        # 各目标的限流结束时间（FloodWait 通常只针对单个目标）
+        self.flood_until: Dict[Any, float] = {}
+        self.last_flood = 0.0
+        self.started = time.monotonic()
+        self.stats = {
+            "sent": 0,
+            "failed": 0,
+            "flood_waits": 0,
+            "flood_wait_seconds": 0,
+        }
+
+    def available(self, dest_id: Any, now: Optional[float] = None) -> bool:
+        """是否可发送到该目标（未处于限流等待中）"""
+        return (now or time.monotonic()) >= self.flood_until.get(dest_id, 0)
+
+    def flooded(self, dest_id: Any, seconds: int):
+        """记录限流，等待结束前不再用该账号发送到该目标"""
+        now = time.monotonic()
+        self.flood_until[dest_id] = now + seconds
+        self.last_flood = now
+        self.stats["flood_waits"] += 1
+        self.stats["flood_wait_seconds"] += seconds
+        logger.debug(f"❗  账号 {self.name} 触发限流，{seconds} 秒内不发送到该目标")
+
+    async def input_peer(self, entity: Any, username: Optional[str] = None) -> Any:
+        """获取实体在该账号下的 peer（首次使用时解析，无法访问时返回 None）"""
+        if self.primary:
+            return entity
+
+        peer_id = entity if isinstance(entity, int) else utils.get_peer_id(entity)
+        if peer_id not in self.peers:
+            peer = None
+            for key in (peer_id, username):
+                if key is None:
+                    continue
+                try:
+                    peer = await self.client.get_input_entity(key)
+                    break
+                except (ValueError, TypeError):
+                    continue
+            if peer is None:
+                logger.debug(f"❗  账号 {self.name} 无法访问实体 (ID: {peer_id})")
+            self.peers[peer_id] = peer
+        return self.peers[peer_id]
+
+    def metrics(self) -> Dict[str, Any]:
+        """账号指标：发送/失败/限流计数、吞吐（批/分钟）、限流中的目标数"""
+        now = time.monotonic()
+        elapsed = max(now - self.started, 1e-6)
+        return {
+            **self.stats,
+            "rate": round(self.stats["sent"] * 60 / elapsed, 2),
+            "flooded": sum(until > now for until in self.flood_until.values()),
+        }
+
+
+class ClientPool:
+    """多账号池（分摊出站发送，单个账号限流时由其他账号继续发送）"""
+
+    def __init__(self, strategy: str = "round_robin"):
+        if strategy not in STRATEGIES:
+            logger.warning(f"⚠️  不支持的账号选择策略: {strategy}，使用 round_robin")
+            strategy = "round_robin"
+        self.strategy = strategy
+        self.accounts: List[Account] = []
+        self.index = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ClientPool":
+        """从配置创建账号池"""
+        return cls(strategy=settings.Limits.from_config(config).account_strategy)
+
+    @property
+    def primary(self) -> Optional[Account]:
+        """主账号"""
+        return self.accounts[0] if self.accounts else None
+
+    def add(self, account: Account):
+        """加入账号"""
+        self.accounts.append(account)
+
+    def get(self, name: str) -> Optional[Account]:
+        """按名称查找账号"""
+        return next((a for a in self.accounts if a.name == name), None)
+
+    def candidates(self, dest_id: Any) -> List[Account]:
+        """可发送到该目标的账号（按策略排序，依次尝试）"""
+        now = time.monotonic()
+        accounts = [a for a in self.accounts if a.available(dest_id, now)]
+        if len(accounts) <= 1:
+            return accounts
+
+        if self.strategy == "least_flooded":
+            return sorted(accounts, key=lambda a: (a.last_flood, a.stats["sent"]))
+        start = self.index % len(accounts)
+        self.index += 1
+        return accounts[start:] + accounts[:start]
+
+    def wait_time(self, dest_id: Any) -> int:
+        """距最早有账号恢复发送到该目标的秒数（有可用账号时为 0）"""
+        now = time.monotonic()
+        if not self.accounts or any(a.available(dest_id, now) for a in self.accounts):
+            return 0
+        return math.ceil(min(a.flood_until[dest_id] for a in self.accounts) - now)
+
+    def __len__(self) -> int:
+        return len(self.accounts)
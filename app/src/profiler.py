@@ -0,0 +1,57 @@
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+# 启用启动耗时分析：python main.py --profile 或环境变量 TG_PROFILE=1
+PROFILE_FLAG = "--profile"
+PROFILE_ENV = "TG_PROFILE"
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """启动耗时分析（按阶段计时，启用时启动完成后输出各阶段耗时）"""
+
+    def __init__(self, enabled: bool = False, started: Optional[float] = None):
+        self.enabled = enabled
+        self.started = started if started is not None else time.perf_counter()
+        # (阶段名称, 秒数)
+        self.phases: List[Tuple[str, float]] = []
+
+    @classmethod
+    def from_env(cls, started: Optional[float] = None) -> "StartupProfiler":
+        """按命令行参数或环境变量创建"""
+        enabled = PROFILE_FLAG in sys.argv[1:] or os.environ.get(
+            PROFILE_ENV, ""
+        ).lower() in ("1", "true", "yes")
+        return cls(enabled, started)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """记录一个阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        """记录已知耗时（同名阶段累加）"""
+        for index, (phase_name, total) in enumerate(self.phases):
+            if phase_name == name:
+                self.phases[index] = (name, total + seconds)
+                return
+        self.phases.append((name, seconds))
+
+    def report(self):
+        """输出各阶段耗时和占比"""
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self.started
+        logger.info(f"⏱️  启动耗时 {total:.3f} 秒")
+        for name, seconds in self.phases:
+            share = seconds / total if total else 0
+            logger.info(f"⏱️    {name}: {seconds * 1000:.1f} ms ({share:.0%})")
@@ -1,74 +1,392 @@
+import asyncio
 import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from typing import Dict, Any, List
-from . import client
+from telethon import Button, errors
+from typing import Dict, Any, List, Optional
+from . import client, jobstore, metrics
+
+# 错过执行时间后仍补发的秒数（APScheduler 默认仅 1 秒，同一时刻任务较多时后面的任务会被跳过）
+DEFAULT_MISFIRE_GRACE_TIME = 300
+# 多次错过执行时只补发一次
+DEFAULT_COALESCE = True
+# 重启后补发停机期间错过的执行（错过超过该秒数的不再补发）
+DEFAULT_CATCHUP_WINDOW = 3600
+# 补发多个任务时的间隔秒数
+DEFAULT_CATCHUP_INTERVAL = 1
+# 消息模板变量：{{ 名称 }}，时间变量可指定格式 {{ date|%m月%d日 }}
+TEMPLATE_PATTERN = re.compile(r"\{\{\s*(\w+)\s*(?:\|\s*(.*?)\s*)?\}\}")
+TIME_FORMATS = {
+    "date": "%Y-%m-%d",
+    "time": "%H:%M",
+    "datetime": "%Y-%m-%d %H:%M",
+    "year": "%Y",
+    "month": "%m",
+    "day": "%d",
+}
+WEEKDAYS = "一二三四五六日"
 
 logger = logging.getLogger(__name__)
 
+# 当前调度器（持久化的任务按函数路径引用，不能引用实例方法）
+ACTIVE: Optional["TelegramScheduler"] = None
+
+
+async def run_job(job_id: str):
+    """定时任务入口"""
+    if ACTIVE is not None:
+        await ACTIVE.send_message(job_id)
+
+
+def render_template(template: str, now: datetime, count: int) -> str:
+    """渲染消息模板（未知变量原样保留）"""
+    if "{{" not in template:
+        return template
+
+    def replace(match: re.Match) -> str:
+        name, time_format = match.group(1), match.group(2)
+        if name in TIME_FORMATS:
+            return now.strftime(time_format or TIME_FORMATS[name])
+        if name == "weekday":
+            return "星期" + WEEKDAYS[now.weekday()]
+        if name == "count":
+            return str(count)
+        return match.group(0)
+
+    return TEMPLATE_PATTERN.sub(replace, template)
+
 
 class TelegramScheduler:
     """Telegram定时任务管理器"""
 
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.scheduler = AsyncIOScheduler()
+        self.client_manage = None
+        scheduler_config = config.get("scheduler") or {}
+        self.catchup_window = scheduler_config.get(
+            "catchup_window", DEFAULT_CATCHUP_WINDOW
+        )
+        self.catchup_interval = scheduler_config.get(
+            "catchup_interval", DEFAULT_CATCHUP_INTERVAL
+        )
+        self.job_defaults = {
+            "misfire_grace_time": scheduler_config.get(
+                "misfire_grace_time", DEFAULT_MISFIRE_GRACE_TIME
+            ),
+            "coalesce": scheduler_config.get("coalesce", DEFAULT_COALESCE),
+        }
+        # 启用持久化时任务和执行时间保存在 SQLite，否则只在内存中
+        self.jobstore = jobstore.SQLiteJobStore.from_config(config)
+        self.scheduler = AsyncIOScheduler(
+            jobstores={"default": self.jobstore} if self.jobstore else {},
+            job_defaults=self.job_defaults,
+        )
+        self.scheduler.add_listener(
+            self.on_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED
+        )
+        # 任务ID -> 名称、消息内容、已解析的目标
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        # 任务ID -> 最近一次延迟执行秒数
+        self.lateness: Dict[str, float] = {}
+        # 任务ID -> 已发送次数（模板变量 count）
+        self.counts: Dict[str, int] = {}
 
     async def start_scheduler(self, client_manage: client.ClientManage):
         """调度定时任务"""
-        # 检查是否有启用定时
-        enabled_schedulers = [
-            s for s in self.config.get("schedulers", []) if s.get("enabled", False)
-        ]
-        if not enabled_schedulers:
-            logger.warning("⚠️  没有启用的定时任务，关闭定时功能")
-            return
+        global ACTIVE
+        ACTIVE = self
+        self.client_manage = client_manage
+        try:
+            # 暂停状态下启动，读取已保存的任务后再按配置增删
+            # 没有任务时也启动调度器，重新加载配置后可直接新增任务
+            self.scheduler.start(paused=True)
+            task_count = await self.reconcile()
+            self.catch_up()
+            self.scheduler.resume()
+            if task_count:
+                logger.info(f"⏰  定时任务已启动，共 {task_count} 个任务")
+            else:
+                logger.warning("⚠️  没有启用的定时任务")
+        except Exception as e:
+            logger.error(f"❌  执行定时任务失败: {e}")
+            if self.scheduler.running:
+                self.scheduler.shutdown()
+
+    async def reload(self, config: Dict[str, Any]):
+        """重新加载定时任务（调度器不停止）"""
+        self.config = config
+        task_count = await self.reconcile()
+        logger.info(f"🔄  定时任务已更新，共 {task_count} 个任务")
 
-        # 获取定时实体
-        schedulers = self.config.get("schedulers", [])
+    async def reconcile(self) -> int:
+        """按配置增删定时任务（未变化的任务保持不变，只解析新增任务的目标），返回任务数"""
+        schedulers = self.config.get("schedulers", []) or []
         enabled_schedulers = [s for s in schedulers if s.get("enabled", False)]
-        try:
-            valid_schedulers = await client_manage.resolve_entities(enabled_schedulers)
-            if not valid_schedulers:
+        wanted = {self.job_id(s): s for s in enabled_schedulers}
+
+        for job in self.scheduler.get_jobs():
+            if job.id not in wanted:
+                job.remove()
+                self.jobs.pop(job.id, None)
+                self.counts.pop(job.id, None)
+                logger.info(f"🗑️  删除定时任务 {job.name}")
+
+        # 新增的任务和重启后从存储中还原的任务需要解析目标（已保存的触发器不重建）
+        new_jobs = {
+            job_id: scheduler
+            for job_id, scheduler in wanted.items()
+            if job_id not in self.jobs
+        }
+        if new_jobs:
+            # 多个任务的相同目标只解析一次
+            identifiers = {}
+            for scheduler in new_jobs.values():
+                for target in self.targets(scheduler):
+                    identifiers.setdefault(str(target).strip(), {"id": target})
+            resolved = await self.client_manage.resolve_entities(
+                list(identifiers.values())
+            )
+            if not resolved:
                 logger.error("❌  没有有效定时实体，定时功能无法启动")
-                return
+            resolved_ids = {id(identifier) for identifier in resolved}
 
-            task_count = 0
-            for scheduler in enabled_schedulers:
+            for job_id, scheduler in new_jobs.items():
+                targets = []
+                for target in self.targets(scheduler):
+                    identifier = identifiers[str(target).strip()]
+                    if id(identifier) in resolved_ids and identifier not in targets:
+                        targets.append(identifier)
+                if not targets:
+                    logger.error(f"❌  定时任务 {job_id} 没有有效目标")
+                    continue
+
+                name = ", ".join(t["name"] for t in targets)
                 try:
-                    trigger = CronTrigger.from_crontab(scheduler["cron"])
+                    self.jobs[job_id] = {"name": name, "targets": targets}
+                    stored = self.scheduler.get_job(job_id)
+                    if stored is not None:
+                        # 补发时限等设置可能已修改
+                        changes = {
+                            key: value
+                            for key, value in self.job_defaults.items()
+                            if getattr(stored, key) != value
+                        }
+                        if changes:
+                            stored.modify(**changes)
+                        continue
                     self.scheduler.add_job(
-                        self.send_message,
-                        trigger,
-                        args=[client_manage, scheduler],
-                        id=str(scheduler["id"]),
-                        name=scheduler["name"],
+                        run_job,
+                        CronTrigger.from_crontab(scheduler["cron"]),
+                        args=[job_id],
+                        id=job_id,
+                        name=name,
                     )
-                    task_count += 1
                 except Exception as e:
-                    logger.error(f"❌  新增定时失败 {scheduler['name']}: {e}")
+                    self.jobs.pop(job_id, None)
+                    logger.error(f"❌  新增定时失败 {name}: {e}")
 
-            self.scheduler.start()
-            logger.info(f"⏰  定时任务已启动，共 {task_count} 个任务")
-        except Exception as e:
-            logger.error(f"❌  执行定时任务失败: {e}")
-            if self.scheduler.running:
-                self.scheduler.shutdown()
+        # 媒体和按钮不影响任务ID，修改后直接更新内容，不重建任务
+        for job_id, scheduler in wanted.items():
+            if job_id in self.jobs:
+                self.jobs[job_id].update(self.content(scheduler))
+
+        return len(self.scheduler.get_jobs())
+
+    def on_job_event(self, event):
+        """记录任务延迟执行秒数和错过执行次数"""
+        registry = metrics.REGISTRY
+        job = self.jobs.get(event.job_id)
+        name = job["name"] if job is not None else event.job_id
+        if event.code == EVENT_JOB_MISSED:
+            registry.inc("tg_scheduler_missed_total", job=name)
+            logger.warning(f"⚠️  定时任务 {name} 错过执行时间，已跳过")
+            return
+
+        now = datetime.now(timezone.utc)
+        lateness = 0.0
+        for run_time in event.scheduled_run_times:
+            lateness = max(0.0, (now - run_time).total_seconds())
+            registry.observe("tg_scheduler_lateness_seconds", lateness, job=name)
+        self.lateness[event.job_id] = lateness
+        if self.jobstore is not None and event.scheduled_run_times:
+            self.jobstore.record_run(event.job_id, event.scheduled_run_times[-1])
 
-    async def send_message(
-        self,
-        client_manage: client.ClientManage,
-        scheduler: List[str],
-    ):
-        """发送定时消息"""
+    def catch_up(self):
+        """补发停机期间错过的执行（每个任务只补发一次，按间隔依次执行）"""
+        now = datetime.now(timezone.utc)
+        index = 0
+        for job in self.scheduler.get_jobs():
+            if job.next_run_time is None or job.next_run_time >= now:
+                continue
+            # 已提交执行但停机前未保存下次执行时间，不重复补发
+            last_run = self.jobstore.last_run_time(job.id) if self.jobstore else None
+            if last_run is not None and last_run >= job.next_run_time:
+                job.modify(next_run_time=job.trigger.get_next_fire_time(None, now))
+                continue
+            missed = (now - job.next_run_time).total_seconds()
+            due = job.next_run_time.astimezone().strftime("%Y-%m-%d %H:%M")
+            if missed <= self.catchup_window:
+                delay = timedelta(seconds=index * self.catchup_interval)
+                job.modify(next_run_time=now + delay)
+                index += 1
+                logger.info(f"⏪  补发错过的定时任务 {job.name}（应于 {due} 执行）")
+            else:
+                job.modify(next_run_time=job.trigger.get_next_fire_time(None, now))
+                metrics.REGISTRY.inc("tg_scheduler_missed_total", job=job.name)
+                logger.warning(
+                    f"⚠️  定时任务 {job.name} 应于 {due} 执行，错过超过 {self.catchup_window} 秒，不再补发"
+                )
+
+    @staticmethod
+    def targets(scheduler: Dict[str, Any]) -> List[Any]:
+        """任务的发送目标（id 和 targets 可同时填写）"""
+        targets = scheduler.get("targets") or []
+        if not isinstance(targets, list):
+            targets = [targets]
+        if scheduler.get("id") is not None:
+            targets = [scheduler["id"]] + list(targets)
+        return targets
+
+    @staticmethod
+    def content(scheduler: Dict[str, Any]) -> Dict[str, Any]:
+        """任务的消息模板、媒体（本地文件或网址）和按钮（每行一个或一组按钮）"""
+        media = scheduler.get("media") or []
+        if not isinstance(media, list):
+            media = [media]
+        rows = []
+        for row in scheduler.get("buttons") or []:
+            row = row if isinstance(row, list) else [row]
+            row = [
+                {"text": str(b["text"]), "url": str(b["url"])}
+                for b in row
+                if isinstance(b, dict) and b.get("text") and b.get("url")
+            ]
+            if row:
+                rows.append(row)
+        return {
+            "message": str(scheduler.get("message") or ""),
+            "media": [str(m).strip() for m in media],
+            "buttons": rows,
+        }
+
+    @classmethod
+    def job_id(cls, scheduler: Dict[str, Any]) -> str:
+        """任务ID（目标、时间、内容任一变化即视为新任务）"""
+        key = ",".join(str(t).strip() for t in cls.targets(scheduler))
+        return f"{key}|{scheduler.get('cron')}|{scheduler.get('message')}"
+
+    async def send_message(self, job_id: str):
+        """发送定时消息（各目标并发发送，共用发送并发数和限流）"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        lateness = self.lateness.pop(job_id, 0.0)
+        started = time.perf_counter()
         try:
-            await client_manage.client.send_message(
-                scheduler["entity"], scheduler["message"]
-            )
+            content = await self.build_content(job_id, job)
+        except Exception as e:
+            logger.error(f"❌  定时任务 {job['name']} 准备发送内容失败: {e}")
+            return
+        results = await asyncio.gather(
+            *(self.send_to_target(content, t) for t in job["targets"])
+        )
+        duration = time.perf_counter() - started
+        metrics.REGISTRY.observe(
+            "tg_scheduler_duration_seconds", duration, job=job["name"]
+        )
+
+        sent = sum(results)
+        timing = f"延迟 {lateness:.1f} 秒，耗时 {duration:.1f} 秒"
+        if sent == len(results):
             logger.info(
-                f"✅  定时发送 [{scheduler['message']}] ⏩ [{scheduler['name']}] 成功"
+                f"✅  定时发送 [{content['message']}] ⏩ [{job['name']}] 成功（{timing}）"
             )
-        except Exception as e:
+        else:
             logger.error(
-                f"❌  定时发送 [{scheduler['message']}] ⏩ [{scheduler['name']}] 失败: {e}"
+                f"❌  定时发送 [{content['message']}] ⏩ [{job['name']}] 失败 {len(results) - sent}/{len(results)} 个目标（{timing}）"
             )
+
+    def next_count(self, job_id: str) -> int:
+        """本次是第几次发送（启用持久化时重启后继续计数）"""
+        count = self.counts.get(job_id)
+        if count is None:
+            count = self.jobstore.run_count(job_id) if self.jobstore else 0
+        count += 1
+        self.counts[job_id] = count
+        if self.jobstore is not None:
+            self.jobstore.record_count(job_id, count)
+        return count
+
+    async def build_content(self, job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        """生成本次发送内容（渲染模板、获取媒体句柄、生成按钮），所有目标共用"""
+        message = render_template(
+            job["message"], datetime.now(), self.next_count(job_id)
+        )
+        media = [await self.get_media(file) for file in job["media"]]
+        text, buttons = message, None
+        if job["buttons"]:
+            # 用户账号发送的按钮不会显示，相册不支持按钮，改为消息末尾的链接
+            if len(media) <= 1 and await self.client_manage.client.is_bot():
+                buttons = [
+                    [Button.url(b["text"], b["url"]) for b in row]
+                    for row in job["buttons"]
+                ]
+            else:
+                links = "\n".join(
+                    " | ".join(f"[{b['text']}]({b['url']})" for b in row)
+                    for row in job["buttons"]
+                )
+                text = f"{message}\n\n{links}" if message else links
+        return {
+            "message": message,
+            "text": text,
+            "files": job["media"],
+            "media": media,
+            "buttons": buttons,
+        }
+
+    async def get_media(self, file: str, stale: Any = None) -> Any:
+        """媒体句柄（网址由 Telegram 服务器下载，本地文件只上传一次，之后复用缓存的句柄）"""
+        if file.startswith(("http://", "https://")):
+            return file
+        return await self.client_manage.get_file_handle(file, stale=stale)
+
+    async def send_to_target(
+        self, content: Dict[str, Any], target: Dict[str, Any]
+    ) -> bool:
+        """发送到单个目标（限流、FloodWait 等待和重试由发送队列处理）"""
+        return await self.client_manage.send_queue.run(
+            target, partial(self.send_content, content, target["entity"])
+        )
+
+    async def send_content(self, content: Dict[str, Any], entity: Any):
+        """发送消息或媒体（缓存的媒体文件引用过期时重新上传后重发）"""
+        client = self.client_manage.client
+        for attempt in range(2):
+            media = content["media"]
+            try:
+                if not media:
+                    await client.send_message(
+                        entity, content["text"], buttons=content["buttons"]
+                    )
+                else:
+                    await client.send_file(
+                        entity,
+                        media if len(media) > 1 else media[0],
+                        caption=content["text"],
+                        buttons=content["buttons"],
+                    )
+                return
+            except errors.FileReferenceExpiredError:
+                if attempt:
+                    raise
+                # 多个目标同时过期时只重新上传一次
+                content["media"] = [
+                    await self.get_media(file, stale=handle)
+                    for file, handle in zip(content["files"], media)
+                ]
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from telethon import errors
+from . import limiter, metrics, settings
+from .settings import DEFAULT_CONCURRENCY, DEFAULT_MAX_RETRIES, DEFAULT_RETRY_DELAY
+
+# 可重试的临时错误（FloodWait 单独处理）
+RETRYABLE_ERRORS = (
+    errors.ServerError,
+    errors.TimedOutError,
+    ConnectionError,
+    asyncio.TimeoutError,
+)
+logger = logging.getLogger(__name__)
+
+
+class SendQueue:
+    """出站发送队列（按目标排队，识别 FloodWait 并自动重试）"""
+
+    def __init__(
+        self,
+        rate_limiter: limiter.RateLimiter,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+    ):
+        self.limiter = rate_limiter
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queues: Dict[Any, asyncio.Queue] = {}
+        self.workers: Dict[Any, asyncio.Task] = {}
+        self.parked_until: Dict[Any, float] = {}
+        self.names: Dict[Any, str] = {}
+        self.stats = {
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "flood_waits": 0,
+            "flood_wait_seconds": 0,
+            # 目标因限流或重试退避暂停的总秒数
+            "parked_seconds": 0,
+        }
+
+    @classmethod
+    def from_config(
+        cls, config: Dict[str, Any], rate_limiter: limiter.RateLimiter
+    ) -> "SendQueue":
+        """从配置创建发送队列"""
+        limits = settings.Limits.from_config(config)
+        return cls(
+            rate_limiter,
+            concurrency=limits.concurrency,
+            max_retries=limits.max_retries,
+            retry_delay=limits.retry_delay,
+        )
+
+    def put(
+        self,
+        dest: Dict[str, Any],
+        job: Callable[[], Awaitable[Any]],
+        on_done: Optional[Callable[[bool], Any]] = None,
+    ):
+        """加入发送任务（同一目标按加入顺序发送，完成或最终失败后回调 on_done）"""
+        dest_id = dest["id"]
+        queue = self.queues.get(dest_id)
+        if queue is None:
+            queue = asyncio.Queue()
+            self.queues[dest_id] = queue
+            self.names[dest_id] = dest["name"]
+            self.workers[dest_id] = asyncio.create_task(self.worker(dest, queue))
+        queue.put_nowait((job, on_done, time.monotonic()))
+
+    async def worker(self, dest: Dict[str, Any], queue: asyncio.Queue):
+        """逐个处理单个目标的发送任务"""
+        while True:
+            job, on_done, queued = await queue.get()
+            metrics.REGISTRY.observe(
+                "tg_send_queue_wait_seconds",
+                time.monotonic() - queued,
+                destination=dest["name"],
+            )
+            try:
+                sent = await self.run(dest, job)
+                if on_done is not None:
+                    on_done(sent)
+            finally:
+                queue.task_done()
+
+    async def run(
+        self, dest: Dict[str, Any], job: Callable[[], Awaitable[Any]]
+    ) -> bool:
+        """执行发送任务，失败时按错误类型等待后重试，返回是否发送成功"""
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    await self.limiter.acquire(dest["id"])
+                    await job()
+                self.stats["sent"] += 1
+                return True
+            except errors.FloodWaitError as e:
+                # 暂停该目标，其余目标照常发送
+                delay = e.seconds
+                self.stats["flood_waits"] += 1
+                self.stats["flood_wait_seconds"] += delay
+                logger.warning(f"⚠️  发送到 {dest['name']} 触发限流，暂停 {delay} 秒")
+                error = e
+            except RETRYABLE_ERRORS as e:
+                delay = self.retry_delay * 2**attempt
+                error = e
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"❌  转发消息到 {dest['name']} 失败: {e}")
+                return False
+
+            attempt += 1
+            if attempt > self.max_retries:
+                self.stats["failed"] += 1
+                logger.error(
+                    f"❌  转发消息到 {dest['name']} 失败（已重试 {self.max_retries} 次）: {error}"
+                )
+                return False
+
+            self.stats["retries"] += 1
+            self.stats["parked_seconds"] += delay
+            self.parked_until[dest["id"]] = time.monotonic() + delay
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.parked_until.pop(dest["id"], None)
+
+    def collect_metrics(self, registry):
+        """指标采集：各目标的队列积压、暂停中的目标数、重试和限流暂停计数"""
+        for dest_id, queue in self.queues.items():
+            registry.set(
+                "tg_send_queue_depth",
+                queue.qsize(),
+                destination=self.names.get(dest_id, dest_id),
+            )
+        registry.set("tg_send_parked_destinations", len(self.parked_until))
+        registry.set("tg_send_retries_total", self.stats["retries"])
+        registry.set("tg_send_flood_parks_total", self.stats["flood_waits"])
+        registry.set("tg_send_parked_seconds_total", self.stats["parked_seconds"])
+
+    async def close(self):
+        """停止所有发送任务"""
+        pending = sum(queue.qsize() for queue in self.queues.values())
+        if pending:
+            logger.warning(f"⚠️  发送队列中仍有 {pending} 条消息未发送")
+        for task in self.workers.values():
+            task.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        self.queues.clear()
@@ -0,0 +1,300 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from . import batcher, matcher
+
+# Telegram 限流参考值：单个会话约 1 条/秒，全局约 30 条/秒
+DEFAULT_GLOBAL_RATE = 30
+DEFAULT_CHAT_RATE = 1
+# 发送队列默认值
+DEFAULT_CONCURRENCY = 10
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_DELAY = 2
+# 账号选择策略：round_robin 轮流发送，least_flooded 优先最久未触发限流的账号
+STRATEGIES = ("round_robin", "least_flooded")
+
+Path = Tuple[Any, ...]
+
+
+class ConfigError(ValueError):
+    """配置错误（path 为出错位置，如 ("sources", 0, "match_mode")，line 由加载配置时换算）"""
+
+    def __init__(self, message: str, path: Sequence[Any] = ()):
+        super().__init__(message)
+        self.message = message
+        self.path: Path = tuple(path)
+        self.line: Optional[int] = None
+
+    def __str__(self) -> str:
+        location = ""
+        for part in self.path:
+            location += f"[{part}]" if isinstance(part, int) else f".{part}"
+        location = location.lstrip(".")
+        if self.line is not None:
+            location = f"第 {self.line} 行 {location}"
+        return f"{location}: {self.message}" if location else self.message
+
+
+@dataclass(frozen=True, slots=True)
+class Limits:
+    """转发限流与发送队列配置"""
+
+    concurrency: int = DEFAULT_CONCURRENCY
+    global_rate: float = DEFAULT_GLOBAL_RATE
+    chat_rate: float = DEFAULT_CHAT_RATE
+    max_retries: int = DEFAULT_MAX_RETRIES
+    retry_delay: float = DEFAULT_RETRY_DELAY
+    account_strategy: str = "round_robin"
+
+    @classmethod
+    def from_config(cls, config: Any) -> "Limits":
+        """从配置读取（运行时配置直接返回已校验的结果）"""
+        if isinstance(config, RuntimeConfig):
+            return config.limits
+        return cls.parse(config.get("limits") or {}, ("limits",))
+
+    @classmethod
+    def parse(cls, limits_config: Dict[str, Any], path: Path) -> "Limits":
+        strategy = limits_config.get("account_strategy") or "round_robin"
+        if strategy not in STRATEGIES:
+            raise ConfigError(
+                f"不支持的账号选择策略: {strategy}（可选 {', '.join(STRATEGIES)}）",
+                path + ("account_strategy",),
+            )
+        return cls(
+            concurrency=int(
+                number(limits_config, "concurrency", DEFAULT_CONCURRENCY, path, 1)
+            ),
+            global_rate=number(limits_config, "global_rate", DEFAULT_GLOBAL_RATE, path),
+            chat_rate=number(limits_config, "chat_rate", DEFAULT_CHAT_RATE, path),
+            max_retries=int(
+                number(limits_config, "max_retries", DEFAULT_MAX_RETRIES, path, 0)
+            ),
+            retry_delay=number(
+                limits_config, "retry_delay", DEFAULT_RETRY_DELAY, path, 0
+            ),
+            account_strategy=strategy,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Batch:
+    """来源合并转发配置"""
+
+    window: float = batcher.DEFAULT_WINDOW
+    max_count: int = batcher.DEFAULT_MAX_COUNT
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """路由规则（匹配的消息转发到规则中的目标）"""
+
+    filter: matcher.KeywordFilter
+    destinations: Tuple[Any, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Source:
+    """来源（关键词过滤器已编译）"""
+
+    id: Any
+    # 监控账号（未指定时由主账号监控）
+    account: Optional[str]
+    filter: matcher.KeywordFilter
+    include_keywords: Tuple[str, ...]
+    exclude_keywords: Tuple[str, ...]
+    match_mode: str
+    destinations: Tuple[Any, ...]
+    rules: Tuple[Rule, ...]
+    batch: Optional[Batch]
+
+
+@dataclass(frozen=True, slots=True)
+class Destination:
+    """转发目标"""
+
+    id: Any
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    """已解析实体的来源路由（消息处理时按 peer id 直接查找）"""
+
+    name: str
+    account: Any
+    entity: Any
+    filter: matcher.KeywordFilter
+    destinations: Tuple[Dict[str, Any], ...]
+    rules: Tuple[Tuple[matcher.KeywordFilter, Tuple[Dict[str, Any], ...]], ...]
+    batcher: Optional[batcher.MessageBatcher]
+
+
+@dataclass(frozen=True, slots=True)
+class RuntimeConfig:
+    """运行时配置（不可变，加载时完成校验和编译；其余配置段仍按字典读取）"""
+
+    raw: Dict[str, Any]
+    # 启用的来源和目标
+    sources: Tuple[Source, ...]
+    destinations: Tuple[Destination, ...]
+    # 配置中的来源和目标总数（含未启用）
+    source_count: int
+    destination_count: int
+    # 未启用目标的标识（小写），来源中引用时不当作新目标解析
+    disabled_destinations: FrozenSet[str]
+    limits: Limits
+
+    @classmethod
+    def from_config(cls, config: Any) -> "RuntimeConfig":
+        """校验并编译配置（出错时抛出 ConfigError）"""
+        if isinstance(config, RuntimeConfig):
+            return config
+
+        source_configs = items(config, "sources")
+        sources = tuple(
+            parse_source(source, ("sources", index))
+            for index, source in enumerate(source_configs)
+            if source.get("enabled", False)
+        )
+
+        destination_configs = items(config, "destinations")
+        destinations = []
+        disabled = set()
+        for index, dest in enumerate(destination_configs):
+            dest_id = required(dest, "id", ("destinations", index))
+            if dest.get("enabled", False):
+                destinations.append(Destination(dest_id))
+            else:
+                disabled.add(str(dest_id).strip().lower())
+
+        return cls(
+            raw=config,
+            sources=sources,
+            destinations=tuple(destinations),
+            source_count=len(source_configs),
+            destination_count=len(destination_configs),
+            disabled_destinations=frozenset(disabled),
+            limits=Limits.parse(section(config, "limits"), ("limits",)),
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.raw.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.raw[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.raw
+
+
+def section(config: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """读取配置段（未填写时为空）"""
+    value = config.get(key) or {}
+    if not isinstance(value, dict):
+        raise ConfigError("应为键值配置", (key,))
+    return value
+
+
+def items(config: Dict[str, Any], key: str) -> List[Dict[str, Any]]:
+    """读取列表配置段（每项为键值配置）"""
+    value = config.get(key) or []
+    if not isinstance(value, list):
+        raise ConfigError("应为列表", (key,))
+    for index, item in enumerate(value):
+        if not isinstance(item, dict):
+            raise ConfigError("应为键值配置", (key, index))
+    return value
+
+
+def required(item: Dict[str, Any], key: str, path: Path) -> Any:
+    """读取必填项"""
+    value = item.get(key)
+    if value is None or str(value).strip() == "":
+        raise ConfigError(f"缺少 {key}", path)
+    return value
+
+
+def sequence(item: Dict[str, Any], key: str, path: Path) -> Tuple[Any, ...]:
+    """读取列表项（未填写时为空）"""
+    value = item.get(key) or []
+    if not isinstance(value, list):
+        raise ConfigError("应为列表", path + (key,))
+    return tuple(value)
+
+
+def number(
+    item: Dict[str, Any], key: str, default: float, path: Path, minimum: float = None
+) -> float:
+    """读取数值项（未指定下限时须大于 0）"""
+    value = item.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ConfigError(f"应为数字: {value}", path + (key,))
+    if (minimum is None and value <= 0) or (minimum is not None and value < minimum):
+        limit = "大于 0" if minimum is None else f"不小于 {minimum}"
+        raise ConfigError(f"应{limit}: {value}", path + (key,))
+    return value
+
+
+def parse_filter(item: Dict[str, Any], path: Path) -> matcher.KeywordFilter:
+    """编译关键词过滤器"""
+    include = sequence(item, "include_keywords", path)
+    exclude = sequence(item, "exclude_keywords", path)
+    mode = item.get("match_mode") or "plain"
+    if mode not in matcher.MATCH_MODES:
+        raise ConfigError(
+            f"不支持的匹配模式: {mode}（可选 {', '.join(matcher.MATCH_MODES)}）",
+            path + ("match_mode",),
+        )
+    try:
+        return matcher.KeywordFilter(list(include), list(exclude), mode)
+    except re.error as e:
+        # 只在出错时定位是哪一组关键词
+        key = "exclude_keywords"
+        try:
+            matcher.compile_keywords(list(include), mode)
+        except re.error:
+            key = "include_keywords"
+        raise ConfigError(f"正则表达式无效: {e}", path + (key,))
+
+
+def parse_source(source: Dict[str, Any], path: Path) -> Source:
+    """校验并编译来源（含路由规则和合并转发）"""
+    source_id = required(source, "id", path)
+    rules = []
+    for index, rule in enumerate(sequence(source, "rules", path)):
+        rule_path = path + ("rules", index)
+        if not isinstance(rule, dict):
+            raise ConfigError("应为键值配置", rule_path)
+        rules.append(
+            Rule(
+                parse_filter(rule, rule_path),
+                sequence(rule, "destinations", rule_path),
+            )
+        )
+
+    batch = None
+    batch_config = source.get("batch") or {}
+    if not isinstance(batch_config, dict):
+        raise ConfigError("应为键值配置", path + ("batch",))
+    if batch_config.get("enable", False):
+        batch_path = path + ("batch",)
+        batch = Batch(
+            window=number(batch_config, "window", batcher.DEFAULT_WINDOW, batch_path),
+            max_count=int(
+                number(batch_config, "max_count", batcher.DEFAULT_MAX_COUNT, batch_path)
+            ),
+        )
+
+    return Source(
+        id=source_id,
+        account=str(source["account"]) if source.get("account") else None,
+        filter=parse_filter(source, path),
+        include_keywords=tuple(map(str, sequence(source, "include_keywords", path))),
+        exclude_keywords=tuple(map(str, sequence(source, "exclude_keywords", path))),
+        match_mode=source.get("match_mode") or "plain",
+        destinations=sequence(source, "destinations", path),
+        rules=tuple(rules),
+        batch=batch,
+    )
@@ -0,0 +1,134 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+DEFAULT_INTERVAL = 5
+# 连续写入合并为一次重载
+DEBOUNCE_DELAY = 1
+
+# inotify 常量（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigWatcher:
+    """配置文件监听（优先使用 inotify，不可用时轮询修改时间）"""
+
+    def __init__(
+        self,
+        path: str,
+        callback: Callable[[], Awaitable[Any]],
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        self.path = path
+        self.callback = callback
+        self.interval = interval
+        self.fd: Optional[int] = None
+        self.poller = None
+        self.pending = None
+        self.lock = asyncio.Lock()
+        self.signature = self.stat()
+
+    def start(self):
+        """开始监听"""
+        if self.start_inotify():
+            logger.info(f"👁️  监听配置文件变化: {self.path}（inotify）")
+        else:
+            self.poller = asyncio.create_task(self.poll())
+            logger.info(
+                f"👁️  监听配置文件变化: {self.path}（每 {self.interval} 秒检查）"
+            )
+
+    def start_inotify(self) -> bool:
+        """注册 inotify 监听（监听所在目录，兼容编辑器先写临时文件再重命名）"""
+        try:
+            libc = ctypes.CDLL(
+                ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+            )
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return False
+            directory = os.path.dirname(os.path.abspath(self.path))
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+                os.close(fd)
+                return False
+            asyncio.get_running_loop().add_reader(fd, self.on_inotify)
+        except (AttributeError, OSError, NotImplementedError):
+            return False
+        self.fd = fd
+        return True
+
+    def on_inotify(self):
+        """读取 inotify 事件，配置文件有变化时安排重载"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        name = os.path.basename(self.path).encode()
+        offset = 0
+        changed = False
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            if data[offset : offset + length].rstrip(b"\0") == name:
+                changed = True
+            offset += length
+        if changed:
+            self.schedule()
+
+    async def poll(self):
+        """轮询修改时间和大小"""
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.stat() != self.signature:
+                self.schedule()
+
+    def stat(self) -> Optional[Tuple[float, int]]:
+        """文件签名（修改时间、大小）"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def schedule(self):
+        """延迟重载（合并连续写入）"""
+        if self.pending is None:
+            self.pending = asyncio.create_task(self.reload_later())
+
+    async def reload_later(self):
+        await asyncio.sleep(DEBOUNCE_DELAY)
+        self.pending = None
+        # 上一次重载未完成时等待，依次执行
+        async with self.lock:
+            signature = self.stat()
+            if signature is None or signature == self.signature:
+                return
+            self.signature = signature
+            try:
+                await self.callback()
+            except Exception as e:
+                logger.error(f"❌  重新加载配置失败: {e}")
+
+    def stop(self):
+        """停止监听"""
+        if self.fd is not None:
+            asyncio.get_running_loop().remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        for task in (self.poller, self.pending):
+            if task is not None:
+                task.cancel()
+        self.poller = self.pending = None
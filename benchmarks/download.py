@@ -0,0 +1,112 @@
+"""
+下载性能测试：用替身客户端的 iter_download（每个分块按请求延迟计时）下载文件，
+按分段并行数输出下载速度，并校验下载文件的内容。
+
+    python benchmarks/download.py
+    python benchmarks/download.py --size 256 --parallel 1,4,8,16 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import stub
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Telegram-Tools 下载性能测试")
+    parser.add_argument("--size", type=float, default=64, help="文件大小（MB）")
+    parser.add_argument(
+        "--parallel", default="1,2,4,8", help="分段并行数（逗号分隔，1 为顺序下载）"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="每个分块的请求延迟（秒）"
+    )
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    parser.add_argument("--output", help="结果保存为 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def expected_digest(size: int, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    for position in range(0, size, chunk_size):
+        digest.update(stub.file_bytes(position, min(chunk_size, size - position)))
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def bench(args, download, parallel: int, expected: str) -> Dict[str, Any]:
+    size = int(args.size * 1024 * 1024)
+    client = stub.FakeTelegramClient([], latency=args.latency)
+    message = SimpleNamespace(
+        media=stub.make_document(size), file=SimpleNamespace(size=size), client=client
+    )
+    with tempfile.TemporaryDirectory() as download_path:
+        manager = download.DownloadManager(
+            client, download_path=download_path, parallel=parallel
+        )
+        started = time.perf_counter()
+        path = await manager.download(message, "bench.bin")
+        elapsed = time.perf_counter() - started
+        valid = file_digest(path) == expected
+    return {
+        "parallel": parallel,
+        "seconds": round(elapsed, 3),
+        "mb_per_second": round(size / 1024 / 1024 / elapsed, 1),
+        "valid": valid,
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    sys.path.insert(0, APP_PATH)
+    from src import download
+
+    expected = expected_digest(int(args.size * 1024 * 1024), download.CHUNK_SIZE)
+    return [
+        await bench(args, download, int(parallel), expected)
+        for parallel in args.parallel.split(",")
+    ]
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    results = asyncio.run(run(args))
+
+    columns = list(results[0])
+    print("  ".join(f"{column:>13}" for column in columns))
+    for result in results:
+        print("  ".join(f"{str(result[column]):>13}" for column in columns))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if not all(result["valid"] for result in results):
+        print("❌  下载文件内容不一致")
+        return 1
+    print("✅  下载文件内容一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+关键词匹配性能测试：比较逐个关键词查找（旧实现）与前缀树正则（matcher.KeywordFilter），
+按关键词数量输出每条消息的匹配耗时，并检查两者的匹配结果一致。
+
+    python benchmarks/matcher.py
+    python benchmarks/matcher.py --keywords 10,100,1000,5000 --messages 5000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+# 生成关键词和消息用的字符（中英文混合）
+ALPHABET = "abcdefghijklmnopqrstuvwxyz行情通知重要紧急广告推广价格上涨下跌"
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="关键词匹配性能测试")
+    parser.add_argument(
+        "--keywords", default="10,100,1000", help="包含关键词数量（逗号分隔）"
+    )
+    parser.add_argument("--messages", type=int, default=2000, help="消息数量")
+    parser.add_argument("--length", type=int, default=200, help="消息长度（字符）")
+    parser.add_argument(
+        "--match-ratio", type=float, default=0.1, help="包含关键词的消息比例"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取最快）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", help="结果保存为 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def loop_match(text: str, include: List[str], exclude: List[str]) -> bool:
+    """旧实现：每个关键词分别小写后在文本中查找"""
+    if not text:
+        return False
+    include_condition = (
+        any(keyword.lower() in text.lower() for keyword in include) if include else True
+    )
+    exclude_condition = (
+        not any(keyword.lower() in text.lower() for keyword in exclude)
+        if exclude
+        else True
+    )
+    return include_condition and exclude_condition
+
+
+def random_word(rng: random.Random, low: int = 3, high: int = 8) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(low, high)))
+
+
+def build_messages(
+    rng: random.Random, keywords: List[str], count: int, length: int, ratio: float
+) -> List[str]:
+    """生成消息（按比例插入关键词，大小写随机）"""
+    messages = []
+    for _ in range(count):
+        text = "".join(rng.choice(ALPHABET + "   ") for _ in range(length))
+        if rng.random() < ratio:
+            keyword = rng.choice(keywords)
+            if rng.random() < 0.5:
+                keyword = keyword.upper()
+            position = rng.randint(0, length)
+            text = text[:position] + keyword + text[position:]
+        messages.append(text)
+    return messages
+
+
+def best_seconds(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench(args: argparse.Namespace, count: int, matcher) -> Dict[str, Any]:
+    rng = random.Random(args.seed + count)
+    include = list({random_word(rng) for _ in range(count)})
+    exclude = list({random_word(rng) for _ in range(max(1, count // 10))})
+    messages = build_messages(
+        rng, include, args.messages, args.length, args.match_ratio
+    )
+
+    compile_started = time.perf_counter()
+    keyword_filter = matcher.KeywordFilter(include, exclude)
+    compile_seconds = time.perf_counter() - compile_started
+
+    loop_results = [loop_match(text, include, exclude) for text in messages]
+    trie_results = [keyword_filter.match(text) for text in messages]
+    mismatches = sum(a != b for a, b in zip(loop_results, trie_results))
+
+    loop_seconds = best_seconds(
+        lambda: [loop_match(text, include, exclude) for text in messages],
+        args.repeat,
+    )
+    trie_seconds = best_seconds(
+        lambda: [keyword_filter.match(text) for text in messages], args.repeat
+    )
+    return {
+        "keywords": len(include),
+        "matched": sum(trie_results),
+        "mismatches": mismatches,
+        "compile_ms": round(compile_seconds * 1000, 2),
+        "loop_us": round(loop_seconds / len(messages) * 1e6, 2),
+        "trie_us": round(trie_seconds / len(messages) * 1e6, 2),
+        "speedup": round(loop_seconds / trie_seconds, 1),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    sys.path.insert(0, APP_PATH)
+    from src import matcher
+
+    results = [bench(args, int(count), matcher) for count in args.keywords.split(",")]
+    columns = list(results[0])
+    print("  ".join(f"{column:>10}" for column in columns))
+    for result in results:
+        print("  ".join(f"{result[column]:>10}" for column in columns))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if any(result["mismatches"] for result in results):
+        print("❌  两种实现的匹配结果不一致")
+        return 1
+    print("✅  匹配结果一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""
+性能测试：用进程内替身客户端驱动 TelegramMonitor、ClientManage 和 TelegramScheduler，
+输出吞吐、端到端延迟（p50/p99）、内存和启动耗时，可与基准结果比较发现性能退化。
+
+    python benchmarks/run.py --messages 5000 --rate 1000
+    python benchmarks/run.py --latency 0.05 --flood-rate 0.01 --output result.json
+    python benchmarks/run.py --baseline result.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import stub
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+# 频道ID起点（来源在前，目标在后）
+CHANNEL_BASE = 1000000000
+# 越大越好的指标，其余越小越好
+HIGHER_IS_BETTER = ("throughput", "messages_per_second")
+COMPARED = (
+    "import_seconds",
+    "throughput",
+    "messages_per_second",
+    "latency_p50_ms",
+    "latency_p99_ms",
+    "startup_seconds",
+    "scheduler_startup_seconds",
+    "scheduler_lateness_p99_ms",
+)
+# 低于该差值视为测量误差（按指标单位）
+NOISE_FLOOR = {"_seconds": 0.005, "_ms": 1.0}
+
+logger = logging.getLogger("benchmark")
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Telegram-Tools 性能测试")
+    parser.add_argument("--messages", type=int, default=2000, help="发送的来源消息数")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="来源消息速率（条/秒），0 为不限速"
+    )
+    parser.add_argument("--sources", type=int, default=5, help="来源数量")
+    parser.add_argument("--destinations", type=int, default=3, help="目标数量")
+    parser.add_argument("--accounts", type=int, default=1, help="发送账号数量")
+    parser.add_argument(
+        "--match-ratio", type=float, default=1.0, help="匹配关键词的消息比例"
+    )
+    parser.add_argument("--album-ratio", type=float, default=0.0, help="相册比例")
+    parser.add_argument("--latency", type=float, default=0.0, help="请求延迟（秒）")
+    parser.add_argument(
+        "--flood-rate", type=float, default=0.0, help="请求触发 FloodWait 的概率"
+    )
+    parser.add_argument(
+        "--flood-seconds", type=int, default=1, help="FloodWait 等待秒数"
+    )
+    parser.add_argument(
+        "--restricted-rate",
+        type=float,
+        default=0.0,
+        help="转发受限（改为新建消息发送）的概率",
+    )
+    parser.add_argument(
+        "--global-rate",
+        type=float,
+        default=1e6,
+        help="每秒最多发送条数（默认不限，测试程序本身开销；30 为实际限制）",
+    )
+    parser.add_argument(
+        "--chat-rate",
+        type=float,
+        default=1e6,
+        help="单个目标每秒最多发送条数（1 为实际限制）",
+    )
+    parser.add_argument("--concurrency", type=int, default=10, help="同时发送请求数")
+    parser.add_argument("--batch", action="store_true", help="开启来源合并转发")
+    parser.add_argument("--dedup", action="store_true", help="开启跨来源去重")
+    parser.add_argument("--journal", action="store_true", help="开启投递日志")
+    parser.add_argument("--schedulers", type=int, default=100, help="定时任务数量")
+    parser.add_argument(
+        "--scheduler-targets", type=int, default=1, help="每个定时任务的目标数量"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    parser.add_argument("--output", help="结果保存为 JSON 文件")
+    parser.add_argument("--baseline", help="与基准结果（JSON）比较")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="允许的性能退化比例"
+    )
+    return parser.parse_args(argv)
+
+
+def build_config(args: argparse.Namespace) -> Dict[str, Any]:
+    """生成测试配置（实体缓存不落盘）"""
+    return {
+        "sources": [
+            {
+                "enabled": True,
+                "id": -(10**12) - (CHANNEL_BASE + i),
+                "include_keywords": ["keyword"] if args.match_ratio < 1 else [],
+                "batch": {"enable": args.batch},
+            }
+            for i in range(args.sources)
+        ],
+        "destinations": [
+            {"enabled": True, "id": -(10**12) - (CHANNEL_BASE + args.sources + i)}
+            for i in range(args.destinations)
+        ],
+        "schedulers": [
+            {
+                "enabled": True,
+                "targets": [
+                    -(10**12) - (CHANNEL_BASE + args.sources + j)
+                    for j in range(min(args.scheduler_targets, args.destinations))
+                ],
+                "cron": "0 0 1 1 *",
+                "message": f"定时 {i}",
+            }
+            for i in range(args.schedulers)
+        ],
+        "limits": {
+            "global_rate": args.global_rate,
+            "chat_rate": args.chat_rate,
+            "concurrency": args.concurrency,
+        },
+        "cache": {"entity_ttl": 0},
+        "dedup": {"enable": args.dedup},
+    }
+
+
+def build_clients(args: argparse.Namespace) -> List[stub.FakeTelegramClient]:
+    entities = [
+        stub.make_channel(CHANNEL_BASE + i, f"频道{i}", f"bench{i}")
+        for i in range(args.sources + args.destinations)
+    ]
+    return [
+        stub.FakeTelegramClient(
+            entities,
+            latency=args.latency,
+            flood_rate=args.flood_rate,
+            flood_seconds=args.flood_seconds,
+            restricted_rate=args.restricted_rate,
+            seed=args.seed + i,
+        )
+        for i in range(args.accounts)
+    ]
+
+
+def build_client_manage(modules, config, clients, args):
+    """创建 ClientManage 并接入替身客户端（代替 init_client 连接 Telegram）"""
+    client, pool = modules["client"], modules["pool"]
+    client_manage = client.ClientManage(config)
+    client_manage.client = clients[0]
+    for i, account_client in enumerate(clients):
+        name = pool.PRIMARY_ACCOUNT if i == 0 else f"bench{i}"
+        client_manage.pool.add(
+            pool.Account(name, account_client, args.global_rate, primary=i == 0)
+        )
+    if len(clients) > 1:
+        client_manage.limiter.set_global_rate(args.global_rate * len(clients))
+    return client_manage
+
+
+def import_seconds() -> float:
+    """新进程中导入程序模块的耗时（冷启动）"""
+    code = (
+        "import sys, time; started = time.perf_counter(); "
+        f"sys.path.insert(0, {APP_PATH!r}); "
+        "from src import client, monitor, scheduler; "
+        "print(time.perf_counter() - started)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip())
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def rss_mb() -> float:
+    """当前常驻内存（MB）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return 0.0
+
+
+async def bench_monitor(args, modules) -> Dict[str, Any]:
+    """转发链路：来源消息 -> 过滤 -> 路由 -> 发送队列 -> 替身客户端"""
+    config = build_config(args)
+    clients = build_clients(args)
+    journal_dir = None
+
+    started = time.perf_counter()
+    client_manage = build_client_manage(modules, config, clients, args)
+    if args.journal:
+        journal_dir = tempfile.TemporaryDirectory()
+        client_manage.journal = modules["journal"].DeliveryJournal(
+            path=os.path.join(journal_dir.name, "journal.db")
+        )
+    telegram_monitor = modules["monitor"].TelegramMonitor(config)
+    await telegram_monitor.start_monitor(client_manage)
+    if telegram_monitor.backfill_task is not None:
+        await telegram_monitor.backfill_task
+    startup = time.perf_counter() - started
+
+    source_ids = list(telegram_monitor.source_index)
+    rng = random.Random(args.seed)
+    emitted: Dict[int, float] = {}
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    for i in range(args.messages):
+        if args.rate:
+            delay = t0 + i / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif i % 100 == 0:
+            await asyncio.sleep(0)
+
+        source_id = source_ids[i % len(source_ids)]
+        text = "行情 keyword" if rng.random() < args.match_ratio else "无关消息"
+        text = f"{text} {i}"
+        if rng.random() < args.album_ratio:
+            messages = [
+                clients[0].make_message(source_id, text, photo=True, grouped_id=i + 1)
+                for _ in range(3)
+            ]
+        else:
+            messages = [clients[0].make_message(source_id, text)]
+        now = time.perf_counter()
+        for message in messages:
+            emitted[message.id] = now
+        clients[0].emit(source_id, messages)
+    emit_elapsed = time.perf_counter() - t0
+
+    # 等待处理完成（合并批次立即转发）
+    await clients[0].drain()
+    for source in telegram_monitor.source_index.values():
+        if source.batcher is not None:
+            await source.batcher.flush()
+    send_queue = client_manage.send_queue
+    await asyncio.gather(*(q.join() for q in list(send_queue.queues.values())))
+    elapsed = time.perf_counter() - t0
+    rss_after = rss_mb()
+
+    latencies = [
+        sent_at - emitted[message_id]
+        for account_client in clients
+        for sent_at, _, ids, _ in account_client.sent
+        for message_id in ids
+        if message_id in emitted
+    ]
+    result = {
+        "messages": len(emitted),
+        "deliveries": len(latencies),
+        "ingest_rate": round(len(emitted) / max(emit_elapsed, 1e-9), 1),
+        "messages_per_second": round(len(emitted) / max(elapsed, 1e-9), 1),
+        "throughput": round(len(latencies) / max(elapsed, 1e-9), 1),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "startup_seconds": round(startup, 4),
+        "memory_growth_mb": round(rss_after - rss_before, 1),
+        "flood_waits": sum(c.flood_waits for c in clients),
+        "send_failures": send_queue.stats["failed"],
+    }
+
+    await send_queue.close()
+    await telegram_monitor.downloader.close()
+    if client_manage.journal:
+        await client_manage.journal.close()
+    if telegram_monitor.dedup:
+        telegram_monitor.dedup.close()
+    if journal_dir is not None:
+        journal_dir.cleanup()
+    return result
+
+
+async def bench_scheduler(args, modules) -> Dict[str, Any]:
+    """定时任务：加载任务耗时，所有任务同时到期时的执行延迟"""
+    if not args.schedulers:
+        return {}
+    config = build_config(args)
+    clients = build_clients(args)[:1]
+    clients[0].flood_rate = clients[0].restricted_rate = 0
+    client_manage = build_client_manage(modules, config, clients, args)
+    telegram_scheduler = modules["scheduler"].TelegramScheduler(config)
+
+    started = time.perf_counter()
+    await telegram_scheduler.start_scheduler(client_manage)
+    startup = time.perf_counter() - started
+
+    # 等所有任务执行完（耗时指标已记录）再关闭调度器，避免取消仍在运行的任务
+    finished = []
+    telegram_scheduler.scheduler.add_listener(
+        finished.append, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR
+    )
+    due = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    for job in telegram_scheduler.scheduler.get_jobs():
+        job.modify(next_run_time=now)
+    telegram_scheduler.scheduler.wakeup()
+    expected = args.schedulers * min(args.scheduler_targets, args.destinations)
+    deadline = due + 30 + expected * args.latency
+    while len(finished) < args.schedulers and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    telegram_scheduler.scheduler.shutdown(wait=False)
+
+    lateness = [sent_at - due for sent_at, _, _, _ in clients[0].sent]
+    return {
+        "scheduler_jobs": args.schedulers,
+        "scheduler_finished": len(finished),
+        "scheduler_sent": len(lateness),
+        "scheduler_startup_seconds": round(startup, 4),
+        "scheduler_lateness_p50_ms": round(percentile(lateness, 0.5) * 1000, 3),
+        "scheduler_lateness_p99_ms": round(percentile(lateness, 0.99) * 1000, 3),
+    }
+
+
+def compare(
+    result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """与基准结果比较，返回超出允许范围的退化项"""
+    regressions = []
+    for key in COMPARED:
+        old, new = baseline.get(key), result.get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if key in HIGHER_IS_BETTER:
+            change = -change
+        floor = next((v for s, v in NOISE_FLOOR.items() if key.endswith(s)), 0)
+        if change > tolerance and abs(new - old) > floor:
+            regressions.append(f"{key}: {old} -> {new}（退化 {change:.0%}）")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    result = {"import_seconds": round(import_seconds(), 4)}
+    sys.path.insert(0, APP_PATH)
+    from src import client, journal, monitor, pool, scheduler
+
+    modules = {
+        "client": client,
+        "journal": journal,
+        "monitor": monitor,
+        "pool": pool,
+        "scheduler": scheduler,
+    }
+    result.update(await bench_monitor(args, modules))
+    result.update(await bench_scheduler(args, modules))
+    result["peak_rss_mb"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+    return result
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    result = asyncio.run(run(args))
+
+    width = max(len(key) for key in result)
+    for key, value in result.items():
+        print(f"{key:<{width}}  {value}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("❌  性能退化:")
+            for regression in regressions:
+                print(f"    - {regression}")
+            return 1
+        print("✅  未发现性能退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+import asyncio
+import itertools
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+from telethon import errors, events, functions, utils
+from telethon._updates import EntityCache
+from telethon.tl import types
+
+# 消息ID全局递增（不同来源的消息ID也不重复，便于按ID统计延迟）
+MESSAGE_IDS = itertools.count(1)
+PHOTO_IDS = itertools.count(1)
+# 消息文本末尾带消息ID，新建消息发送时也能对应到原消息
+ID_TAG = re.compile(r"#(\d+)$")
+# 替身文件内容：第 n 个字节为 n % 251（按位置确定，便于校验下载结果）
+FILE_PATTERN = bytes(range(251)) * (2 * 1024 * 1024 // 251 + 1)
+
+
+def make_channel(channel_id: int, title: str, username: Optional[str] = None):
+    """创建频道实体"""
+    return types.Channel(
+        id=channel_id,
+        title=title,
+        photo=types.ChatPhotoEmpty(),
+        date=None,
+        access_hash=channel_id * 7,
+        username=username,
+        broadcast=True,
+    )
+
+
+def make_document(size: int):
+    """创建指定大小的文件媒体"""
+    return types.MessageMediaDocument(
+        document=types.Document(
+            id=next(PHOTO_IDS),
+            access_hash=1,
+            file_reference=b"",
+            date=None,
+            mime_type="application/octet-stream",
+            size=size,
+            dc_id=1,
+            attributes=[],
+        )
+    )
+
+
+def file_bytes(position: int, length: int) -> bytes:
+    """替身文件中从 position 开始的 length 字节（length 不超过 2 MB）"""
+    start = position % 251
+    return FILE_PATTERN[start : start + length]
+
+
+class FakeTelegramClient:
+    """进程内 TelegramClient 替身（事件分发、转发、发送、实体解析，可注入延迟、FloodWait 和转发受限）"""
+
+    def __init__(
+        self,
+        entities: List[Any],
+        latency: float = 0.0,
+        flood_rate: float = 0.0,
+        flood_seconds: int = 1,
+        restricted_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.entities = entities
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.restricted_rate = restricted_rate
+        self.random = random.Random(seed)
+        # Message 初始化和 Message.text 读取的客户端属性
+        self.parse_mode = None
+        self._self_id = 1
+        self._mb_entity_cache = EntityCache()
+        self.handlers: List[Tuple[Any, Any]] = []
+        self.tasks = set()
+        # 已发送记录：(完成时间, 目标 peer id, 消息ID列表, 方式)
+        self.sent: List[Tuple[float, int, List[int], str]] = []
+        self.flood_waits = 0
+        self.uploads = 0
+        self.media_uploads = 0
+        self.downloaded = 0
+        self.index: Dict[Any, Any] = {}
+        for entity in entities:
+            peer_id = utils.get_peer_id(entity)
+            self.index[peer_id] = entity
+            self.index[str(peer_id)] = entity
+            if getattr(entity, "username", None):
+                self.index[entity.username.lower()] = entity
+
+    # ---------------- 连接 ----------------
+    def is_connected(self) -> bool:
+        return True
+
+    async def disconnect(self):
+        await self.drain()
+
+    async def get_me(self):
+        return types.User(id=1, is_self=True, first_name="bench", username="bench")
+
+    async def is_bot(self) -> bool:
+        return False
+
+    # ---------------- 实体 ----------------
+    async def get_entity(self, identifier: Any):
+        key = identifier
+        if isinstance(identifier, str):
+            key = identifier.strip().lstrip("@").lower()
+            if key.lstrip("-").isdigit():
+                key = int(key)
+        elif not isinstance(identifier, int):
+            key = utils.get_peer_id(identifier)
+        entity = self.index.get(key)
+        if entity is None:
+            raise ValueError(f"Cannot find any entity corresponding to {identifier}")
+        return entity
+
+    async def get_input_entity(self, identifier: Any):
+        return utils.get_input_peer(await self.get_entity(identifier))
+
+    async def iter_dialogs(self):
+        for entity in self.entities:
+            yield SimpleNamespace(entity=entity)
+
+    async def iter_messages(self, entity, limit=None, **kwargs):
+        """历史消息（替身没有历史记录）"""
+        return
+        yield
+
+    async def get_messages(self, entity, ids=None, **kwargs):
+        return [None] * len(ids) if isinstance(ids, list) else None
+
+    # ---------------- 事件 ----------------
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event=None) -> int:
+        before = len(self.handlers)
+        self.handlers = [h for h in self.handlers if h[0] != callback]
+        return before - len(self.handlers)
+
+    def make_message(
+        self, chat_id: int, text: str, photo: bool = False, grouped_id=None
+    ) -> types.Message:
+        """创建来源消息（与 Telethon 收到的消息对象相同）"""
+        media = None
+        if photo:
+            media = types.MessageMediaPhoto(
+                photo=types.Photo(
+                    id=next(PHOTO_IDS),
+                    access_hash=1,
+                    file_reference=b"",
+                    date=None,
+                    sizes=[],
+                    dc_id=1,
+                )
+            )
+        message_id = next(MESSAGE_IDS)
+        real_id, peer_type = utils.resolve_id(chat_id)
+        message = types.Message(
+            id=message_id,
+            peer_id=peer_type(real_id),
+            date=datetime.now(timezone.utc),
+            message=f"{text} #{message_id}",
+            media=media,
+            grouped_id=grouped_id,
+        )
+        message._finish_init(self, {chat_id: self.index.get(chat_id)}, None)
+        return message
+
+    def emit(self, chat_id: int, messages: List[types.Message]):
+        """分发新消息（与 Telethon 默认的非顺序模式相同，每个更新一个任务）"""
+        album = len(messages) > 1
+        for callback, builder in self.handlers:
+            if album and isinstance(builder, events.Album):
+                event = SimpleNamespace(chat_id=chat_id, messages=messages)
+            elif not album and isinstance(builder, events.NewMessage):
+                event = SimpleNamespace(chat_id=chat_id, message=messages[0])
+                if builder.func and not builder.func(event):
+                    continue
+            else:
+                continue
+            task = asyncio.create_task(callback(event))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def drain(self):
+        """等待已分发的事件处理完成"""
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks), return_exceptions=True)
+
+    # ---------------- 发送 ----------------
+    async def request(self, restricted: bool = False):
+        """模拟一次请求（网络延迟、FloodWait、转发受限）"""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.flood_rate and self.random.random() < self.flood_rate:
+            self.flood_waits += 1
+            raise errors.FloodWaitError(None, capture=self.flood_seconds)
+        if restricted and self.restricted_rate:
+            if self.random.random() < self.restricted_rate:
+                raise errors.ChatForwardsRestrictedError(None)
+
+    async def forward_messages(self, entity, messages, from_peer=None, **kwargs):
+        await self.request(restricted=True)
+        ids = [m if isinstance(m, int) else m.id for m in messages]
+        self.sent.append((time.perf_counter(), self.peer_id(entity), ids, "forward"))
+        return messages
+
+    async def send_message(self, entity, message="", **kwargs):
+        await self.request()
+        ids = self.tagged_ids([message])
+        self.sent.append((time.perf_counter(), self.peer_id(entity), ids, "message"))
+
+    async def send_file(self, entity, file, caption=None, **kwargs):
+        await self.request()
+        captions = caption if isinstance(caption, list) else [caption]
+        ids = self.tagged_ids(captions)
+        self.sent.append((time.perf_counter(), self.peer_id(entity), ids, "file"))
+
+    async def download_media(self, message, file=None, **kwargs) -> str:
+        """下载媒体到目录（替身文件内容固定）"""
+        await self.request()
+        path = os.path.join(file, f"media_{message.id}")
+        with open(path, "wb") as f:
+            f.write(file_bytes(0, 1024))
+        return path
+
+    async def upload_file(self, file, **kwargs):
+        await self.request()
+        self.uploads += 1
+        return types.InputFile(
+            id=self.uploads, parts=1, name=str(file), md5_checksum=""
+        )
+
+    async def iter_download(
+        self,
+        file,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        request_size: int = 512 * 1024,
+        file_size: Optional[int] = None,
+        **kwargs,
+    ):
+        """分块下载（每个分块为一次请求，按请求延迟计时）"""
+        size = file_size or file.document.size
+        count = 0
+        while offset < size and (limit is None or count < limit):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            chunk = file_bytes(offset, min(request_size, size - offset))
+            self.downloaded += len(chunk)
+            yield chunk
+            offset += len(chunk)
+            count += 1
+
+    async def __call__(self, request):
+        """只实现 messages.uploadMedia（上传后返回可复用的媒体）"""
+        if not isinstance(request, functions.messages.UploadMediaRequest):
+            raise NotImplementedError(type(request).__name__)
+        await self.request()
+        self.media_uploads += 1
+        media_id = next(PHOTO_IDS)
+        if isinstance(request.media, types.InputMediaUploadedPhoto):
+            return types.MessageMediaPhoto(
+                photo=types.Photo(
+                    id=media_id,
+                    access_hash=1,
+                    file_reference=b"",
+                    date=None,
+                    sizes=[],
+                    dc_id=1,
+                )
+            )
+        return types.MessageMediaDocument(
+            document=types.Document(
+                id=media_id,
+                access_hash=1,
+                file_reference=b"",
+                date=None,
+                mime_type=request.media.mime_type,
+                size=0,
+                dc_id=1,
+                attributes=request.media.attributes,
+            )
+        )
+
+    @staticmethod
+    def tagged_ids(texts: List[Optional[str]]) -> List[int]:
+        """从消息文本中取回原消息ID"""
+        return [
+            int(match.group(1))
+            for match in (ID_TAG.search(text or "") for text in texts)
+            if match
+        ]
+
+    @staticmethod
+    def peer_id(entity: Any) -> int:
+        return entity if isinstance(entity, int) else utils.get_peer_id(entity)
@@ -0,0 +1,150 @@
+"""
+测试夹具：真实的 Telethon 客户端（内存会话），只替换底层 MTProto 发送器，
+请求仍经过 TelegramClient._call（FloodWait 等待阈值、按请求类型记录的限流等）。
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# 客户端所在的数据中心（媒体在同一数据中心时下载不借用其他连接）
+DC_ID = 2
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from telethon import errors, functions, types, utils
+from telethon.sessions import StringSession
+
+
+def make_channel(channel_id: int, title: str, username: Optional[str] = None):
+    """创建频道实体"""
+    return types.Channel(
+        id=channel_id,
+        title=title,
+        photo=types.ChatPhotoEmpty(),
+        date=None,
+        access_hash=channel_id * 7,
+        username=username,
+        broadcast=True,
+    )
+
+
+def make_message(
+    chat_id: int, msg_id: int, text: str = "", grouped_id=None, date=None, media=None
+):
+    """创建来源消息（不绑定客户端）"""
+    real_id, peer_type = utils.resolve_id(chat_id)
+    return types.Message(
+        id=msg_id,
+        peer_id=peer_type(real_id),
+        date=date,
+        message=text,
+        grouped_id=grouped_id,
+        media=media,
+    )
+
+
+def make_photo(photo_id: int, size: int = 1024):
+    """创建图片媒体"""
+    return types.MessageMediaPhoto(
+        photo=types.Photo(
+            id=photo_id,
+            access_hash=photo_id * 7,
+            file_reference=b"",
+            date=None,
+            sizes=[types.PhotoSize(type="y", w=800, h=800, size=size)],
+            dc_id=DC_ID,
+        )
+    )
+
+
+def make_audio(document_id: int, size: int = 1024):
+    """创建音频媒体"""
+    return types.MessageMediaDocument(
+        document=types.Document(
+            id=document_id,
+            access_hash=document_id * 7,
+            file_reference=b"",
+            date=None,
+            mime_type="audio/flac",
+            size=size,
+            dc_id=DC_ID,
+            attributes=[types.DocumentAttributeAudio(duration=1)],
+        )
+    )
+
+
+class FakeSender:
+    """MTProto 发送器替身（按请求类型返回预设错误；实体查询、文件下载和上传返回最小结果，其余返回空 Updates）"""
+
+    def __init__(self, entities: List[Any] = ()):
+        self.entities = list(entities)
+        self.requests: List[Any] = []
+        # 请求类型名 -> 要抛出的错误
+        self.errors: Dict[str, Exception] = {}
+
+    def flood(self, request_name: str, seconds: int):
+        """该类型的请求返回 FloodWait"""
+        self.errors[request_name] = errors.FloodWaitError(None, capture=seconds)
+
+    def send(self, request, ordered: bool = False):
+        self.requests.append(request)
+        future = asyncio.get_running_loop().create_future()
+        try:
+            error = self.errors.get(type(request).__name__)
+            if error is not None:
+                raise error
+            future.set_result(self.result(request))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def count(self, request_name: str) -> int:
+        """已发送的该类型请求数"""
+        return sum(type(r).__name__ == request_name for r in self.requests)
+
+    def result(self, request):
+        """按请求类型构造响应"""
+        if isinstance(request, functions.contacts.ResolveUsernameRequest):
+            for entity in self.entities:
+                if entity.username == request.username:
+                    return types.contacts.ResolvedPeer(
+                        peer=utils.get_peer(entity), chats=[entity], users=[]
+                    )
+            raise errors.UsernameNotOccupiedError(request)
+        if isinstance(request, functions.channels.GetChannelsRequest):
+            ids = {channel.channel_id for channel in request.id}
+            return types.messages.Chats(
+                chats=[entity for entity in self.entities if entity.id in ids]
+            )
+        if isinstance(request, functions.upload.GetFileRequest):
+            # 短于请求大小的分块即为最后一块
+            return types.upload.File(
+                type=types.storage.FileJpeg(), mtime=0, bytes=b"\xff\xd8media"
+            )
+        if isinstance(
+            request,
+            (
+                functions.upload.SaveFilePartRequest,
+                functions.upload.SaveBigFilePartRequest,
+            ),
+        ):
+            return True
+        if isinstance(request, functions.messages.UploadMediaRequest):
+            media_id = 1000 + len(self.requests)
+            if isinstance(request.media, types.InputMediaUploadedPhoto):
+                return make_photo(media_id)
+            return make_audio(media_id)
+        return types.Updates(updates=[], users=[], chats=[], date=None, seq=0)
+
+
+def make_client(manage, entities: List[Any]):
+    """用 ClientManage.create_client 创建客户端（不连接），返回客户端和发送器"""
+    client = manage.create_client(StringSession(), 1, "0123456789abcdef")
+    client.session.set_dc(DC_ID, "149.154.167.51", 443)
+    client.session.process_entities(SimpleNamespace(users=[], chats=entities))
+    client._sender = FakeSender(entities)
+    return client, client._sender
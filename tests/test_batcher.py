@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+import fixtures
+from src import batcher
+
+SOURCE_ID = -(10**12) - 1000000001
+DEST_A = {"id": 1, "name": "目标A"}
+DEST_B = {"id": 2, "name": "目标B"}
+
+
+def messages(*ids: int, grouped_id=None):
+    return [
+        fixtures.make_message(SOURCE_ID, i, f"消息 {i}", grouped_id=grouped_id)
+        for i in ids
+    ]
+
+
+class MessageBatcherTest(unittest.IsolatedAsyncioTestCase):
+    """按时间窗口或数量合并转发，相册不拆分，按消息ID恢复顺序"""
+
+    async def asyncSetUp(self):
+        self.batches = []
+
+        async def forward(batch, destinations):
+            self.batches.append(
+                ([m.id for m in batch], [d["id"] for d in destinations])
+            )
+
+        self.forward = forward
+
+    async def test_flush_after_window(self):
+        message_batcher = batcher.MessageBatcher(self.forward, window=0.05)
+        destinations = [DEST_A]
+        await message_batcher.add(messages(2), destinations)
+        await message_batcher.add(messages(1), destinations)
+        self.assertEqual(self.batches, [])
+
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(self.batches, [([1, 2], [1])])
+        self.assertIsNone(message_batcher.timer)
+
+    async def test_flush_at_max_count(self):
+        message_batcher = batcher.MessageBatcher(self.forward, window=60, max_count=3)
+        destinations = [DEST_A]
+        for i in range(1, 5):
+            await message_batcher.add(messages(i), destinations)
+
+        self.assertEqual(self.batches, [([1, 2, 3], [1])])
+        self.assertEqual([m.id for m in message_batcher.messages], [4])
+        await message_batcher.flush()
+        self.assertEqual(self.batches[-1], ([4], [1]))
+
+    async def test_album_is_not_split(self):
+        message_batcher = batcher.MessageBatcher(self.forward, window=60, max_count=3)
+        destinations = [DEST_A]
+        await message_batcher.add(messages(1, 2), destinations)
+        await message_batcher.add(messages(3, 4, grouped_id=9), destinations)
+
+        self.assertEqual(self.batches, [([1, 2], [1])])
+        await message_batcher.flush()
+        self.assertEqual(self.batches[-1], ([3, 4], [1]))
+
+    async def test_split_by_destinations(self):
+        message_batcher = batcher.MessageBatcher(self.forward, window=60)
+        await message_batcher.add(messages(1), [DEST_A, DEST_B])
+        await message_batcher.add(messages(2), [DEST_B])
+
+        await message_batcher.flush()
+
+        self.assertEqual(self.batches, [([1], [1]), ([1, 2], [2])])
+
+    async def test_max_count_capped_at_forward_limit(self):
+        message_batcher = batcher.MessageBatcher(self.forward, max_count=500)
+
+        self.assertEqual(message_batcher.max_count, batcher.MAX_BATCH_COUNT)
+
+    async def test_callback_error_is_logged(self):
+        async def fail(batch, destinations):
+            raise ConnectionError("连接中断")
+
+        message_batcher = batcher.MessageBatcher(fail, window=60)
+        await message_batcher.add(messages(1), [DEST_A])
+
+        with self.assertLogs(batcher.logger, "ERROR"):
+            await message_batcher.flush()
+        self.assertEqual(message_batcher.messages, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+
+import fixtures
+from src import cache
+
+
+class MediaCacheLockTest(unittest.IsolatedAsyncioTestCase):
+    """同一媒体的上传锁在仍有等待者时保留，所有使用者退出后清理"""
+
+    async def test_three_callers_share_one_lock(self):
+        media_cache = cache.MediaCache()
+        inside = peak = 0
+
+        async def upload(delay: float):
+            nonlocal inside, peak
+            await asyncio.sleep(delay)
+            async with media_cache.lock("photo"):
+                inside += 1
+                peak = max(peak, inside)
+                await asyncio.sleep(0.02)
+                inside -= 1
+
+        # 第三个调用在第一个释放、第二个尚未取得锁时到达
+        await asyncio.gather(upload(0), upload(0), upload(0.03))
+
+        self.assertEqual(peak, 1)
+        self.assertEqual(media_cache.locks, {})
+        self.assertEqual(media_cache.lock_users, {})
+
+    async def test_error_releases_lock(self):
+        media_cache = cache.MediaCache()
+
+        with self.assertRaises(ConnectionError):
+            async with media_cache.lock("photo"):
+                raise ConnectionError("连接中断")
+
+        self.assertEqual(media_cache.locks, {})
+        self.assertEqual(media_cache.lock_users, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import fixtures
+from telethon import utils
+from src import cache, client, pool
+
+SOURCE_ID = -(10**12) - 1000000001
+DEST_ID = -(10**12) - 1000000002
+
+
+class MediaHandleTest(unittest.IsolatedAsyncioTestCase):
+    """重新上传媒体：下载由收到消息的账号完成，上传和 uploadMedia 由发送账号完成"""
+
+    async def asyncSetUp(self):
+        entities = [
+            fixtures.make_channel(1000000001, "来源", "source"),
+            fixtures.make_channel(1000000002, "目标", "target"),
+        ]
+        self.manage = client.ClientManage({"cache": {"entity_ttl": 0}})
+        self.main_client, self.main_sender = fixtures.make_client(self.manage, entities)
+        self.backup_client, self.backup_sender = fixtures.make_client(
+            self.manage, entities
+        )
+        self.manage.client = self.main_client
+        self.main = pool.Account(pool.PRIMARY_ACCOUNT, self.main_client, primary=True)
+        self.backup = pool.Account("backup", self.backup_client)
+        self.manage.pool.add(self.main)
+        self.manage.pool.add(self.backup)
+        self.peer = await self.backup_client.get_input_entity(DEST_ID)
+
+    def photo_message(self):
+        """主账号收到的图片消息"""
+        message = fixtures.make_message(
+            SOURCE_ID, 1, "相册", media=fixtures.make_photo(1)
+        )
+        message._client = self.main_client
+        return message
+
+    async def test_backup_account_uploads_with_its_own_client(self):
+        message = self.photo_message()
+
+        handle = await self.manage.get_media_handle(message, self.backup, self.peer)
+
+        self.assertIsNotNone(handle)
+        # 主账号下载，备用账号上传
+        self.assertEqual(self.main_sender.count("GetFileRequest"), 1)
+        self.assertEqual(self.backup_sender.count("SaveFilePartRequest"), 1)
+        self.assertEqual(self.backup_sender.count("UploadMediaRequest"), 1)
+        self.assertEqual(self.backup_sender.count("GetFileRequest"), 0)
+        self.assertEqual(self.main_sender.count("SaveFilePartRequest"), 0)
+        self.assertEqual(self.main_sender.count("UploadMediaRequest"), 0)
+
+    async def test_handle_is_cached_per_account(self):
+        message = self.photo_message()
+
+        first = await self.manage.get_media_handle(message, self.backup, self.peer)
+        second = await self.manage.get_media_handle(message, self.backup, self.peer)
+        await self.manage.get_media_handle(message, self.main, self.peer)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.backup_sender.count("UploadMediaRequest"), 1)
+        self.assertEqual(self.main_sender.count("UploadMediaRequest"), 1)
+
+    async def test_concurrent_uploads_release_lock(self):
+        message = self.photo_message()
+
+        handles = await asyncio.gather(
+            *(
+                self.manage.get_media_handle(message, self.backup, self.peer)
+                for _ in range(3)
+            )
+        )
+
+        self.assertEqual(len(set(map(bytes, handles))), 1)
+        self.assertEqual(self.backup_sender.count("UploadMediaRequest"), 1)
+        self.assertEqual(self.manage.media_cache.locks, {})
+
+    async def test_failed_upload_releases_lock(self):
+        message = self.photo_message()
+
+        with mock.patch.object(
+            self.backup_client, "upload_file", side_effect=ConnectionError("连接中断")
+        ):
+            with self.assertRaises(ConnectionError):
+                await self.manage.get_media_handle(message, self.backup, self.peer)
+
+        self.assertEqual(self.manage.media_cache.locks, {})
+
+    async def test_file_cache_opened_on_first_use(self):
+        self.assertIsNone(self.manage.file_cache)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "morning.txt")
+            with open(path, "w") as f:
+                f.write("早安")
+            file_cache = cache.FileCache(os.path.join(temp_dir, "files.db"))
+            with mock.patch.object(cache, "FileCache", return_value=file_cache):
+                first = await self.manage.get_file_handle(path, self.backup)
+            second = await self.manage.get_file_handle(path, self.backup)
+            self.manage.file_cache.close()
+
+        self.assertIsNotNone(first)
+        self.assertEqual(bytes(first), bytes(second))
+        self.assertEqual(self.backup_sender.count("UploadMediaRequest"), 1)
+        self.assertEqual(self.manage.media_cache.locks, {})
+
+
+class AccountFailoverTest(unittest.IsolatedAsyncioTestCase):
+    """账号触发 FloodWait 时换下一个账号发送（FloodWait 经过 Telethon 的请求处理）"""
+
+    async def asyncSetUp(self):
+        entities = [
+            fixtures.make_channel(1000000001, "来源"),
+            fixtures.make_channel(1000000002, "目标"),
+        ]
+        self.manage = client.ClientManage({"cache": {"entity_ttl": 0}})
+        self.client_a, self.sender_a = fixtures.make_client(self.manage, entities)
+        self.client_b, self.sender_b = fixtures.make_client(self.manage, entities)
+        self.account_a = pool.Account(pool.PRIMARY_ACCOUNT, self.client_a, primary=True)
+        self.account_b = pool.Account("backup", self.client_b)
+        self.manage.pool.add(self.account_a)
+        self.manage.pool.add(self.account_b)
+        self.dest = {
+            "id": DEST_ID,
+            "name": "目标",
+            "entity": entities[1],
+            "key": "目标",
+        }
+        self.message = fixtures.make_message(SOURCE_ID, 1, "通知")
+
+    async def test_flooded_account_falls_back_to_next(self):
+        self.sender_a.flood("ForwardMessagesRequest", 30)
+
+        await asyncio.wait_for(
+            self.manage.forward_to_destination([self.message], self.dest), 1
+        )
+
+        self.assertEqual(len(self.sender_a.requests), 1)
+        self.assertEqual(len(self.sender_b.requests), 1)
+        self.assertFalse(self.account_a.available(DEST_ID))
+        self.assertEqual(self.account_a.stats["flood_wait_seconds"], 30)
+        self.assertEqual(self.account_b.stats["sent"], 1)
+
+        # 限流期间直接由账号 B 发送
+        await self.manage.forward_to_destination([self.message], self.dest)
+        self.assertEqual(len(self.sender_a.requests), 1)
+        self.assertEqual(self.account_b.stats["sent"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from src import conf, settings
+
+BASE = {
+    "telegram": {"api_id": 12345, "api_hash": "0123456789abcdef"},
+    "sources": [],
+    "destinations": [],
+    "schedulers": [],
+}
+
+
+class CompileConfigTest(unittest.TestCase):
+    """配置格式错误时返回 None（不抛出其他异常），日志在校验通过后才初始化"""
+
+    def assertInvalid(self, config):
+        with self.assertLogs(conf.logger, "ERROR"):
+            self.assertIsNone(conf.ConfigManager.compile_config(config))
+
+    def test_empty_or_non_mapping_config(self):
+        for config in (None, [], "telegram", 1):
+            with self.subTest(config=config):
+                self.assertInvalid(config)
+
+    def test_non_mapping_sections(self):
+        for key, value in (("log", "INFO"), ("telegram", 5), ("limits", [1])):
+            with self.subTest(key=key):
+                self.assertInvalid({**BASE, key: value})
+
+    def test_valid_config(self):
+        config = conf.ConfigManager.compile_config({**BASE, "log": {"level": "DEBUG"}})
+
+        self.assertIsInstance(config, settings.RuntimeConfig)
+        self.assertEqual(config.get("log"), {"level": "DEBUG"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+import fixtures
+from src import dedup, journal
+
+SOURCE_ID = -(10**12) - 1000000001
+DEST_ID = -(10**12) - 1000000002
+TEXT = "重要通知：今晚八点系统维护，期间暂停服务，请提前做好准备"
+SIMILAR_TEXT = "重要通知：今晚八点系统维护，期间暂停服务，请提前做好准备！！"
+OTHER_TEXT = "行情快报：今日收盘上涨百分之二，成交量明显放大"
+
+
+def message(text: str = "", photo_id=None):
+    """去重只读取文本和媒体ID"""
+    photo = SimpleNamespace(id=photo_id) if photo_id else None
+    return SimpleNamespace(raw_text=text, photo=photo, document=None)
+
+
+def reference_simhash(text: str) -> int:
+    """逐位计数的 SimHash（与按字节展开计数的实现对照）"""
+    size = dedup.SHINGLE_SIZE
+    shingles = {text[i : i + size] for i in range(max(1, len(text) - size + 1))}
+    counts = [0] * dedup.SIMHASH_BITS
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for index, byte in enumerate(digest):
+            for bit in range(8):
+                counts[index * 8 + bit] += (byte >> bit) & 1
+    return sum(
+        1 << position
+        for position, count in enumerate(counts)
+        if count > len(shingles) / 2
+    )
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SimHashTest(unittest.TestCase):
+    """SimHash 计算与分段桶查找"""
+
+    def test_matches_reference_implementation(self):
+        for text in (TEXT, SIMILAR_TEXT, OTHER_TEXT, "短", "a" * 500):
+            with self.subTest(text=text[:10]):
+                text = dedup.normalize_text(text)
+                self.assertEqual(dedup.simhash(text), reference_simhash(text))
+
+    def test_similar_text_is_close(self):
+        value = dedup.simhash(dedup.normalize_text(TEXT))
+        similar = dedup.simhash(dedup.normalize_text(SIMILAR_TEXT))
+        other = dedup.simhash(dedup.normalize_text(OTHER_TEXT))
+
+        self.assertLessEqual(distance(value, similar), dedup.DEFAULT_DISTANCE)
+        self.assertGreater(distance(value, other), dedup.DEFAULT_DISTANCE)
+
+    def test_normalize_ignores_links_and_punctuation(self):
+        self.assertEqual(
+            dedup.normalize_text("Hello, 世界！ https://t.me/x?a=1 t.me/abc"),
+            "hello世界",
+        )
+
+    def test_band_lookup_matches_full_scan(self):
+        rng = random.Random(0)
+        index = dedup.DedupIndex(distance=3)
+        base = [rng.getrandbits(dedup.SIMHASH_BITS) for _ in range(20)]
+        for value in base:
+            for flips in range(6):
+                variant = value
+                for bit in rng.sample(range(dedup.SIMHASH_BITS), flips):
+                    variant ^= 1 << bit
+                index.insert(dedup.Fingerprint(0, [], variant, {"a"}))
+
+        for value in base:
+            with self.subTest(value=value):
+                expected = [e for e in index.entries if distance(e.value, value) <= 3]
+                found = index.find_similar(value)
+                self.assertCountEqual(found, expected)
+                self.assertEqual(len(found), len(set(map(id, found))))
+
+    def test_expired_entries_leave_no_buckets(self):
+        index = dedup.DedupIndex(window=60)
+        index.filter_scopes([message(TEXT)], ["a"])
+        index.filter_scopes([message(photo_id=1)], ["a"])
+
+        index.expire(time.time() + 120)
+
+        self.assertEqual(len(index.entries), 0)
+        self.assertEqual(index.keys, {})
+        self.assertEqual(index.buckets, {})
+
+
+class DedupIndexTest(unittest.TestCase):
+    """每条消息一个指纹，记录已收到的 scope"""
+
+    def test_scopes_are_deduplicated_independently(self):
+        index = dedup.DedupIndex()
+
+        self.assertEqual(index.filter_scopes([message(TEXT)], ["a", "b"]), ["a", "b"])
+        self.assertEqual(index.filter_scopes([message(TEXT)], ["a", "c"]), ["c"])
+        self.assertEqual(
+            index.filter_scopes([message(SIMILAR_TEXT)], ["a", "b", "c"]), []
+        )
+        self.assertEqual(index.filter_scopes([message(OTHER_TEXT)], ["a"]), ["a"])
+
+    def test_short_text_is_not_deduplicated(self):
+        index = dedup.DedupIndex()
+        index.filter_scopes([message("签到")], ["a"])
+
+        self.assertEqual(index.filter_scopes([message("签到")], ["a"]), ["a"])
+
+    def test_media_only_requires_all_media_seen(self):
+        index = dedup.DedupIndex()
+        index.filter_scopes([message(photo_id=1), message(photo_id=2)], ["a"])
+
+        self.assertEqual(index.filter_scopes([message(photo_id=1)], ["a", "b"]), ["b"])
+        self.assertEqual(
+            index.filter_scopes([message(photo_id=2), message(photo_id=3)], ["a"]),
+            ["a"],
+        )
+
+    def test_max_size_counts_messages(self):
+        index = dedup.DedupIndex(max_size=3)
+        scopes = [str(i) for i in range(30)]
+        texts = [f"{TEXT} 第{i}条 {OTHER_TEXT * i}" for i in range(4)]
+        for text in texts:
+            index.filter_scopes([message(text)], scopes)
+
+        self.assertEqual(len(index.entries), 3)
+        self.assertEqual(index.filter_scopes([message(texts[0])], scopes), scopes)
+        self.assertEqual(index.filter_scopes([message(texts[3])], scopes), [])
+
+    def test_one_row_per_message_and_expired_rows_deleted(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "dedup.db")
+            index = dedup.DedupIndex(window=60, path=path)
+            index.filter_scopes([message(TEXT)], ["a", "b", "c"])
+            index.filter_scopes([message(OTHER_TEXT)], ["a", "b", "c"])
+            self.assertEqual(self.count_rows(path), 2)
+
+            # 第一条超出时间窗口
+            index.entries[0].created_at -= 120
+            index.conn.execute(
+                "UPDATE fingerprints SET created_at = created_at - 120 WHERE rowid = 1"
+            )
+            index.conn.commit()
+            index.filter_scopes([message(SIMILAR_TEXT)], ["a"])
+            self.assertEqual(self.count_rows(path), 2)
+            index.close()
+
+            reopened = dedup.DedupIndex(window=60, path=path)
+            self.assertEqual(reopened.filter_scopes([message(TEXT)], ["a", "b"]), ["b"])
+            reopened.close()
+
+    @staticmethod
+    def count_rows(path: str) -> int:
+        conn = sqlite3.connect(path)
+        count = conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+        conn.close()
+        return count
+
+
+class DeferredCommitTest(unittest.IsolatedAsyncioTestCase):
+    """与投递日志一起使用时，去重指纹在日志提交后才落盘"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.tmp.name, "journal.db")
+        self.dedup_path = os.path.join(self.tmp.name, "dedup.db")
+        self.journal = journal.DeliveryJournal(self.journal_path, flush_interval=60)
+        self.index = self.open_index()
+
+    async def asyncTearDown(self):
+        if self.journal.flusher is not None:
+            self.journal.flusher.cancel()
+        for conn in (self.journal.conn, self.index.conn):
+            if conn is not None:
+                conn.close()
+        self.tmp.cleanup()
+
+    def open_index(self) -> dedup.DedupIndex:
+        index = dedup.DedupIndex(path=self.dedup_path)
+        index.autocommit = False
+        self.journal.after_flush.append(index.commit)
+        return index
+
+    def process(self, index: dedup.DedupIndex, message) -> list:
+        """按 prepare_messages 的顺序：更新高水位、去重、记录待投递"""
+        self.journal.advance(SOURCE_ID, [message.id])
+        fresh = index.filter_scopes([message], [str(DEST_ID)])
+        if fresh:
+            self.journal.record(SOURCE_ID, [message.id], [DEST_ID])
+        return fresh
+
+    def crash(self):
+        """未提交日志就退出（丢弃两边未提交的事务）"""
+        self.journal.flusher.cancel()
+        self.journal.flusher = None
+        self.journal.conn.close()
+        self.index.conn.close()
+        self.index.conn = None
+        self.journal = journal.DeliveryJournal(self.journal_path, flush_interval=60)
+
+    async def test_crash_before_flush_does_not_suppress_catch_up(self):
+        message = fixtures.make_message(SOURCE_ID, 1, TEXT)
+        self.assertEqual(self.process(self.index, message), [str(DEST_ID)])
+
+        self.crash()
+        self.index = self.open_index()
+
+        self.assertIsNone(self.journal.watermark(SOURCE_ID))
+        self.assertEqual(self.process(self.index, message), [str(DEST_ID)])
+
+    async def test_flush_commits_fingerprints(self):
+        message = fixtures.make_message(SOURCE_ID, 1, TEXT)
+        self.process(self.index, message)
+        self.journal.flush()
+
+        self.crash()
+        self.index = self.open_index()
+
+        self.assertEqual(self.journal.watermark(SOURCE_ID), message.id)
+        self.assertEqual(self.process(self.index, message), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
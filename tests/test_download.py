@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import fixtures
+from src import download
+
+SIZE = 3 * download.PART_SIZE + 1000
+
+
+PATTERN = bytes(range(251))
+
+
+def content(position: int, length: int) -> bytes:
+    start = position % len(PATTERN)
+    repeat = length // len(PATTERN) + 2
+    return (PATTERN[start:] + PATTERN * repeat)[:length]
+
+
+class ChunkClient:
+    """按 iter_download 的参数返回文件内容，可在指定位置中断"""
+
+    def __init__(self, fail_at: int = None):
+        self.fail_at = fail_at
+
+    async def iter_download(
+        self, media, offset=0, limit=None, request_size=0, file_size=None
+    ):
+        position, count = offset, 0
+        while position < SIZE and (limit is None or count < limit):
+            if position == self.fail_at:
+                raise ConnectionError("连接中断")
+            length = min(request_size, SIZE - position)
+            await asyncio.sleep(0)
+            yield content(position, length)
+            position += length
+            count += 1
+
+
+def audio(client):
+    return SimpleNamespace(
+        media=fixtures.make_audio(1, SIZE),
+        file=SimpleNamespace(size=SIZE),
+        client=client,
+    )
+
+
+class DownloadManagerTest(unittest.IsolatedAsyncioTestCase):
+    """下载完成或失败后回调，写入内容与顺序/并行方式无关"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, filename: str) -> bytes:
+        with open(os.path.join(self.tmp.name, filename), "rb") as f:
+            return f.read()
+
+    async def test_sequential_and_parallel_content(self):
+        for parallel in (1, 4):
+            with self.subTest(parallel=parallel):
+                manager = download.DownloadManager(
+                    None, download_path=self.tmp.name, parallel=parallel
+                )
+                path = await manager.download(audio(ChunkClient()), f"{parallel}.flac")
+                self.assertEqual(self.read(os.path.basename(path)), content(0, SIZE))
+                self.assertFalse(os.path.exists(path + download.PART_SUFFIX))
+
+    async def test_on_done_reports_result(self):
+        manager = download.DownloadManager(None, download_path=self.tmp.name, retries=0)
+        results = asyncio.Queue()
+        manager.submit(audio(ChunkClient()), "ok.flac", results.put_nowait)
+        manager.submit(
+            audio(ChunkClient(fail_at=download.PART_SIZE)),
+            "fail.flac",
+            results.put_nowait,
+        )
+
+        done = sorted([await results.get(), await results.get()])
+
+        self.assertEqual(done, [False, True])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "ok.flac")))
+        # 失败的下载保留未完成文件，下次续传
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(self.tmp.name, "fail.flac" + download.PART_SUFFIX)
+            )
+        )
+        await manager.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
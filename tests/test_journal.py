@@ -0,0 +1,156 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import fixtures
+from src import journal
+
+SOURCE_ID = -(10**12) - 1000000001
+DEST_ID = -(10**12) - 1000000002
+OTHER_DEST_ID = -(10**12) - 1000000003
+
+
+class FailingConnection:
+    """前 failures 次事务抛出 sqlite3.Error，其余交给真实连接"""
+
+    def __init__(self, conn: sqlite3.Connection, failures: int = 1):
+        self.conn = conn
+        self.failures = failures
+
+    def __enter__(self):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.conn.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+class DeliveryJournalTest(unittest.IsolatedAsyncioTestCase):
+    """投递日志：批量提交、重启后读取未完成投递和高水位、提交失败时保留记录重试"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "journal.db")
+        self.journal = journal.DeliveryJournal(self.path, flush_interval=60)
+
+    async def asyncTearDown(self):
+        await self.journal.close()
+        self.tmp.cleanup()
+
+    async def reopen(self) -> journal.DeliveryJournal:
+        await self.journal.close()
+        self.journal = journal.DeliveryJournal(self.path, flush_interval=60)
+        return self.journal
+
+    async def test_pending_until_completed(self):
+        self.journal.record(SOURCE_ID, [1, 2], [DEST_ID, OTHER_DEST_ID])
+        self.journal.complete(SOURCE_ID, [1, 2], DEST_ID, True)
+        self.journal.complete(SOURCE_ID, [1], OTHER_DEST_ID, False)
+
+        self.assertEqual(self.journal.pending(), {SOURCE_ID: {OTHER_DEST_ID: [2]}})
+        reopened = await self.reopen()
+        self.assertEqual(reopened.pending(), {SOURCE_ID: {OTHER_DEST_ID: [2]}})
+
+    async def test_watermark_only_moves_forward(self):
+        self.journal.advance(SOURCE_ID, [5, 3])
+        self.journal.advance(SOURCE_ID, [4])
+
+        self.assertEqual(self.journal.watermark(SOURCE_ID), 5)
+        self.assertIsNone(self.journal.watermark(DEST_ID))
+        reopened = await self.reopen()
+        self.assertEqual(reopened.watermark(SOURCE_ID), 5)
+
+    async def test_records_are_batched(self):
+        self.journal.flush_interval = 0.02
+        flushes = []
+        self.journal.after_flush.append(lambda: flushes.append(len(self.journal.rows)))
+        for msg_id in range(1, 4):
+            self.journal.advance(SOURCE_ID, [msg_id])
+            self.journal.record(SOURCE_ID, [msg_id], [DEST_ID])
+
+        await asyncio.sleep(0.05)
+
+        # 一个提交间隔内的记录在一次提交中写入
+        self.assertEqual(flushes, [0])
+        self.assertIsNone(self.journal.flusher)
+        self.assertEqual(self.journal.pending(), {SOURCE_ID: {DEST_ID: [1, 2, 3]}})
+
+    async def test_finished_rows_expire_on_open(self):
+        self.journal.retention = 60
+        self.journal.record(SOURCE_ID, [1, 2], [DEST_ID])
+        self.journal.complete(SOURCE_ID, [1], DEST_ID, True)
+        self.journal.flush()
+        self.journal.conn.execute("UPDATE deliveries SET updated_at = updated_at - 120")
+        self.journal.conn.commit()
+
+        await self.journal.close()
+        self.journal = journal.DeliveryJournal(self.path, retention=60)
+
+        rows = self.journal.conn.execute(
+            "SELECT msg_id, status FROM deliveries"
+        ).fetchall()
+        # 未完成的投递不论多久都保留
+        self.assertEqual(rows, [(2, journal.PENDING)])
+
+    def test_from_config(self):
+        self.assertIsNone(journal.DeliveryJournal.from_config({}))
+        with mock.patch.object(journal.DeliveryJournal, "open"):
+            enabled = journal.DeliveryJournal.from_config(
+                {"journal": {"enable": True, "catchup_limit": 10}}
+            )
+            backfill = journal.DeliveryJournal.from_config(
+                {"backfill": {"enable": True}}
+            )
+
+        self.assertEqual(enabled.catchup_limit, 10)
+        self.assertIsNotNone(backfill)
+
+    async def test_unavailable_file_is_ignored(self):
+        path = os.path.join(self.path, "journal.db")
+
+        with self.assertLogs(journal.logger, "WARNING"):
+            unavailable = journal.DeliveryJournal(path)
+        unavailable.advance(SOURCE_ID, [1])
+        unavailable.record(SOURCE_ID, [1], [DEST_ID])
+
+        self.assertIsNone(unavailable.flusher)
+        self.assertEqual(unavailable.pending(), {})
+        await unavailable.close()
+
+    async def test_failed_flush_keeps_rows_for_retry(self):
+        flushed = []
+        self.journal.after_flush.append(lambda: flushed.append(True))
+        self.journal.advance(SOURCE_ID, [1])
+        self.journal.record(SOURCE_ID, [1], [DEST_ID])
+        self.journal.conn = FailingConnection(self.journal.conn)
+
+        with self.assertLogs(journal.logger, "ERROR"):
+            self.journal.flush()
+
+        # 记录保留，并安排了重试；提交失败时不通知去重索引
+        self.assertEqual(len(self.journal.rows), 1)
+        self.assertEqual(self.journal.dirty, {SOURCE_ID: 1})
+        self.assertIsNotNone(self.journal.flusher)
+        self.assertEqual(flushed, [])
+
+        # 重试前又产生了新记录：顺序不变（待投递在投递结果之前）
+        self.journal.advance(SOURCE_ID, [2])
+        self.journal.complete(SOURCE_ID, [1], DEST_ID, True)
+        self.journal.flush()
+
+        self.assertEqual(flushed, [True])
+        reopened = await self.reopen()
+        self.assertEqual(reopened.pending(), {})
+        self.assertEqual(reopened.watermark(SOURCE_ID), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
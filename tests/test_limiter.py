@@ -0,0 +1,77 @@
+import asyncio
+import time
+import unittest
+
+import fixtures
+from src import limiter
+
+
+class TokenBucketTest(unittest.IsolatedAsyncioTestCase):
+    """令牌桶：容量内立即放行，之后按速率补充，按调用顺序排队"""
+
+    async def test_burst_then_rate(self):
+        bucket = limiter.TokenBucket(rate=50, capacity=2)
+
+        started = time.monotonic()
+        await bucket.acquire()
+        await bucket.acquire()
+        burst = time.monotonic() - started
+        for _ in range(3):
+            await bucket.acquire()
+        elapsed = time.monotonic() - started
+
+        self.assertLess(burst, 0.02)
+        # 超出容量的 3 个令牌按 50/秒补充
+        self.assertGreaterEqual(elapsed, 0.055)
+
+    async def test_waiters_served_in_order(self):
+        bucket = limiter.TokenBucket(rate=100, capacity=1)
+        order = []
+
+        async def take(index: int):
+            await bucket.acquire()
+            order.append(index)
+
+        await asyncio.gather(*(take(i) for i in range(5)))
+
+        self.assertEqual(order, list(range(5)))
+
+
+class RateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    """每个目标独立限流，共用全局配额"""
+
+    async def test_slow_chat_does_not_block_others(self):
+        rate_limiter = limiter.RateLimiter(global_rate=1000, chat_rate=5)
+        await rate_limiter.acquire("slow")
+        slow = asyncio.create_task(rate_limiter.acquire("slow"))
+
+        started = time.monotonic()
+        await rate_limiter.acquire("fast")
+
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertFalse(slow.done())
+        await slow
+        self.assertEqual(set(rate_limiter.chat_buckets), {"slow", "fast"})
+
+    async def test_global_rate_limits_all_chats(self):
+        rate_limiter = limiter.RateLimiter(global_rate=20, chat_rate=1000)
+
+        started = time.monotonic()
+        for chat_id in range(22):
+            await rate_limiter.acquire(chat_id)
+
+        # 全局容量 20，之后每个许可等待 1/20 秒
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_from_config(self):
+        rate_limiter = limiter.RateLimiter.from_config(
+            {"limits": {"global_rate": 3, "chat_rate": 0.5}}
+        )
+
+        self.assertEqual(rate_limiter.global_bucket.rate, 3)
+        self.assertEqual(rate_limiter.global_bucket.capacity, 3)
+        self.assertEqual(rate_limiter.chat_rate, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import fixtures
+from src import log
+
+
+class LogStopTest(unittest.TestCase):
+    """停止日志时写完队列（可重复调用：重新加载配置时和程序退出时）"""
+
+    def setUp(self):
+        root = logging.getLogger()
+        self.handlers, self.level = root.handlers[:], root.level
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "console.log")
+
+    def tearDown(self):
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in self.handlers:
+            root.addHandler(handler)
+        root.setLevel(self.level)
+        self.tmp.cleanup()
+
+    def test_stop_flushes_and_is_idempotent(self):
+        with mock.patch.object(log, "LOG_FILE", self.path):
+            log_manager = log.Log(json_format=True)
+        logging.getLogger("test").info("🚀  启动")
+
+        log_manager.stop()
+        log_manager.stop()
+
+        self.assertFalse(log_manager.running)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertIn("🚀  启动", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
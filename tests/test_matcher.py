@@ -0,0 +1,70 @@
+import re
+import unittest
+
+import fixtures
+from src import matcher
+
+
+class TriePatternTest(unittest.TestCase):
+    """关键词前缀树正则与逐个匹配的结果一致"""
+
+    def test_matches_same_keywords(self):
+        keywords = ["优惠", "优惠券", "优选", "券", "a.b", "[x]"]
+        pattern = re.compile(matcher.trie_pattern(keywords))
+
+        for text in ("领取优惠券", "优选好物", "a.b", "axb", "[x]", "无关", "优"):
+            with self.subTest(text=text):
+                expected = any(keyword in text for keyword in keywords)
+                self.assertEqual(pattern.search(text) is not None, expected)
+
+
+class KeywordFilterTest(unittest.TestCase):
+    """包含/排除关键词，三种匹配模式"""
+
+    def test_plain_mode_is_case_insensitive_substring(self):
+        keyword_filter = matcher.KeywordFilter(["BTC", "优惠"], ["广告"])
+
+        self.assertTrue(keyword_filter.match("今日 btc 行情"))
+        self.assertTrue(keyword_filter.match("WBTC 上线"))
+        self.assertTrue(keyword_filter.match("限时优惠券"))
+        self.assertFalse(keyword_filter.match("限时优惠（广告）"))
+        self.assertFalse(keyword_filter.match("ETH 行情"))
+
+    def test_word_mode_matches_whole_words(self):
+        keyword_filter = matcher.KeywordFilter(["btc"], [], mode="word")
+
+        self.assertTrue(keyword_filter.match("BTC 上涨"))
+        self.assertTrue(keyword_filter.match("价格：btc/usdt"))
+        self.assertFalse(keyword_filter.match("WBTC 上线"))
+        self.assertFalse(keyword_filter.match("btc2"))
+
+    def test_regex_mode(self):
+        keyword_filter = matcher.KeywordFilter(
+            [r"涨幅\s*\d+%", "^公告"], [r"测试$"], mode="regex"
+        )
+
+        self.assertTrue(keyword_filter.match("今日涨幅 15%"))
+        self.assertTrue(keyword_filter.match("公告：维护"))
+        self.assertFalse(keyword_filter.match("重要公告"))
+        self.assertFalse(keyword_filter.match("涨幅 5% 测试"))
+
+    def test_no_include_keywords_matches_all_but_excluded(self):
+        keyword_filter = matcher.KeywordFilter([], ["广告", ""])
+
+        self.assertTrue(keyword_filter.match("任意消息"))
+        self.assertFalse(keyword_filter.match("广告"))
+        self.assertFalse(keyword_filter.match(""))
+        self.assertFalse(keyword_filter.match(None))
+
+    def test_keywords_are_converted_to_text(self):
+        keyword_filter = matcher.KeywordFilter([2026], [])
+
+        self.assertTrue(keyword_filter.match("2026 年计划"))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            matcher.KeywordFilter(["btc"], [], mode="fuzzy")
+
+
+if __name__ == "__main__":
+    unittest.main()
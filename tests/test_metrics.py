@@ -0,0 +1,94 @@
+import unittest
+
+import fixtures
+from src import metrics
+
+
+def metric_lines(text: str, name: str) -> list:
+    """某个指标的样本行（不含 HELP/TYPE）"""
+    return [
+        line
+        for line in text.splitlines()
+        if line.startswith(name) and not line.startswith("#")
+    ]
+
+
+class MetricsRenderTest(unittest.TestCase):
+    """Prometheus 文本格式输出"""
+
+    def setUp(self):
+        self.registry = metrics.Metrics()
+        self.registry.enabled = True
+
+    def test_disabled_registry_records_nothing(self):
+        registry = metrics.Metrics()
+        registry.inc("tg_forward_total")
+        registry.observe("tg_forward_seconds", 0.1)
+
+        self.assertEqual(registry.values, {})
+        self.assertEqual(registry.histograms, {})
+
+    def test_every_metric_has_help_and_type(self):
+        text = self.registry.render()
+
+        for name, (kind, help_text, _) in metrics.DEFINITIONS.items():
+            with self.subTest(name=name):
+                self.assertIn(f"# HELP {name} {help_text}\n", text)
+                self.assertIn(f"# TYPE {name} {kind}\n", text)
+        self.assertTrue(text.endswith("\n"))
+
+    def test_counters_and_gauges_with_labels(self):
+        self.registry.inc("tg_messages_received_total", 2, source="新闻")
+        self.registry.inc("tg_messages_received_total", source="新闻")
+        self.registry.set("tg_send_queue_depth", 4, destination='a"b\\c\nd')
+
+        text = self.registry.render()
+
+        self.assertEqual(
+            metric_lines(text, "tg_messages_received_total"),
+            ['tg_messages_received_total{source="新闻"} 3'],
+        )
+        self.assertEqual(
+            metric_lines(text, "tg_send_queue_depth"),
+            ['tg_send_queue_depth{destination="a\\"b\\\\c\\nd"} 4'],
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.01, 0.2, 0.2, 60):
+            self.registry.observe("tg_forward_seconds", value, destination="目标")
+
+        lines = metric_lines(self.registry.render(), "tg_forward_seconds")
+
+        self.assertIn(
+            'tg_forward_seconds_bucket{destination="目标",le="0.05"} 1', lines
+        )
+        self.assertIn('tg_forward_seconds_bucket{destination="目标",le="0.1"} 1', lines)
+        self.assertIn(
+            'tg_forward_seconds_bucket{destination="目标",le="0.25"} 3', lines
+        )
+        self.assertIn('tg_forward_seconds_bucket{destination="目标",le="30"} 3', lines)
+        self.assertIn(
+            'tg_forward_seconds_bucket{destination="目标",le="+Inf"} 4', lines
+        )
+        self.assertIn('tg_forward_seconds_sum{destination="目标"} 60.41', lines)
+        self.assertIn('tg_forward_seconds_count{destination="目标"} 4', lines)
+
+    def test_collectors_run_on_render(self):
+        def broken(registry):
+            raise RuntimeError("采集失败")
+
+        self.registry.add_collector(broken)
+        self.registry.add_collector(
+            lambda registry: registry.set("tg_download_queue_depth", 7)
+        )
+
+        text = self.registry.render()
+
+        self.assertEqual(
+            metric_lines(text, "tg_download_queue_depth"),
+            ["tg_download_queue_depth 7"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,222 @@
+import logging
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import fixtures
+from src import client, download, journal, matcher, monitor, pool, settings
+
+SOURCE = fixtures.make_channel(1000000001, "来源")
+SOURCE_ID = -(10**12) - 1000000001
+DEST = {"id": -(10**12) - 1000000002, "name": "目标"}
+START = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+class HistoryClient:
+    """按 Telethon iter_messages 的参数返回历史消息（默认从新到旧，min_id/max_id 不含边界）"""
+
+    def __init__(self, messages=(), error: Exception = None):
+        self.messages = list(messages)
+        self.error = error
+        self.calls = []
+
+    async def iter_messages(self, entity, limit=None, min_id=0, max_id=0, **kwargs):
+        self.calls.append(
+            {"limit": limit, "min_id": min_id, "max_id": max_id, **kwargs}
+        )
+        if self.error is not None:
+            raise self.error
+        selected = [
+            m
+            for m in sorted(self.messages, key=lambda m: m.id, reverse=True)
+            if m.id > min_id and (not max_id or m.id < max_id)
+        ]
+        for message in selected[:limit]:
+            yield message
+
+    async def get_messages(self, entity, ids):
+        by_id = {m.id: m for m in self.messages}
+        return [by_id.get(i) for i in ids]
+
+
+def history(first: int, last: int):
+    """来源消息 first..last（每分钟一条）"""
+    return [
+        fixtures.make_message(
+            SOURCE_ID, i, f"消息 {i}", date=START + timedelta(minutes=i)
+        )
+        for i in range(first, last + 1)
+    ]
+
+
+class BackfillTest(unittest.IsolatedAsyncioTestCase):
+    """回溯历史消息：按顺序转发，超出上限时保留最新的消息，失败时恢复实时处理"""
+
+    async def asyncSetUp(self):
+        self.forwarded = []
+
+        async def forward_message(messages, destinations):
+            self.forwarded.append([m.id for m in messages])
+
+        self.manage = SimpleNamespace(
+            journal=None,
+            forward_message=forward_message,
+            group_messages=client.ClientManage.group_messages,
+        )
+        self.monitor = monitor.TelegramMonitor({})
+        self.monitor.client_manage = self.manage
+        self.monitor.backfilling = {SOURCE_ID: []}
+
+    def add_source(self, history_client):
+        self.monitor.source_index[SOURCE_ID] = settings.Route(
+            name="来源",
+            account=pool.Account(pool.PRIMARY_ACCOUNT, history_client, primary=True),
+            entity=SOURCE,
+            filter=matcher.KeywordFilter([], []),
+            destinations=(DEST,),
+            rules=(),
+            batcher=None,
+        )
+
+    async def test_gap_larger_than_limit_keeps_newest(self):
+        self.add_source(HistoryClient(history(1, 10)))
+
+        with self.assertLogs(monitor.logger, logging.WARNING) as logs:
+            await self.monitor.backfill(self.manage, SOURCE_ID, min_id=2, limit=4)
+
+        self.assertEqual(self.forwarded, [[7, 8, 9, 10]])
+        self.assertIn("最新的 4 条", logs.output[0])
+
+    async def test_since_stops_at_start_time(self):
+        self.add_source(HistoryClient(history(1, 10)))
+        since = START + timedelta(minutes=7)
+
+        await self.monitor.backfill(self.manage, SOURCE_ID, since=since, limit=100)
+
+        self.assertEqual(self.forwarded, [[7, 8, 9, 10]])
+
+    async def test_fetches_up_to_first_buffered_message(self):
+        messages = history(1, 11)
+        history_client = HistoryClient(messages)
+        self.add_source(history_client)
+        await self.monitor.handle_messages(self.manage, SOURCE_ID, [messages[-1]])
+
+        await self.monitor.backfill(self.manage, SOURCE_ID, min_id=2, limit=4)
+
+        self.assertEqual(history_client.calls[0]["max_id"], 11)
+        self.assertEqual(self.forwarded, [[7, 8, 9, 10], [11]])
+        self.assertEqual(self.monitor.backfilling, {})
+
+    async def test_fetch_error_drains_buffer(self):
+        self.add_source(HistoryClient(error=ConnectionError("连接中断")))
+        live = history(5, 5)[0]
+        await self.monitor.handle_messages(self.manage, SOURCE_ID, [live])
+
+        await self.monitor.backfill(self.manage, SOURCE_ID, min_id=1)
+
+        self.assertEqual(self.monitor.backfilling, {})
+        self.assertEqual(self.forwarded, [[5]])
+        later = history(6, 6)[0]
+        await self.monitor.handle_messages(self.manage, SOURCE_ID, [later])
+        self.assertEqual(self.forwarded[-1], [6])
+
+    async def test_removed_source_clears_backfilling(self):
+        live = history(5, 5)[0]
+        await self.monitor.handle_messages(self.manage, SOURCE_ID, [live])
+
+        await self.monitor.backfill(self.manage, SOURCE_ID, min_id=1)
+
+        self.assertEqual(self.monitor.backfilling, {})
+        self.assertEqual(self.forwarded, [])
+
+
+class FakeDownloader:
+    """记录加入下载队列的任务"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, message, filename, on_done=None):
+        self.submitted.append((message.id, filename, on_done))
+
+
+class DownloadJournalTest(unittest.IsolatedAsyncioTestCase):
+    """音频下载记录在投递日志中，未完成的下载重启后重新加入队列"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "journal.db")
+        self.journal = journal.DeliveryJournal(self.path, flush_interval=60)
+        self.audio = fixtures.make_message(
+            SOURCE_ID, 3, "歌曲：晴天", media=fixtures.make_audio(1)
+        )
+        self.history_client = HistoryClient([self.audio])
+
+    async def asyncTearDown(self):
+        await self.journal.close()
+        self.tmp.cleanup()
+
+    def make_monitor(self, journal):
+        telegram_monitor = monitor.TelegramMonitor({})
+        telegram_monitor.downloader = FakeDownloader()
+        telegram_monitor.source_index[SOURCE_ID] = settings.Route(
+            name="music_v1bot",
+            account=pool.Account(
+                pool.PRIMARY_ACCOUNT, self.history_client, primary=True
+            ),
+            entity=SOURCE,
+            filter=matcher.KeywordFilter([], []),
+            destinations=(DEST,),
+            rules=(),
+            batcher=None,
+        )
+        return telegram_monitor, SimpleNamespace(journal=journal)
+
+    async def test_download_pending_until_done(self):
+        telegram_monitor, manage = self.make_monitor(self.journal)
+
+        destinations = telegram_monitor.prepare_messages(
+            manage, SOURCE_ID, telegram_monitor.source_index[SOURCE_ID], [self.audio]
+        )
+
+        self.assertEqual(destinations, [])
+        [(msg_id, filename, on_done)] = telegram_monitor.downloader.submitted
+        self.assertEqual((msg_id, filename), (3, "晴天.flac"))
+        self.assertEqual(
+            self.journal.pending(), {SOURCE_ID: {download.JOURNAL_DEST: [3]}}
+        )
+        self.assertEqual(self.journal.watermark(SOURCE_ID), 3)
+        on_done(True)
+        self.assertEqual(self.journal.pending(), {})
+
+    async def test_unfinished_download_resubmitted_after_restart(self):
+        telegram_monitor, manage = self.make_monitor(self.journal)
+        telegram_monitor.prepare_messages(
+            manage, SOURCE_ID, telegram_monitor.source_index[SOURCE_ID], [self.audio]
+        )
+        # 下载完成前停止运行
+        await self.journal.close()
+        self.journal = journal.DeliveryJournal(self.path, flush_interval=60)
+        telegram_monitor, manage = self.make_monitor(self.journal)
+
+        await telegram_monitor.recover(manage, [DEST])
+
+        [(msg_id, filename, on_done)] = telegram_monitor.downloader.submitted
+        self.assertEqual((msg_id, filename), (3, "晴天.flac"))
+        on_done(True)
+        self.assertEqual(self.journal.pending(), {})
+
+    async def test_deleted_message_not_resubmitted(self):
+        self.journal.record(SOURCE_ID, [4], [download.JOURNAL_DEST])
+        telegram_monitor, manage = self.make_monitor(self.journal)
+
+        await telegram_monitor.recover(manage, [DEST])
+
+        self.assertEqual(telegram_monitor.downloader.submitted, [])
+        self.assertEqual(self.journal.pending(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import pickle
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import fixtures
+from apscheduler.util import datetime_to_utc_timestamp
+from src import client, pool, scheduler
+
+CONFIG = {
+    "scheduler": {"persist": True, "catchup_window": 3600},
+    "schedulers": [
+        {"enabled": True, "id": "target", "cron": "0 2 * * *", "message": "签到"}
+    ],
+    "cache": {"entity_ttl": 0},
+}
+
+
+class CatchUpTest(unittest.IsolatedAsyncioTestCase):
+    """重启后补发停机期间错过的执行"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "scheduler.db")
+        self.telegram_scheduler = None
+        self.client = None
+        # 第一次运行：保存任务
+        await self.start()
+        await self.stop()
+
+    async def asyncTearDown(self):
+        await self.stop()
+        self.tmp.cleanup()
+
+    async def start(self):
+        self.client_manage = client.ClientManage(CONFIG)
+        # 重启时沿用同一个发送器，统计所有发送请求
+        sender = self.client._sender if self.client is not None else None
+        self.client, _ = fixtures.make_client(
+            self.client_manage, [fixtures.make_channel(1000000002, "目标", "target")]
+        )
+        if sender is not None:
+            self.client._sender = sender
+        self.client_manage.client = self.client
+        self.client_manage.pool.add(
+            pool.Account(pool.PRIMARY_ACCOUNT, self.client, primary=True)
+        )
+        self.telegram_scheduler = scheduler.TelegramScheduler(CONFIG)
+        self.telegram_scheduler.jobstore.path = self.path
+        await self.telegram_scheduler.start_scheduler(self.client_manage)
+
+    async def stop(self):
+        if self.telegram_scheduler is None:
+            return
+        if self.telegram_scheduler.scheduler.running:
+            self.telegram_scheduler.scheduler.shutdown(wait=False)
+        await self.client_manage.send_queue.close()
+        self.telegram_scheduler = None
+        # 调度器在事件循环中延迟关闭
+        await asyncio.sleep(0.05)
+
+    def set_run_times(self, next_run_time: datetime, last_run_time: datetime = None):
+        """修改已保存任务的下次和上次执行时间（模拟停机）"""
+        conn = sqlite3.connect(self.path)
+        with conn:
+            job_id, job_state = conn.execute(
+                "SELECT id, job_state FROM jobs"
+            ).fetchone()
+            state = pickle.loads(job_state)
+            state["next_run_time"] = next_run_time
+            conn.execute(
+                "UPDATE jobs SET next_run_time = ?, last_run_time = ?, job_state = ?",
+                (
+                    datetime_to_utc_timestamp(next_run_time),
+                    datetime_to_utc_timestamp(last_run_time),
+                    pickle.dumps(state, pickle.HIGHEST_PROTOCOL),
+                ),
+            )
+        conn.close()
+
+    def sent(self) -> list:
+        return [
+            r
+            for r in self.client._sender.requests
+            if type(r).__name__ == "SendMessageRequest"
+        ]
+
+    async def wait_sent(self, count: int, timeout: float = 2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while len(self.sent()) < count:
+            if asyncio.get_running_loop().time() > deadline:
+                break
+            await asyncio.sleep(0.01)
+        # 确认没有多余的发送
+        await asyncio.sleep(0.2)
+
+    async def test_missed_run_is_sent_once(self):
+        missed = datetime.now(timezone.utc) - timedelta(minutes=10)
+        self.set_run_times(missed)
+
+        await self.start()
+        await self.wait_sent(1)
+
+        self.assertEqual(len(self.sent()), 1)
+        job = self.telegram_scheduler.scheduler.get_jobs()[0]
+        self.assertGreater(job.next_run_time, datetime.now(timezone.utc))
+
+    async def test_submitted_run_is_not_sent_again(self):
+        # 停机前已提交执行，但下次执行时间未保存
+        missed = datetime.now(timezone.utc) - timedelta(minutes=10)
+        self.set_run_times(missed, last_run_time=missed)
+
+        await self.start()
+        await self.wait_sent(1, timeout=0.5)
+
+        self.assertEqual(self.sent(), [])
+        job = self.telegram_scheduler.scheduler.get_jobs()[0]
+        self.assertGreater(job.next_run_time, datetime.now(timezone.utc))
+
+
+if __name__ == "__main__":
+    unittest.main()
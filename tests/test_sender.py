@@ -0,0 +1,158 @@
+import asyncio
+import unittest
+
+import fixtures
+from telethon import utils
+from src import client, limiter, sender
+
+SOURCE = fixtures.make_channel(1000000001, "来源")
+SLOW = fixtures.make_channel(1000000002, "限流目标")
+FAST = fixtures.make_channel(1000000003, "其他目标")
+
+
+def destination(entity):
+    return {"id": utils.get_peer_id(entity), "name": entity.title, "entity": entity}
+
+
+async def parked(queue: sender.SendQueue, dest):
+    """等待目标进入暂停状态"""
+    while dest["id"] not in queue.parked_until:
+        await asyncio.sleep(0.01)
+
+
+class FloodWaitTest(unittest.IsolatedAsyncioTestCase):
+    """FloodWait 由 Telethon 抛出，发送队列暂停该目标且不占用并发"""
+
+    async def asyncSetUp(self):
+        manage = client.ClientManage({"cache": {"entity_ttl": 0}})
+        self.client, self.sender = fixtures.make_client(manage, [SOURCE, SLOW, FAST])
+        self.queue = sender.SendQueue(
+            limiter.RateLimiter(global_rate=1000, chat_rate=1000),
+            concurrency=1,
+            max_retries=1,
+        )
+        self.message = fixtures.make_message(utils.get_peer_id(SOURCE), 1, "通知")
+
+    def job(self, entity):
+        return lambda: self.client.forward_messages(
+            utils.get_input_peer(entity), [self.message]
+        )
+
+    async def test_flood_wait_is_raised_not_slept(self):
+        self.sender.flood("ForwardMessagesRequest", 30)
+        self.queue.max_retries = 0
+
+        sent = await asyncio.wait_for(
+            self.queue.run(destination(SLOW), self.job(SLOW)), 1
+        )
+
+        self.assertFalse(sent)
+        self.assertEqual(self.queue.stats["flood_waits"], 1)
+        self.assertEqual(self.queue.stats["flood_wait_seconds"], 30)
+
+    async def test_parked_destination_does_not_block_others(self):
+        self.sender.flood("ForwardMessagesRequest", 30)
+        slow = asyncio.create_task(self.queue.run(destination(SLOW), self.job(SLOW)))
+        await asyncio.wait_for(parked(self.queue, destination(SLOW)), 1)
+        self.sender.errors.clear()
+        # Telethon 记录了该请求类型的限流，换一个客户端发送到其他目标
+        manage = client.ClientManage({"cache": {"entity_ttl": 0}})
+        other, _ = fixtures.make_client(manage, [SOURCE, FAST])
+        job = lambda: other.forward_messages(utils.get_input_peer(FAST), [self.message])
+
+        sent = await asyncio.wait_for(self.queue.run(destination(FAST), job), 1)
+
+        self.assertTrue(sent)
+        slow.cancel()
+        await asyncio.gather(slow, return_exceptions=True)
+
+
+class FlakyJob:
+    """前 failures 次调用抛出 error，之后成功"""
+
+    def __init__(self, failures: int, error: Exception):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+
+
+class RetryTest(unittest.IsolatedAsyncioTestCase):
+    """临时错误按指数退避重试，退避期间目标暂停，超过次数或不可重试时失败"""
+
+    async def asyncSetUp(self):
+        self.queue = sender.SendQueue(
+            limiter.RateLimiter(global_rate=1000, chat_rate=1000),
+            concurrency=2,
+            max_retries=3,
+            retry_delay=0.01,
+        )
+        self.dest = destination(SLOW)
+
+    async def test_backoff_doubles_until_success(self):
+        job = FlakyJob(2, ConnectionError("连接中断"))
+
+        self.assertTrue(await self.queue.run(self.dest, job))
+
+        self.assertEqual(job.calls, 3)
+        self.assertEqual(self.queue.stats["retries"], 2)
+        self.assertAlmostEqual(self.queue.stats["parked_seconds"], 0.01 + 0.02)
+        self.assertEqual(self.queue.stats["sent"], 1)
+        self.assertEqual(self.queue.parked_until, {})
+
+    async def test_destination_parked_during_backoff(self):
+        self.queue.retry_delay = 0.2
+        job = FlakyJob(1, asyncio.TimeoutError())
+        task = asyncio.create_task(self.queue.run(self.dest, job))
+
+        await asyncio.wait_for(parked(self.queue, self.dest), 1)
+        self.assertFalse(task.done())
+
+        self.assertTrue(await task)
+        self.assertEqual(self.queue.parked_until, {})
+
+    async def test_gives_up_after_max_retries(self):
+        job = FlakyJob(10, ConnectionError("连接中断"))
+
+        with self.assertLogs(sender.logger, "ERROR"):
+            self.assertFalse(await self.queue.run(self.dest, job))
+
+        self.assertEqual(job.calls, 4)
+        self.assertEqual(self.queue.stats["retries"], 3)
+        self.assertEqual(self.queue.stats["failed"], 1)
+
+    async def test_other_errors_are_not_retried(self):
+        job = FlakyJob(1, ValueError("消息格式错误"))
+
+        with self.assertLogs(sender.logger, "ERROR"):
+            self.assertFalse(await self.queue.run(self.dest, job))
+
+        self.assertEqual(job.calls, 1)
+        self.assertEqual(self.queue.stats["retries"], 0)
+
+    async def test_put_keeps_order_per_destination(self):
+        sent, results = [], []
+
+        def job(index: int):
+            async def send():
+                await asyncio.sleep(0.01 * (3 - index))
+                sent.append(index)
+
+            return send
+
+        for index in range(3):
+            self.queue.put(self.dest, job(index), results.append)
+        await self.queue.queues[self.dest["id"]].join()
+
+        self.assertEqual(sent, [0, 1, 2])
+        self.assertEqual(results, [True, True, True])
+        await self.queue.close()
+        self.assertEqual(self.queue.workers, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
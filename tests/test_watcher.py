@@ -0,0 +1,83 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import fixtures
+from src import watcher
+
+DEBOUNCE_DELAY = 0.05
+
+
+class ConfigWatcherTest(unittest.IsolatedAsyncioTestCase):
+    """连续写入合并为一次重载，内容未变化时不重载"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "config.yaml")
+        self.write("sources: []\n")
+        self.reloads = 0
+        patcher = mock.patch.object(watcher, "DEBOUNCE_DELAY", DEBOUNCE_DELAY)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        self.watcher.stop()
+        self.tmp.cleanup()
+
+    def write(self, text: str):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    async def reload(self):
+        self.reloads += 1
+
+    def make_watcher(self, interval: float = 60) -> watcher.ConfigWatcher:
+        self.watcher = watcher.ConfigWatcher(self.path, self.reload, interval)
+        return self.watcher
+
+    async def test_bursts_are_debounced(self):
+        config_watcher = self.make_watcher()
+        for i in range(5):
+            self.write(f"sources: []\n# {i}\n")
+            config_watcher.schedule()
+
+        await asyncio.sleep(DEBOUNCE_DELAY * 3)
+
+        self.assertEqual(self.reloads, 1)
+        self.assertIsNone(config_watcher.pending)
+
+    async def test_unchanged_file_is_not_reloaded(self):
+        config_watcher = self.make_watcher()
+        config_watcher.schedule()
+
+        await asyncio.sleep(DEBOUNCE_DELAY * 3)
+
+        self.assertEqual(self.reloads, 0)
+
+    async def test_inotify_or_polling_detects_writes(self):
+        config_watcher = self.make_watcher(interval=0.02)
+        config_watcher.start()
+        for i in range(3):
+            self.write(f"sources: []\n# {'x' * i}\n")
+
+        await asyncio.sleep(DEBOUNCE_DELAY * 3)
+
+        self.assertEqual(self.reloads, 1)
+
+    async def test_reload_error_is_logged(self):
+        async def fail():
+            raise ValueError("配置格式错误")
+
+        config_watcher = watcher.ConfigWatcher(self.path, fail)
+        self.watcher = config_watcher
+        self.write("sources: [\n")
+        config_watcher.schedule()
+
+        with self.assertLogs(watcher.logger, "ERROR"):
+            await asyncio.sleep(DEBOUNCE_DELAY * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()